@@ -1,10 +1,34 @@
 # 优化版 SM2 实现
 # 主要优化点：使用内置 pow() 逆元、减少重复计算、简化点乘
 import random
-from hashlib import sha256
+import threading
 import struct
+import importlib.util
+import os
+import sys
+from collections import OrderedDict
 import gmpy2
 
+
+# SM3使用sm3_optimization中C实现的ctypes绑定；按文件路径加载，不把其目录加入sys.path
+def _load_sm3():
+    name = 'sm3_optimization_sm3'
+    module = sys.modules.get(name)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sm3_optimization', 'python', 'sm3.py')
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+    return module
+
+
+sm3_hash = _load_sm3().sm3_hash
+
 p = gmpy2.mpz(0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF)
 a = gmpy2.mpz(0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC)
 b = gmpy2.mpz(0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93)
@@ -44,26 +68,263 @@ def point_add(P, Q):
     return Point(x3, y3)
 
 
-def point_mul(P, k):
-    R = O
-    addend = P
+# Jacobian坐标 (X, Y, Z) 表示仿射点 (X/Z^2, Y/Z^3)，Z == 0 为无穷远点。
+# 倍点与加法都不求逆，点乘结束时只做一次求逆转回仿射坐标。
+J_O = (gmpy2.mpz(1), gmpy2.mpz(1), gmpy2.mpz(0))
+assert a == p - 3  # 倍点公式利用 a = -3
+
+
+def to_jacobian(P):
+    if P == O:
+        return J_O
+    return (P.x, P.y, gmpy2.mpz(1))
+
+
+def from_jacobian(J):
+    X, Y, Z = J
+    if Z == 0:
+        return O
+    z_inv = inverse_mod(Z, p)
+    z_inv2 = z_inv * z_inv % p
+    return Point(X * z_inv2 % p, Y * z_inv2 * z_inv % p)
+
+
+def jacobian_double(J):
+    # a = -3 时 3X^2 + aZ^4 = 3(X - Z^2)(X + Z^2)
+    X, Y, Z = J
+    if Z == 0 or Y == 0:
+        return J_O
+    delta = Z * Z % p
+    gamma = Y * Y % p
+    beta = X * gamma % p
+    alpha = 3 * (X - delta) * (X + delta) % p
+    X3 = (alpha * alpha - 8 * beta) % p
+    Z3 = ((Y + Z) * (Y + Z) - gamma - delta) % p
+    Y3 = (alpha * (4 * beta - X3) - 8 * gamma * gamma) % p
+    return (X3, Y3, Z3)
+
+
+def jacobian_add_affine(J, Q):
+    # 混合加法：Q为仿射点（相当于Z2 = 1），省去Z2相关的乘法
+    if Q == O:
+        return J
+    X1, Y1, Z1 = J
+    if Z1 == 0:
+        return (Q.x, Q.y, gmpy2.mpz(1))
+    Z1Z1 = Z1 * Z1 % p
+    H = (Q.x * Z1Z1 - X1) % p
+    r = (Q.y * Z1 * Z1Z1 - Y1) % p
+    if H == 0:
+        return jacobian_double(J) if r == 0 else J_O
+    HH = H * H % p
+    HHH = H * HH % p
+    V = X1 * HH % p
+    X3 = (r * r - HHH - 2 * V) % p
+    Y3 = (r * (V - X3) - Y1 * HHH) % p
+    return (X3, Y3, Z1 * H % p)
+
+
+def jacobian_add(J1, J2):
+    X1, Y1, Z1 = J1
+    X2, Y2, Z2 = J2
+    if Z1 == 0:
+        return J2
+    if Z2 == 0:
+        return J1
+    Z1Z1 = Z1 * Z1 % p
+    Z2Z2 = Z2 * Z2 % p
+    U1 = X1 * Z2Z2 % p
+    U2 = X2 * Z1Z1 % p
+    S1 = Y1 * Z2 * Z2Z2 % p
+    S2 = Y2 * Z1 * Z1Z1 % p
+    H = (U2 - U1) % p
+    r = (S2 - S1) % p
+    if H == 0:
+        return jacobian_double(J1) if r == 0 else J_O
+    HH = H * H % p
+    HHH = H * HH % p
+    V = U1 * HH % p
+    X3 = (r * r - HHH - 2 * V) % p
+    Y3 = (r * (V - X3) - S1 * HHH) % p
+    return (X3, Y3, Z1 * Z2 * H % p)
+
+
+def jacobian_mul(P, k):
+    # 从高位到低位的倍点-加法，P保持仿射坐标以使用混合加法
+    R = J_O
     k = gmpy2.mpz(k)
+    if P == O or k <= 0:
+        return R
+    for i in range(k.bit_length() - 1, -1, -1):
+        R = jacobian_double(R)
+        if k.bit_test(i):
+            R = jacobian_add_affine(R, P)
+    return R
+
+
+def point_mul(P, k):
+    return from_jacobian(jacobian_mul(P, k))
+
+# 基点G的固定基窗口表：g_table()[i][j - 1] = j * 2^(w*i) * G（仿射坐标）。
+# k*G = Σ 表[i][k的第i个w位窗口]，约 256/w 次混合加法，不需要倍点。
+# 宽度w由G_TABLE_WIDTH配置，表大小为 ceil(256/w) * (2^w - 1) 个点，首次使用时构建并保存在模块中。
+G_TABLE_WIDTH = 6
+_g_table = None
+_g_table_width = None
+
+
+def batch_to_affine(Js):
+    # Montgomery技巧：一次求逆把一批Jacobian点转回仿射坐标
+    prefix = []
+    acc = gmpy2.mpz(1)
+    for J in Js:
+        prefix.append(acc)
+        if J[2] != 0:
+            acc = acc * J[2] % p
+    inv = inverse_mod(acc, p)
+    out = [O] * len(Js)
+    for i in range(len(Js) - 1, -1, -1):
+        X, Y, Z = Js[i]
+        if Z == 0:
+            continue
+        z_inv = inv * prefix[i] % p
+        inv = inv * Z % p
+        z_inv2 = z_inv * z_inv % p
+        out[i] = Point(X * z_inv2 % p, Y * z_inv2 * z_inv % p)
+    return out
+
+
+def _build_window_table(P, width):
+    # table[i][j - 1] = j * 2^(w*i) * P
+    rows = []
+    base = to_jacobian(P)
+    for _ in range((n.bit_length() + width - 1) // width):
+        row = [base]
+        for _ in range((1 << width) - 2):
+            row.append(jacobian_add(row[-1], base))
+        rows.append(row)
+        base = jacobian_add(row[-1], base)  # 2^w * base
+    flat = batch_to_affine([J for row in rows for J in row])
+    size = (1 << width) - 1
+    return [flat[i * size:(i + 1) * size] for i in range(len(rows))]
+
+
+def g_table():
+    global _g_table, _g_table_width
+    if _g_table is None or _g_table_width != G_TABLE_WIDTH:
+        _g_table = _build_window_table(Point(Gx, Gy), G_TABLE_WIDTH)
+        _g_table_width = G_TABLE_WIDTH
+    return _g_table
+
+
+def _window_mul(table, width, k):
+    # 查窗口表计算 k*P：每w位一次混合加法，不需要倍点
+    mask = (1 << width) - 1
+    k = gmpy2.mpz(k) % n
+    R = J_O
+    i = 0
+    while k:
+        j = int(k & mask)
+        if j:
+            R = jacobian_add_affine(R, table[i][j - 1])
+        k >>= width
+        i += 1
+    return R
+
+
+
+def jacobian_base_mul(k):
+    table = g_table()
+    return _window_mul(table, _g_table_width, k)
+
+
+def base_mul(k):
+    # k*G，使用固定基窗口表
+    return from_jacobian(jacobian_base_mul(k))
+
+
+# 多标量乘 Σ k_i * P_i（Straus交错wNAF）：所有非G项共用一条倍点链，
+# 每个标量写成宽度WNAF_WIDTH的wNAF，每 WNAF_WIDTH 位平均只有一个非零奇数位，
+# 对应的 ±P_i、±3P_i、…、±(2^(w-1) - 1)P_i 预先算好（所有点一起一次求逆）。
+# 基点G的项直接查固定基窗口表，不参与倍点。
+WNAF_WIDTH = 5
+
+
+def wnaf(k, w):
+    # 低位在前的wNAF，非零位为 (-2^(w-1), 2^(w-1)) 内的奇数
+    digits = []
     while k:
         if k & 1:
-            R = point_add(R, addend)
-        addend = point_add(addend, addend)
+            d = k & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
         k >>= 1
-    return R
+    return digits
+
+
+def _odd_multiples(points, w):
+    # 每个点的 1P, 3P, …, (2^(w-1) - 1)P，所有点合在一起转回仿射坐标
+    Js = []
+    for P in points:
+        J = to_jacobian(P)
+        J2 = jacobian_double(J)
+        Js.append(J)
+        for _ in range((1 << (w - 2)) - 1):
+            J = jacobian_add(J, J2)
+            Js.append(J)
+    flat = batch_to_affine(Js)
+    size = 1 << (w - 2)
+    return [flat[i * size:(i + 1) * size] for i in range(len(points))]
+
+
+def jacobian_multi_scalar_mul(terms):
+    G = Point(Gx, Gy)
+    fixed = 0
+    points, scalars = [], []
+    for P, k in terms:
+        k = int(k) % int(n)
+        if k == 0 or P == O:
+            continue
+        if P == G:
+            fixed += k
+        else:
+            points.append(P)
+            scalars.append(k)
+    R = jacobian_base_mul(fixed) if fixed else J_O
+    if not points:
+        return R
+    w = WNAF_WIDTH
+    digits = [wnaf(k, w) for k in scalars]
+    tables = _odd_multiples(points, w)
+    negs = [[Point(Q.x, (p - Q.y) % p) for Q in table] for table in tables]
+    # steps[i]：第i位需要加上的仿射点，循环中不再逐项判断
+    steps = [[] for _ in range(max(len(d) for d in digits))]
+    for d, table, neg in zip(digits, tables, negs):
+        for i, x in enumerate(d):
+            if x:
+                steps[i].append(table[x >> 1] if x > 0 else neg[-x >> 1])
+    S = J_O
+    for adds in reversed(steps):
+        S = jacobian_double(S)
+        for Q in adds:
+            S = jacobian_add_affine(S, Q)
+    return jacobian_add(R, S)
+
+
+def multi_scalar_mul(terms):
+    # terms为 [(P1, k1), (P2, k2), ...]，返回仿射坐标的 Σ k_i * P_i
+    return from_jacobian(jacobian_multi_scalar_mul(terms))
+
 
 def gen_keypair():
     d = gmpy2.mpz(random.randrange(1, int(n)))
-    P = point_mul(Point(Gx, Gy), d)
+    P = base_mul(d)
     return d, P
 
-def sm3_hash(data: bytes) -> bytes:
-    # 这里用sha256代替sm3，实际国密应使用sm3
-    return sha256(data).digest()
-
 def get_z(ID: bytes, P, a, b, Gx, Gy):
     ENTL = struct.pack('>H', len(ID)*8)
     joint = ENTL + ID + int.to_bytes(int(a), 32, 'big') + int.to_bytes(int(b), 32, 'big') \
@@ -73,12 +334,12 @@ def get_z(ID: bytes, P, a, b, Gx, Gy):
 
 def sm2_sign(msg, d, P=None, ID=b'1234567812345678'):
     if P is None:
-        P = point_mul(Point(Gx, Gy), d)
+        P = base_mul(d)
     Z = get_z(ID, P, a, b, Gx, Gy)
     e = int.from_bytes(sm3_hash(Z + msg.encode()), 'big')
     while True:
         k = gmpy2.mpz(random.randrange(1, int(n)))
-        P1 = point_mul(Point(Gx, Gy), k)
+        P1 = base_mul(k)
         r = (e + P1.x) % n
         if r == 0 or r + k == n:
             continue
@@ -94,6 +355,86 @@ def sm2_verify(msg, P, sig, ID=b'1234567812345678'):
     t = (r + s) % n
     if t == 0:
         return False
-    P1 = point_add(point_mul(Point(Gx, Gy), s), point_mul(P, t))
+    # sG查固定基窗口表，tP用wNAF，整个验签只求一次逆
+    P1 = multi_scalar_mul([(Point(Gx, Gy), s), (P, t)])
     R = (e + P1.x) % n
     return R == r
+
+
+# 长期使用的公钥：验签时Z值和P的窗口表只与 (公钥, ID) 有关，可以预先算好。
+# 表宽度P_TABLE_WIDTH默认4（960个点），构建耗时约相当于几次验签，之后 tP 与 sG 一样只需查表相加。
+P_TABLE_WIDTH = 4
+
+
+class VerifyingKey:
+    """单个 (公钥, ID) 的验签上下文：构造时算好Z值和P的窗口表，verify(msg, sig)与sm2_verify结果相同"""
+
+    def __init__(self, P, ID=b'1234567812345678', width=None):
+        self.P = P
+        self.ID = ID
+        self.Z = get_z(ID, P, a, b, Gx, Gy)
+        self.width = width or P_TABLE_WIDTH
+        self._table = _build_window_table(P, self.width)
+
+    def verify(self, msg, sig):
+        r, s = sig
+        e = int.from_bytes(sm3_hash(self.Z + msg.encode()), 'big')
+        t = (r + s) % n
+        if t == 0:
+            return False
+        P1 = from_jacobian(jacobian_add(jacobian_base_mul(s), _window_mul(self._table, self.width, t)))
+        R = (e + P1.x) % n
+        return R == r
+
+
+class VerifyingKeyCache:
+    """按 (公钥, ID) 缓存VerifyingKey（有界LRU）
+
+    hits、misses 记录命中和未命中次数；maxsize 为 0 时不缓存。
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, P, ID=b'1234567812345678'):
+        key = (int(P.x), int(P.y), bytes(ID))
+        with self._lock:
+            vk = self._entries.get(key)
+            if vk is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vk
+            self.misses += 1
+        vk = VerifyingKey(P, ID)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = vk
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return vk
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+verifying_key_cache = VerifyingKeyCache()
+
+
+def sm2_verify_cached(msg, P, sig, ID=b'1234567812345678'):
+    # 与sm2_verify结果相同；同一 (公钥, ID) 重复验签时跳过Z值计算和P的预计算
+    return verifying_key_cache.get(P, ID).verify(msg, sig)
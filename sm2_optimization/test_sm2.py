@@ -56,4 +56,94 @@ wrong_sig = (sig_b[0], (sig_b[1]+1)%0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21
 assert not sm2_verify_basic(msg, P_b, wrong_sig, ID_std), "基础版异常签名未检测"
 assert not sm2_verify_opt(msg, P_b, wrong_sig, ID_std), "优化版异常签名未检测"
 
+# Z和e使用真正的SM3
+print("[SM3] 杂凑函数标准向量...")
+from sm2_basic import sm3_hash as sm3_hash_basic
+from sm2_optimized import sm3_hash as sm3_hash_opt
+SM3_ABC = '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'
+assert sm3_hash_basic(b'abc').hex() == SM3_ABC, "基础版SM3结果错误"
+assert sm3_hash_opt(b'abc').hex() == SM3_ABC, "优化版SM3结果错误"
+
+# Jacobian坐标点乘与仿射点加法逐位累加的结果一致
+print("[Jacobian] 点乘与仿射加法结果一致...")
+import random
+import sm2_basic
+import sm2_optimized
+
+def affine_mul(mod, P, k):
+    R = mod.O
+    while k:
+        if k & 1:
+            R = mod.point_add(R, P)
+        P = mod.point_add(P, P)
+        k >>= 1
+    return R
+
+for mod in (sm2_basic, sm2_optimized):
+    G = mod.Point(mod.Gx, mod.Gy)
+    N = int(mod.n)
+    for k in [1, 2, 3, N - 1, N - 2] + [random.randrange(1, N) for _ in range(5)]:
+        assert mod.point_mul(G, k) == affine_mul(mod, G, k), "Jacobian点乘结果错误"
+    assert mod.point_mul(G, N) == mod.O and mod.point_mul(G, 0) == mod.O, "nG应为无穷远点"
+    assert mod.point_mul(G, N - 1) == mod.Point(mod.Gx, mod.p - mod.Gy), "(n-1)G应为-G"
+    P = mod.point_mul(G, random.randrange(1, N))
+    J = mod.jacobian_add(mod.jacobian_mul(G, 5), mod.jacobian_mul(P, 7))
+    assert mod.from_jacobian(J) == mod.point_add(mod.point_mul(G, 5), mod.point_mul(P, 7)), "Jacobian加法结果错误"
+    assert mod.from_jacobian(mod.jacobian_add(mod.to_jacobian(P), mod.jacobian_mul(P, N - 1))) == mod.O
+    assert mod.from_jacobian(mod.jacobian_add(mod.to_jacobian(P), mod.to_jacobian(P))) == mod.point_add(P, P)
+
+# 基点G的固定基窗口表与通用点乘一致（含不同窗口宽度和k >= n）
+print("[固定基] 窗口表点乘与通用点乘一致...")
+for mod in (sm2_basic, sm2_optimized):
+    G = mod.Point(mod.Gx, mod.Gy)
+    N = int(mod.n)
+    ks = [1, 2, 15, 16, N - 1, N + 5] + [random.randrange(1, N) for _ in range(4)]
+    expected = [mod.point_mul(G, k % N) for k in ks]
+    for width in (2, 5, 6):
+        mod.G_TABLE_WIDTH = width
+        assert [mod.base_mul(k) for k in ks] == expected, "固定基点乘结果错误"
+    assert mod.base_mul(0) == mod.O and mod.base_mul(N) == mod.O
+    assert len(mod.g_table()) == 43 and len(mod.g_table()[0]) == 63
+
+# 多标量乘与逐项点乘后相加一致
+print("[多标量乘] Straus/wNAF与逐项点乘一致...")
+for mod in (sm2_basic, sm2_optimized):
+    G = mod.Point(mod.Gx, mod.Gy)
+    N = int(mod.n)
+    Ps = [mod.base_mul(random.randrange(1, N)) for _ in range(4)]
+    for k in [1, 7, 31, N - 1, (1 << 200) + 1] + [random.randrange(1, N) for _ in range(5)]:
+        d = mod.wnaf(k, 5)
+        assert sum(x << i for i, x in enumerate(d)) == k and all(x == 0 or (x % 2 and abs(x) < 16) for x in d)
+    for terms in ([(Ps[0], 5)], [(G, 3), (Ps[0], N - 2)], [(Ps[0], 12345), (Ps[1], N + 9), (G, 0), (Ps[2], 1)],
+                  [(G, random.randrange(N)), (G, random.randrange(N))] + [(P, random.randrange(N)) for P in Ps]):
+        expected = mod.O
+        for P, k in terms:
+            expected = mod.point_add(expected, mod.point_mul(P, k % N))
+        assert mod.multi_scalar_mul(terms) == expected, "多标量乘结果错误"
+    assert mod.multi_scalar_mul([(Ps[0], 3), (Ps[0], N - 3)]) == mod.O
+    assert mod.multi_scalar_mul([]) == mod.O
+
+# 按公钥缓存的验签上下文与sm2_verify结果一致
+print("[验签缓存] VerifyingKey与LRU缓存...")
+for mod in (sm2_basic, sm2_optimized):
+    d, P = mod.gen_keypair()
+    sig = mod.sm2_sign(msg, d, P, ID_std)
+    sig_alt = mod.sm2_sign(msg, d, P, ID_alt)
+    vk = mod.VerifyingKey(P, ID_std)
+    assert vk.verify(msg, sig) and not vk.verify(msg, sig_alt) and not vk.verify(msg_long, sig)
+    assert not vk.verify(msg, (sig[0], (sig[1] + 1) % int(mod.n)))
+    assert mod.VerifyingKey(P, ID_alt, width=3).verify(msg, sig_alt)
+    cache = mod.VerifyingKeyCache(maxsize=2)
+    assert cache.get(P) is cache.get(P, ID_std) and cache.get(P, ID_alt) is not cache.get(P)
+    assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+    _, P2 = mod.gen_keypair()
+    cache.get(P2)                      # 淘汰最久未用的 (P, ID_alt)
+    cache.get(P, ID_alt)
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'size': 2, 'maxsize': 2, 'hit_rate': 2 / 6}
+    mod.verifying_key_cache.clear()
+    for m, s_ in ((msg, sig), (msg, sig), (msg, sig_alt)):
+        assert mod.sm2_verify_cached(m, P, s_, ID_std) == mod.sm2_verify(m, P, s_, ID_std)
+    assert mod.verifying_key_cache.get(P).Z == mod.get_z(ID_std, P, mod.a, mod.b, mod.Gx, mod.Gy)
+    assert (mod.verifying_key_cache.hits, mod.verifying_key_cache.misses) == (3, 1)
+
 print("所有详细测试通过！")
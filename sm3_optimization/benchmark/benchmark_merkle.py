@@ -0,0 +1,56 @@
+"""
+Merkle树建树性能测试：逐个追加（单线程）与多线程一次建树的对比
+
+    python benchmark/benchmark_merkle.py                      # 默认 1M 个叶子，线程数 1/2/4/CPU核数
+    python benchmark/benchmark_merkle.py -n 4000000 -t 1 8 16 -g 8192
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+import merkle
+import sm3
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='parallel Merkle tree build benchmark')
+    parser.add_argument('-n', '--count', type=int, default=1 << 20, help='number of leaves')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=sorted({1, 2, 4, cpus}),
+                        help='thread counts to try')
+    parser.add_argument('-g', '--grain', type=int, default=merkle.DEFAULT_GRAIN, help='parents per chunk')
+    parser.add_argument('-s', '--size', type=int, default=64, help='bytes per record for build_records')
+    args = parser.parse_args(argv)
+
+    n = args.count
+    data, offsets = sm3.pack(os.urandom(args.size) for _ in range(n))
+    leaves = sm3.sm3_hash_batch(data, offsets)
+    print(f"===== Merkle建树: {n} 个叶子, grain={args.grain}, CPU核数 {cpus} =====")
+
+    t, tree = _timed(lambda: merkle.MerkleTree(leaves))
+    root = tree.root()
+    print(f"{'extend 逐个追加':<28} {t:8.3f} 秒  {n / t / 1e6:8.2f} M叶子/秒")
+
+    for threads in args.threads:
+        t, tree = _timed(lambda: merkle.build(leaves, threads=threads, grain=args.grain))
+        assert tree.root() == root
+        print(f"{f'build threads={threads}':<28} {t:8.3f} 秒  {n / t / 1e6:8.2f} M叶子/秒")
+
+    for threads in args.threads:
+        t, tree = _timed(lambda: merkle.build_records(data, offsets, threads=threads, grain=args.grain))
+        assert tree.root() == root
+        print(f"{f'build_records threads={threads}':<28} {t:8.3f} 秒  {n / t / 1e6:8.2f} M叶子/秒"
+              f"  (含 {args.size} 字节记录的叶子哈希)")
+
+
+if __name__ == '__main__':
+    main()
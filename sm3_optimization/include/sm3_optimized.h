@@ -26,6 +26,12 @@ void sm3_optimized_update(sm3_optimized_ctx_t *ctx, const uint8_t *data, size_t
 void sm3_optimized_final(sm3_optimized_ctx_t *ctx, uint8_t *digest);
 void sm3_optimized_hash(const uint8_t *data, size_t len, uint8_t *digest);
 
+// 批量哈希：第i条消息为data[offsets[i], offsets[i+1])（offsets共count+1项），
+// 摘要依次写入digests + 32*i；支持AVX2时8条消息并行压缩。
+// 偏移递减或超出data_len时不做计算，返回-1，成功返回0
+int sm3_optimized_hash_batch(const uint8_t *data, size_t data_len, const size_t *offsets, size_t count,
+                             uint8_t *digests);
+
 // 辅助函数
 void sm3_optimized_print_digest(const uint8_t *digest);
 int sm3_optimized_verify(const uint8_t *data, size_t len, const uint8_t *expected_digest);
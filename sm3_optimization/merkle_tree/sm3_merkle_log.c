@@ -0,0 +1,319 @@
+#include "sm3_merkle_log.h"
+#include <stdlib.h>
+#include <string.h>
+#include <pthread.h>
+#include <unistd.h>
+#include "../include/sm3_optimized.h"
+
+// 批量验证时每次处理的证明数，限制临时缓冲区大小
+#define MERKLE_VERIFY_CHUNK 4096
+
+static void merkle_combine(const uint8_t *left, const uint8_t *right, uint8_t *out) {
+    uint8_t buf[SM3_HASH_SIZE * 2];
+    memcpy(buf, left, SM3_HASH_SIZE);
+    memcpy(buf + SM3_HASH_SIZE, right, SM3_HASH_SIZE);
+    sm3_optimized_hash(buf, SM3_HASH_SIZE * 2, out);
+}
+
+static inline uint8_t *level_node(const MerkleLog *log, int l, size_t i) {
+    return log->levels[l] + i * SM3_HASH_SIZE;
+}
+
+// 保证第l层能再放下一个节点
+static int level_reserve(MerkleLog *log, int l) {
+    size_t count = log->leaf_count >> l;
+    if (count < log->caps[l]) return 0;
+    size_t cap = log->caps[l] ? log->caps[l] * 2 : 16;
+    uint8_t *p = (uint8_t *)realloc(log->levels[l], cap * SM3_HASH_SIZE);
+    if (!p) return -1;
+    log->levels[l] = p;
+    log->caps[l] = cap;
+    return 0;
+}
+
+MerkleLog *merkle_log_new(void) {
+    return (MerkleLog *)calloc(1, sizeof(MerkleLog));
+}
+
+void merkle_log_free(MerkleLog *log) {
+    if (!log) return;
+    for (int l = 0; l < MERKLE_LOG_MAX_HEIGHT; ++l) free(log->levels[l]);
+    free(log);
+}
+
+int merkle_log_append(MerkleLog *log, const uint8_t *leaf) {
+    size_t n = log->leaf_count;
+    int top = 0;
+    // 追加后第l层节点数变为偶数时产生新的父节点，进位到第l+1层；先为途经的各层预留空间
+    while ((n >> top) & 1) ++top;
+    if (top >= MERKLE_LOG_MAX_HEIGHT) return -1;
+    for (int l = 0; l <= top; ++l) {
+        if (level_reserve(log, l) != 0) return -1;
+    }
+    uint8_t carry[SM3_HASH_SIZE];
+    memcpy(carry, leaf, SM3_HASH_SIZE);
+    for (int l = 0; ; ++l) {
+        size_t count = n >> l;
+        memcpy(level_node(log, l, count), carry, SM3_HASH_SIZE);
+        if (l == top) break;
+        merkle_combine(level_node(log, l, count - 1), carry, carry);
+    }
+    log->leaf_count = n + 1;
+    return 0;
+}
+
+size_t merkle_log_append_batch(MerkleLog *log, const uint8_t *leaves, size_t count) {
+    for (size_t i = 0; i < count; ++i) {
+        if (merkle_log_append(log, leaves + i * SM3_HASH_SIZE) != 0) return i;
+    }
+    return count;
+}
+
+size_t merkle_log_size(const MerkleLog *log) {
+    return log->leaf_count;
+}
+
+// 计算各层末尾不完整的节点：has[l]为1时partial[l]是第l层的最后一个节点。
+// 同时得到树高（层数-1）和根
+static size_t merkle_log_partials(const MerkleLog *log, uint8_t partial[][SM3_HASH_SIZE], int *has,
+                                  uint8_t *root) {
+    size_t n = log->leaf_count;
+    uint8_t h[SM3_HASH_SIZE];
+    int h_has = 0;
+    size_t l = 0;
+    for (;;) {
+        size_t full = n >> l;
+        has[l] = h_has;
+        if (h_has) memcpy(partial[l], h, SM3_HASH_SIZE);
+        if (full + (size_t)h_has == 1) {
+            memcpy(root, h_has ? h : level_node(log, (int)l, 0), SM3_HASH_SIZE);
+            return l;
+        }
+        if (full & 1) {
+            // 最后一个完整节点是左孩子；右边没有节点时与自身组合
+            const uint8_t *left = level_node(log, (int)l, full - 1);
+            merkle_combine(left, h_has ? h : left, h);
+            h_has = 1;
+        } else if (h_has) {
+            merkle_combine(h, h, h);
+        }
+        ++l;
+    }
+}
+
+size_t merkle_log_height(const MerkleLog *log) {
+    size_t height = 0;
+    while (height < MERKLE_LOG_MAX_HEIGHT && ((size_t)1 << height) < log->leaf_count) ++height;
+    return height;
+}
+
+int merkle_log_root(const MerkleLog *log, uint8_t *root) {
+    uint8_t partial[MERKLE_LOG_MAX_HEIGHT][SM3_HASH_SIZE];
+    int has[MERKLE_LOG_MAX_HEIGHT];
+    if (log->leaf_count == 0) return -1;
+    merkle_log_partials(log, partial, has, root);
+    return 0;
+}
+
+int merkle_log_prove_batch(const MerkleLog *log, const size_t *indices, size_t count, uint8_t *proofs) {
+    uint8_t partial[MERKLE_LOG_MAX_HEIGHT][SM3_HASH_SIZE];
+    int has[MERKLE_LOG_MAX_HEIGHT];
+    uint8_t root[SM3_HASH_SIZE];
+    size_t n = log->leaf_count;
+    for (size_t i = 0; i < count; ++i) {
+        if (indices[i] >= n) return -1;
+    }
+    if (count == 0) return 0;
+    size_t height = merkle_log_partials(log, partial, has, root);
+    for (size_t i = 0; i < count; ++i) {
+        uint8_t *proof = proofs + i * height * SM3_HASH_SIZE;
+        size_t idx = indices[i];
+        for (size_t l = 0; l < height; ++l) {
+            size_t full = n >> l;
+            size_t sibling = idx ^ 1;
+            if (sibling >= full + (size_t)has[l]) sibling = idx;  // 落单的节点与自身组合
+            const uint8_t *node = sibling < full ? level_node(log, (int)l, sibling) : partial[l];
+            memcpy(proof + l * SM3_HASH_SIZE, node, SM3_HASH_SIZE);
+            idx >>= 1;
+        }
+    }
+    return 0;
+}
+
+size_t merkle_log_verify_batch(const uint8_t *root, const uint8_t *leaves, const size_t *indices, size_t count,
+                               const uint8_t *proofs, size_t proof_len, uint8_t *results) {
+    size_t chunk = count < MERKLE_VERIFY_CHUNK ? count : MERKLE_VERIFY_CHUNK;
+    size_t valid = 0;
+    if (count == 0) return 0;
+    uint8_t *hashes = (uint8_t *)malloc(chunk * SM3_HASH_SIZE);
+    uint8_t *pairs = (uint8_t *)malloc(chunk * SM3_HASH_SIZE * 2);
+    size_t *offsets = (size_t *)malloc((chunk + 1) * sizeof(size_t));
+    if (!hashes || !pairs || !offsets) {
+        free(hashes);
+        free(pairs);
+        free(offsets);
+        memset(results, 0, count);
+        return 0;
+    }
+    for (size_t i = 0; i <= chunk; ++i) offsets[i] = i * SM3_HASH_SIZE * 2;
+
+    for (size_t base = 0; base < count; base += chunk) {
+        size_t m = count - base < chunk ? count - base : chunk;
+        memcpy(hashes, leaves + base * SM3_HASH_SIZE, m * SM3_HASH_SIZE);
+        for (size_t l = 0; l < proof_len; ++l) {
+            // 按索引的第l位决定当前哈希在左还是右，整层一起做批量哈希
+            for (size_t i = 0; i < m; ++i) {
+                const uint8_t *sibling = proofs + ((base + i) * proof_len + l) * SM3_HASH_SIZE;
+                uint8_t *pair = pairs + i * SM3_HASH_SIZE * 2;
+                int right = (int)((indices[base + i] >> l) & 1);
+                memcpy(pair + (right ? SM3_HASH_SIZE : 0), hashes + i * SM3_HASH_SIZE, SM3_HASH_SIZE);
+                memcpy(pair + (right ? 0 : SM3_HASH_SIZE), sibling, SM3_HASH_SIZE);
+            }
+            sm3_optimized_hash_batch(pairs, m * SM3_HASH_SIZE * 2, offsets, m, hashes);
+        }
+        for (size_t i = 0; i < m; ++i) {
+            // 索引超出证明所能表示的范围时无效
+            int ok = memcmp(hashes + i * SM3_HASH_SIZE, root, SM3_HASH_SIZE) == 0 &&
+                     (proof_len >= sizeof(size_t) * 8 || (indices[base + i] >> proof_len) == 0);
+            results[base + i] = (uint8_t)ok;
+            valid += (size_t)ok;
+        }
+    }
+    free(hashes);
+    free(pairs);
+    free(offsets);
+    return valid;
+}
+
+// ========== 并行建树 ==========
+
+// 把[0, n)分成grain大小的段，由至多threads个线程（含调用线程）领取执行fn(ctx, begin, end)
+typedef struct {
+    void (*fn)(void *ctx, size_t begin, size_t end);
+    void *ctx;
+    size_t n, grain, next;
+    pthread_mutex_t lock;
+} parallel_job_t;
+
+static void *parallel_worker(void *arg) {
+    parallel_job_t *job = (parallel_job_t *)arg;
+    for (;;) {
+        pthread_mutex_lock(&job->lock);
+        size_t begin = job->next;
+        job->next = begin < job->n ? begin + job->grain : begin;
+        pthread_mutex_unlock(&job->lock);
+        if (begin >= job->n) return NULL;
+        size_t end = job->n - begin < job->grain ? job->n : begin + job->grain;
+        job->fn(job->ctx, begin, end);
+    }
+}
+
+static void parallel_for(size_t n, unsigned threads, size_t grain, void (*fn)(void *, size_t, size_t), void *ctx) {
+    size_t chunks = (n + grain - 1) / grain;
+    if (threads > chunks) threads = (unsigned)chunks;
+    if (threads <= 1) {
+        // 单段或单线程时直接在调用线程中执行，不创建线程
+        for (size_t begin = 0; begin < n; begin += grain) {
+            fn(ctx, begin, n - begin < grain ? n : begin + grain);
+        }
+        return;
+    }
+    parallel_job_t job = {fn, ctx, n, grain, 0, PTHREAD_MUTEX_INITIALIZER};
+    pthread_t *tids = (pthread_t *)malloc(sizeof(pthread_t) * (threads - 1));
+    unsigned started = 0;
+    while (tids && started < threads - 1 && pthread_create(&tids[started], NULL, parallel_worker, &job) == 0) {
+        ++started;
+    }
+    parallel_worker(&job);
+    for (unsigned i = 0; i < started; ++i) pthread_join(tids[i], NULL);
+    free(tids);
+    pthread_mutex_destroy(&job.lock);
+}
+
+// 一段连续的消息做批量哈希：消息i为base[offsets[i]-offsets[begin] ...]，偏移数组按段临时生成
+typedef struct {
+    const uint8_t *data;
+    const size_t *offsets;   // NULL表示定长消息，长度为stride
+    size_t stride;
+    uint8_t *out;
+} hash_range_t;
+
+static void hash_range(void *arg, size_t begin, size_t end) {
+    hash_range_t *job = (hash_range_t *)arg;
+    size_t m = end - begin;
+    size_t *offsets = (size_t *)malloc((m + 1) * sizeof(size_t));
+    if (offsets) {
+        for (size_t i = 0; i <= m; ++i) {
+            offsets[i] = job->offsets ? job->offsets[begin + i] - job->offsets[begin] : i * job->stride;
+        }
+        size_t start = job->offsets ? job->offsets[begin] : begin * job->stride;
+        sm3_optimized_hash_batch(job->data + start, offsets[m], offsets, m, job->out + begin * SM3_HASH_SIZE);
+        free(offsets);
+        return;
+    }
+    // 内存不足时退回逐条计算
+    for (size_t i = begin; i < end; ++i) {
+        size_t start = job->offsets ? job->offsets[i] : i * job->stride;
+        size_t len = job->offsets ? job->offsets[i + 1] - start : job->stride;
+        sm3_optimized_hash(job->data + start, len, job->out + i * SM3_HASH_SIZE);
+    }
+}
+
+static unsigned default_threads(unsigned threads) {
+    if (threads) return threads;
+    long n = sysconf(_SC_NPROCESSORS_ONLN);
+    return n > 0 ? (unsigned)n : 1;
+}
+
+// 第0层已填好时，逐层并行计算完整的父节点
+static MerkleLog *merkle_log_build_levels(MerkleLog *log, size_t count, unsigned threads, size_t grain) {
+    log->leaf_count = count;
+    for (int l = 0; l + 1 < MERKLE_LOG_MAX_HEIGHT && (count >> (l + 1)) > 0; ++l) {
+        size_t parents = count >> (l + 1);
+        log->levels[l + 1] = (uint8_t *)malloc(parents * SM3_HASH_SIZE);
+        if (!log->levels[l + 1]) {
+            merkle_log_free(log);
+            return NULL;
+        }
+        log->caps[l + 1] = parents;
+        // 第l层的第2i、2i+1个节点恰好是连续的64字节，直接作为第i条消息
+        hash_range_t job = {log->levels[l], NULL, SM3_HASH_SIZE * 2, log->levels[l + 1]};
+        parallel_for(parents, threads, grain, hash_range, &job);
+    }
+    return log;
+}
+
+static MerkleLog *merkle_log_alloc_leaves(size_t count) {
+    if (count == 0) return NULL;
+    MerkleLog *log = merkle_log_new();
+    if (!log) return NULL;
+    log->levels[0] = (uint8_t *)malloc(count * SM3_HASH_SIZE);
+    if (!log->levels[0]) {
+        free(log);
+        return NULL;
+    }
+    log->caps[0] = count;
+    return log;
+}
+
+MerkleLog *merkle_log_build(const uint8_t *leaves, size_t count, unsigned threads, size_t grain) {
+    MerkleLog *log = merkle_log_alloc_leaves(count);
+    if (!log) return NULL;
+    memcpy(log->levels[0], leaves, count * SM3_HASH_SIZE);
+    return merkle_log_build_levels(log, count, default_threads(threads), grain ? grain : MERKLE_LOG_DEFAULT_GRAIN);
+}
+
+MerkleLog *merkle_log_build_records(const uint8_t *data, size_t data_len, const size_t *offsets, size_t count,
+                                    unsigned threads, size_t grain) {
+    for (size_t i = 0; i < count; ++i) {
+        if (offsets[i] > offsets[i + 1]) return NULL;
+    }
+    if (count > 0 && offsets[count] > data_len) return NULL;
+    MerkleLog *log = merkle_log_alloc_leaves(count);
+    if (!log) return NULL;
+    threads = default_threads(threads);
+    grain = grain ? grain : MERKLE_LOG_DEFAULT_GRAIN;
+    hash_range_t job = {data, offsets, 0, log->levels[0]};
+    parallel_for(count, threads, grain, hash_range, &job);
+    return merkle_log_build_levels(log, count, threads, grain);
+}
@@ -0,0 +1,46 @@
+#ifndef SM3_MERKLE_LOG_H
+#define SM3_MERKLE_LOG_H
+#include <stdint.h>
+#include <stddef.h>
+#include "sm3_merkle_tree.h"
+
+#define MERKLE_LOG_MAX_HEIGHT 64
+
+// 只追加的Merkle树（审计日志）
+// 与merkle_tree_build相同的树形：父节点为SM3(左 || 右)，每层末尾落单的节点与自身组合。
+// 每层只保存已经完整的节点（第l层共 leaf_count >> l 个），追加叶子时沿进位路径更新O(log n)个节点；
+// 末尾不完整的节点在求根和生成证明时由各层最后一个完整节点临时算出，同样是O(log n)次哈希。
+typedef struct {
+    uint8_t *levels[MERKLE_LOG_MAX_HEIGHT];  // levels[l]：第l层的完整节点，每个SM3_HASH_SIZE字节
+    size_t caps[MERKLE_LOG_MAX_HEIGHT];      // levels[l]已分配的节点数
+    size_t leaf_count;
+} MerkleLog;
+
+MerkleLog *merkle_log_new(void);
+void merkle_log_free(MerkleLog *log);
+// 追加一个叶子哈希；内存不足时返回-1且树不变
+int merkle_log_append(MerkleLog *log, const uint8_t *leaf);
+// 依次追加count个连续存放的叶子哈希，返回成功追加的个数
+size_t merkle_log_append_batch(MerkleLog *log, const uint8_t *leaves, size_t count);
+size_t merkle_log_size(const MerkleLog *log);
+// 证明长度（树高）；叶子数为n时为ceil(log2 n)，所有叶子的证明等长
+size_t merkle_log_height(const MerkleLog *log);
+// 根哈希；空树返回-1
+int merkle_log_root(const MerkleLog *log, uint8_t *root);
+// 为count个叶子生成存在性证明，第i个证明占proofs + i*height*SM3_HASH_SIZE；有越界索引时返回-1
+int merkle_log_prove_batch(const MerkleLog *log, const size_t *indices, size_t count, uint8_t *proofs);
+// 批量验证count个等长证明（leaves、proofs连续存放），results[i]为1表示通过，返回通过的个数。
+// 同一层的组合在所有证明间用批量SM3一次算完
+size_t merkle_log_verify_batch(const uint8_t *root, const uint8_t *leaves, const size_t *indices, size_t count,
+                               const uint8_t *proofs, size_t proof_len, uint8_t *results);
+
+// 由count个连续存放的叶子哈希一次建树（结果同逐个追加，之后仍可追加）。
+// 每层的父节点分成grain个一段，由至多threads个线程领取计算；段内用批量SM3。
+// threads为0时使用在线CPU数，grain为0时使用MERKLE_LOG_DEFAULT_GRAIN；失败返回NULL
+#define MERKLE_LOG_DEFAULT_GRAIN 4096
+MerkleLog *merkle_log_build(const uint8_t *leaves, size_t count, unsigned threads, size_t grain);
+// 同上，但叶子为原始记录：第i个叶子为SM3(data[offsets[i], offsets[i+1]))，叶子哈希同样分段并行计算
+MerkleLog *merkle_log_build_records(const uint8_t *data, size_t data_len, const size_t *offsets, size_t count,
+                                    unsigned threads, size_t grain);
+
+#endif // SM3_MERKLE_LOG_H
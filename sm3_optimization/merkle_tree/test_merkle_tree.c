@@ -3,6 +3,7 @@
 #include <stdlib.h>
 #include <string.h>
 #include "../include/sm3_basic.h"
+#include "sm3_merkle_log.h"
 
 #define LEAF_COUNT 100000
 
@@ -45,6 +46,70 @@ int main() {
     int nonok = merkle_tree_verify_non_inclusion(root, not_exist_hash, LEAF_COUNT, nonproof, nonproof_len, neighbor_idx);
     printf("不存在性证明验证: %s\n", nonok ? "成功" : "失败");
 
+    // 6. 逐个追加叶子的增量树：根和证明应与整树构建一致
+    MerkleLog *log = merkle_log_new();
+    int log_ok = log != NULL;
+    for (size_t i = 0; log_ok && i < LEAF_COUNT; ++i) {
+        log_ok = merkle_log_append(log, leaves[i]) == 0;
+        // 前300个规模逐一与整树构建的根比较，覆盖各种落单节点的情况
+        if (log_ok && i < 300) {
+            uint8_t expected[SM3_HASH_SIZE], got[SM3_HASH_SIZE];
+            MerkleTree *small = merkle_tree_build(leaves, i + 1);
+            merkle_tree_get_root(small, expected);
+            merkle_tree_free(small);
+            log_ok = merkle_log_root(log, got) == 0 && memcmp(expected, got, SM3_HASH_SIZE) == 0;
+        }
+    }
+    uint8_t log_root[SM3_HASH_SIZE];
+    log_ok = log_ok && merkle_log_root(log, log_root) == 0 && memcmp(log_root, root, SM3_HASH_SIZE) == 0;
+    printf("增量追加根哈希一致: %s\n", log_ok ? "成功" : "失败");
+
+    size_t indices[] = {0, 1, 88887, LEAF_COUNT - 2, LEAF_COUNT - 1};
+    size_t nindices = sizeof(indices) / sizeof(indices[0]);
+    size_t height = merkle_log_height(log);
+    uint8_t (*proofs)[SM3_HASH_SIZE] = malloc(nindices * height * SM3_HASH_SIZE);
+    uint8_t batch_leaves[5][SM3_HASH_SIZE];
+    uint8_t results[5];
+    int batch_ok = height == proof_len && merkle_log_prove_batch(log, indices, nindices, proofs[0]) == 0;
+    for (size_t i = 0; batch_ok && i < nindices; ++i) {
+        uint8_t single[32][SM3_HASH_SIZE];
+        size_t len = merkle_tree_prove_inclusion(tree, indices[i], single);
+        batch_ok = len == height && memcmp(single, proofs[i * height], height * SM3_HASH_SIZE) == 0;
+        memcpy(batch_leaves[i], leaves[indices[i]], SM3_HASH_SIZE);
+    }
+    batch_ok = batch_ok && merkle_log_verify_batch(root, batch_leaves[0], indices, nindices, proofs[0], height,
+                                                   results) == nindices;
+    // 篡改一个证明后只有它验证失败
+    proofs[2 * height][0] ^= 1;
+    batch_ok = batch_ok && merkle_log_verify_batch(root, batch_leaves[0], indices, nindices, proofs[0], height,
+                                                   results) == nindices - 1 && results[2] == 0;
+    printf("批量存在性证明生成与验证: %s\n", batch_ok ? "成功" : "失败");
+    free(proofs);
+
+    // 7. 并行一次建树（多线程、小分段）：根与逐个追加相同，且之后仍可追加
+    uint8_t built_root[SM3_HASH_SIZE], appended_root[SM3_HASH_SIZE];
+    MerkleLog *built = merkle_log_build(leaves[0], LEAF_COUNT - 1, 4, 1000);
+    int build_ok = built != NULL && merkle_log_append(built, leaves[LEAF_COUNT - 1]) == 0 &&
+                   merkle_log_root(built, built_root) == 0 && memcmp(built_root, root, SM3_HASH_SIZE) == 0;
+    merkle_log_free(built);
+    // 由原始记录建树：叶子哈希也在各线程中批量计算
+    char *records = malloc(LEAF_COUNT * 10);
+    size_t *offsets = malloc((LEAF_COUNT + 1) * sizeof(size_t));
+    offsets[0] = 0;
+    for (size_t i = 0; i < LEAF_COUNT; ++i) {
+        snprintf(buf, sizeof(buf), "leaf%06zu", i+1);
+        memcpy(records + i * 10, buf, 10);
+        offsets[i + 1] = (i + 1) * 10;
+    }
+    built = merkle_log_build_records((uint8_t *)records, LEAF_COUNT * 10, offsets, LEAF_COUNT, 3, 777);
+    build_ok = build_ok && built != NULL && merkle_log_root(built, built_root) == 0 &&
+               merkle_log_root(log, appended_root) == 0 && memcmp(built_root, appended_root, SM3_HASH_SIZE) == 0;
+    merkle_log_free(built);
+    free(records);
+    free(offsets);
+    printf("并行建树根哈希一致: %s\n", build_ok ? "成功" : "失败");
+    merkle_log_free(log);
+
     merkle_tree_free(tree);
     return 0;
 } 
\ No newline at end of file
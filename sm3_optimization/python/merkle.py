@@ -0,0 +1,198 @@
+"""
+SM3 Merkle树的Python绑定（ctypes调用build/libsm3.so中的merkle_log_*）
+
+树形与merkle_tree/sm3_merkle_tree.c一致：叶子为32字节哈希，父节点为SM3(左 || 右)，
+每层末尾落单的节点与自身组合。树只追加，适合审计日志：
+
+    tree = MerkleTree()
+    tree.append(sm3_hash(record))       # 只更新O(log n)个节点，返回叶子索引
+    tree.extend(packed_leaves)          # 连续存放的多个叶子，一次C调用
+    root = tree.root()
+
+    tree = build(packed_leaves, threads=8)          # 多线程一次建树，之后仍可追加
+    tree = build_records(data, offsets, threads=8)  # 叶子为SM3(记录)，叶子哈希也并行批量计算
+
+    proofs = tree.prove_batch(indices)  # len(indices) * height * 32 字节
+    verify_batch(root, leaves, indices, proofs)   # 同一层的组合在所有证明间批量哈希
+"""
+
+import ctypes
+import os
+
+from sm3 import DIGEST_SIZE, _in_ptr, _lib, _offsets_ptr, _pylib
+
+HASH_SIZE = DIGEST_SIZE
+DEFAULT_GRAIN = 4096
+
+
+def _bind(lib):
+    log_p = ctypes.c_void_p
+    lib.merkle_log_new.argtypes = []
+    lib.merkle_log_new.restype = log_p
+    lib.merkle_log_free.argtypes = [log_p]
+    lib.merkle_log_free.restype = None
+    lib.merkle_log_append.argtypes = [log_p, ctypes.c_void_p]
+    lib.merkle_log_append.restype = ctypes.c_int
+    lib.merkle_log_append_batch.argtypes = [log_p, ctypes.c_void_p, ctypes.c_size_t]
+    lib.merkle_log_append_batch.restype = ctypes.c_size_t
+    lib.merkle_log_size.argtypes = [log_p]
+    lib.merkle_log_size.restype = ctypes.c_size_t
+    lib.merkle_log_height.argtypes = [log_p]
+    lib.merkle_log_height.restype = ctypes.c_size_t
+    lib.merkle_log_root.argtypes = [log_p, ctypes.c_void_p]
+    lib.merkle_log_root.restype = ctypes.c_int
+    lib.merkle_log_prove_batch.argtypes = [log_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    lib.merkle_log_prove_batch.restype = ctypes.c_int
+    lib.merkle_log_verify_batch.argtypes = [ctypes.c_char_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t,
+                                            ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    lib.merkle_log_verify_batch.restype = ctypes.c_size_t
+    lib.merkle_log_build.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_size_t]
+    lib.merkle_log_build.restype = log_p
+    lib.merkle_log_build_records.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t,
+                                             ctypes.c_uint, ctypes.c_size_t]
+    lib.merkle_log_build_records.restype = log_p
+
+
+_bind(_lib)
+_bind(_pylib)
+
+
+def _leaf_buffer(leaves):
+    """叶子可以是连续存放的缓冲区，或32字节哈希的序列"""
+    if isinstance(leaves, (list, tuple)):
+        leaves = b''.join(leaves)
+    ptr, n = _in_ptr(leaves)
+    if n % HASH_SIZE:
+        raise ValueError('leaves must be a multiple of 32 bytes')
+    return ptr, n // HASH_SIZE
+
+
+class MerkleTree:
+    def __init__(self, leaves=None):
+        self._log = _pylib.merkle_log_new()
+        if not self._log:
+            raise MemoryError
+        if leaves is not None:
+            self.extend(leaves)
+
+    @classmethod
+    def _wrap(cls, log):
+        tree = cls.__new__(cls)
+        tree._log = log
+        return tree
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        log, self._log = getattr(self, '_log', None), None
+        if log:
+            _pylib.merkle_log_free(log)
+
+    def __len__(self):
+        return _pylib.merkle_log_size(self._log)
+
+    @property
+    def height(self) -> int:
+        """证明长度（哈希个数），所有叶子相同"""
+        return _pylib.merkle_log_height(self._log)
+
+    def append(self, leaf) -> int:
+        """追加一个32字节叶子哈希，返回它的索引"""
+        ptr, n = _in_ptr(leaf)
+        if n != HASH_SIZE:
+            raise ValueError('leaf must be 32 bytes')
+        if _pylib.merkle_log_append(self._log, ptr) != 0:
+            raise MemoryError
+        return len(self) - 1
+
+    def extend(self, leaves):
+        """依次追加多个叶子（连续存放的缓冲区或32字节哈希的序列），C计算期间释放GIL"""
+        ptr, count = _leaf_buffer(leaves)
+        if _lib.merkle_log_append_batch(self._log, ptr, count) != count:
+            raise MemoryError
+
+    def root(self) -> bytes:
+        out = ctypes.create_string_buffer(HASH_SIZE)
+        if _pylib.merkle_log_root(self._log, out) != 0:
+            raise ValueError('empty tree')
+        return out.raw
+
+    def prove_batch(self, indices, out=None):
+        """为多个叶子生成存在性证明，第i个证明为结果的[i*height*32, (i+1)*height*32)字节"""
+        optr, count = _offsets_ptr(indices)
+        size = count * self.height * HASH_SIZE
+        if out is None:
+            out = bytearray(size)
+        mv = memoryview(out)
+        if mv.readonly or not mv.c_contiguous or mv.nbytes < size:
+            raise ValueError('output buffer must be writable, C-contiguous and hold count*height*32 bytes')
+        if count and _lib.merkle_log_prove_batch(self._log, optr, count,
+                                                 (ctypes.c_char * mv.nbytes).from_buffer(mv.cast('B'))) != 0:
+            raise IndexError('leaf index out of range')
+        return out
+
+    def prove(self, index: int) -> list:
+        """单个叶子的存在性证明，自底向上的兄弟节点哈希列表"""
+        proof = bytes(self.prove_batch([index]))
+        return [proof[i:i + HASH_SIZE] for i in range(0, len(proof), HASH_SIZE)]
+
+
+def _threads(threads):
+    return threads or os.cpu_count() or 1
+
+
+def build(leaves, threads=None, grain=DEFAULT_GRAIN) -> MerkleTree:
+    """由连续存放的叶子哈希一次建树（与逐个append结果相同）
+
+    每层的父节点按grain个一段分给threads个线程（默认CPU核数），段内用批量SM3；
+    整个建树在一次C调用中完成，期间释放GIL。
+    """
+    ptr, count = _leaf_buffer(leaves)
+    if count == 0:
+        return MerkleTree()
+    log = _lib.merkle_log_build(ptr, count, _threads(threads), grain)
+    if not log:
+        raise MemoryError
+    return MerkleTree._wrap(log)
+
+
+def build_records(data, offsets, threads=None, grain=DEFAULT_GRAIN) -> MerkleTree:
+    """由原始记录建树：第i个叶子为SM3(data[offsets[i]:offsets[i+1]])，叶子哈希同样多线程批量计算"""
+    ptr, n = _in_ptr(data)
+    optr, noffsets = _offsets_ptr(offsets)
+    count = max(noffsets - 1, 0)
+    if count == 0:
+        return MerkleTree()
+    log = _lib.merkle_log_build_records(ptr, n, optr, count, _threads(threads), grain)
+    if not log:
+        raise ValueError('invalid offsets or out of memory')
+    return MerkleTree._wrap(log)
+
+
+def verify_batch(root: bytes, leaves, indices, proofs, proof_len=None) -> list:
+    """批量验证等长的存在性证明，返回每个证明是否通过的列表
+
+    leaves、proofs为连续存放的缓冲区（或哈希序列）；proof_len默认由proofs长度推出。
+    """
+    if len(root) != HASH_SIZE:
+        raise ValueError('root must be 32 bytes')
+    lptr, count = _leaf_buffer(leaves)
+    optr, nindices = _offsets_ptr(indices)
+    pptr, nproofs = _leaf_buffer(proofs)
+    if nindices != count:
+        raise ValueError('leaves and indices differ in length')
+    if count == 0:
+        return []
+    if proof_len is None:
+        proof_len = nproofs // count
+    if nproofs != count * proof_len:
+        raise ValueError('proofs must hold count*proof_len hashes')
+    results = (ctypes.c_uint8 * count)()
+    _lib.merkle_log_verify_batch(root, lptr, optr, count, pptr, proof_len, results)
+    return [bool(r) for r in results]
+
+
+def verify_inclusion(root: bytes, leaf: bytes, index: int, proof) -> bool:
+    """验证单个存在性证明（proof为哈希列表或连续存放的缓冲区）"""
+    return verify_batch(root, [leaf], [index], proof, len(proof) if isinstance(proof, (list, tuple)) else None)[0]
@@ -0,0 +1,189 @@
+"""
+SM3的Python绑定（ctypes调用build/libsm3.so中的优化版本）
+
+接口与hashlib一致：
+
+    h = SM3(b'abc')
+    h.update(more)
+    h.digest()          # 32字节；不改变状态，可继续update
+    h.hexdigest()
+    h2 = h.copy()
+
+    sm3_hash(data)      # 一次性计算，数据在C中一次处理完
+
+    # 大量短消息：一次C调用算完，摘要连续存放
+    data, offsets = pack(messages)
+    digests = sm3_hash_batch(data, offsets)     # len(messages) * 32 字节
+    sm3_hash_many(messages)                     # 同上，返回摘要列表
+
+动态库不存在时导入失败（ImportError），需先在sm3_optimization目录执行 make libsm3.so。
+小于GIL_THRESHOLD字节的update走PyDLL（不释放GIL，省去释放/重新获取的开销），
+较大的update与一次性计算走CDLL，C计算期间释放GIL，其他线程可以并行哈希。
+"""
+
+import ctypes
+import itertools
+import os
+import sys
+from array import array
+
+DIGEST_SIZE = 32
+BLOCK_SIZE = 64
+GIL_THRESHOLD = 2048
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Context(ctypes.Structure):
+    # 与sm3_optimized_ctx_t一致
+    _fields_ = [
+        ('state', ctypes.c_uint32 * 8),
+        ('count', ctypes.c_uint64),
+        ('buffer', ctypes.c_uint8 * BLOCK_SIZE),
+        ('buffer_len', ctypes.c_size_t),
+    ]
+
+
+def _lib_path():
+    if sys.platform.startswith('darwin'):
+        libname = 'libsm3.dylib'
+    elif sys.platform.startswith('win'):
+        libname = 'sm3.dll'
+    else:
+        libname = 'libsm3.so'
+    return os.path.join(_ROOT, 'build', libname)
+
+
+def _bind(lib):
+    ctx_p = ctypes.POINTER(_Context)
+    lib.sm3_optimized_init.argtypes = [ctx_p]
+    lib.sm3_optimized_init.restype = None
+    lib.sm3_optimized_update.argtypes = [ctx_p, ctypes.c_void_p, ctypes.c_size_t]
+    lib.sm3_optimized_update.restype = None
+    lib.sm3_optimized_final.argtypes = [ctx_p, ctypes.c_void_p]
+    lib.sm3_optimized_final.restype = None
+    lib.sm3_optimized_hash.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    lib.sm3_optimized_hash.restype = None
+    lib.sm3_optimized_hash_batch.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t,
+                                             ctypes.c_void_p]
+    lib.sm3_optimized_hash_batch.restype = ctypes.c_int
+    return lib
+
+
+def load_library(path=None):
+    """返回(CDLL, PyDLL)两个句柄；默认路径下没有动态库时抛出ImportError（导入时不调用编译器）"""
+    if path is None:
+        path = _lib_path()
+        if not os.path.exists(path):
+            raise ImportError(f"SM3 shared library not found at {path}; run 'make libsm3.so' in {_ROOT}")
+    return _bind(ctypes.CDLL(path)), _bind(ctypes.PyDLL(path))
+
+
+_lib, _pylib = load_library()
+
+# 与C的size_t对应的array类型码
+_SIZE_T_CODE = next(code for code in 'ILQ' if array(code).itemsize == ctypes.sizeof(ctypes.c_size_t))
+
+
+def _in_ptr(data):
+    """返回可传给C的只读缓冲区指针和字节长度（bytes直接传递，不复制）"""
+    if isinstance(data, bytes):
+        return data, len(data)
+    mv = memoryview(data)
+    if not mv.c_contiguous:
+        raise ValueError('buffer must be C-contiguous')
+    mv = mv.cast('B')
+    if mv.readonly:
+        return mv.tobytes(), mv.nbytes
+    return (ctypes.c_char * mv.nbytes).from_buffer(mv), mv.nbytes
+
+
+class SM3:
+    name = 'sm3'
+    digest_size = DIGEST_SIZE
+    block_size = BLOCK_SIZE
+
+    def __init__(self, data=b''):
+        self._ctx = _Context()
+        _pylib.sm3_optimized_init(self._ctx)
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        ptr, n = _in_ptr(data)
+        if n:
+            (_lib if n >= GIL_THRESHOLD else _pylib).sm3_optimized_update(self._ctx, ptr, n)
+
+    def digest(self) -> bytes:
+        # final会修改上下文，在副本上计算
+        ctx = _Context.from_buffer_copy(self._ctx)
+        out = ctypes.create_string_buffer(DIGEST_SIZE)
+        _pylib.sm3_optimized_final(ctx, out)
+        return out.raw
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def copy(self):
+        other = SM3.__new__(SM3)
+        other._ctx = _Context.from_buffer_copy(self._ctx)
+        return other
+
+
+def new(data=b''):
+    return SM3(data)
+
+
+def sm3_hash(data) -> bytes:
+    """一次性计算SM3摘要"""
+    ptr, n = _in_ptr(data)
+    out = ctypes.create_string_buffer(DIGEST_SIZE)
+    (_lib if n >= GIL_THRESHOLD else _pylib).sm3_optimized_hash(ptr, n, out)
+    return out.raw
+
+
+def pack(messages):
+    """把消息列表拼接为(data, offsets)，供sm3_hash_batch使用"""
+    messages = list(messages)
+    offsets = array(_SIZE_T_CODE, [0])
+    offsets.extend(itertools.accumulate(map(len, messages)))
+    return b''.join(messages), offsets
+
+
+def _offsets_ptr(offsets):
+    try:
+        mv = memoryview(offsets)
+    except TypeError:
+        offsets = array(_SIZE_T_CODE, offsets)
+        mv = memoryview(offsets)
+    if mv.itemsize != ctypes.sizeof(ctypes.c_size_t) or mv.format[-1] not in 'ILNQilnq' or not mv.c_contiguous:
+        raise ValueError('offsets must be a contiguous array of size_t')
+    ptr, _ = _in_ptr(mv)
+    return ptr, len(mv)
+
+
+def sm3_hash_batch(data, offsets, out=None):
+    """批量计算：第i条消息为data[offsets[i]:offsets[i+1]]，offsets共count+1项
+
+    offsets可以是整数序列，或元素大小与size_t相同的array/numpy数组（不复制）；
+    摘要依次写入out（至少count*32字节的可写缓冲区），未给出时返回新的bytearray。
+    计算在一次C调用中完成，期间释放GIL。
+    """
+    ptr, n = _in_ptr(data)
+    optr, noffsets = _offsets_ptr(offsets)
+    count = max(noffsets - 1, 0)
+    if out is None:
+        out = bytearray(count * DIGEST_SIZE)
+    mv = memoryview(out)
+    if mv.readonly or not mv.c_contiguous or mv.nbytes < count * DIGEST_SIZE:
+        raise ValueError('output buffer must be writable, C-contiguous and hold count*32 bytes')
+    if count and _lib.sm3_optimized_hash_batch(ptr, n, optr, count,
+                                               (ctypes.c_char * mv.nbytes).from_buffer(mv.cast('B'))) != 0:
+        raise ValueError('invalid offsets')
+    return out
+
+
+def sm3_hash_many(messages) -> list:
+    """计算多条消息的摘要，返回32字节摘要的列表"""
+    digests = bytes(sm3_hash_batch(*pack(messages)))
+    return [digests[i:i + DIGEST_SIZE] for i in range(0, len(digests), DIGEST_SIZE)]
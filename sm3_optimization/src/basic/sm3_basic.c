@@ -172,8 +172,9 @@ void sm3_final(sm3_ctx_t *ctx, uint8_t *digest) {
     if (rest > 56) {
         memset(block + rest, 0, SM3_BLOCK_SIZE - rest);
         sm3_compress(ctx->state, block);
+        // 长度写在新块的最后8字节
         memset(block, 0, 56);
-        rest = 0;
+        rest = 56;
     } else {
         memset(block + rest, 0, 56 - rest);
         rest = 56;
@@ -2,6 +2,9 @@
 #include "sm3_optimized.h"
 #include <string.h>
 #include <stdio.h>
+#ifdef __AVX2__
+#include <immintrin.h>
+#endif
 
 // SM3初始向量（大端序）
 const uint32_t SM3_OPTIMIZED_IV[SM3_OPTIMIZED_STATE_SIZE] = {
@@ -9,18 +12,6 @@ const uint32_t SM3_OPTIMIZED_IV[SM3_OPTIMIZED_STATE_SIZE] = {
     0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E
 };
 
-// SM3常量T
-static const uint32_t T_optimized[64] = {
-    0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519,
-    0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519, 0x79CC4519,
-    0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A,
-    0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A,
-    0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A,
-    0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A,
-    0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A,
-    0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A, 0x7A879D8A
-};
-
 // 字节序转换函数
 static inline uint32_t bytes_to_word_optimized(const uint8_t *bytes) {
     return ((uint32_t)bytes[0] << 24) | ((uint32_t)bytes[1] << 16) |
@@ -39,25 +30,6 @@ static inline uint32_t rotate_left_optimized(uint32_t x, int n) {
     return (x << n) | (x >> (32 - n));
 }
 
-// 优化的布尔函数，使用位运算技巧
-static inline uint32_t FF_opt(uint32_t x, uint32_t y, uint32_t z, int j) {
-    if (j < 16) {
-        return x ^ y ^ z;
-    } else {
-        // (x & y) | (x & z) | (y & z) = (x & (y | z)) | (y & z)
-        return (x & (y | z)) | (y & z);
-    }
-}
-
-static inline uint32_t GG_opt(uint32_t x, uint32_t y, uint32_t z, int j) {
-    if (j < 16) {
-        return x ^ y ^ z;
-    } else {
-        // (x & y) | (~x & z) = (x & y) | ((~x) & z)
-        return (x & y) | ((~x) & z);
-    }
-}
-
 // SM3置换函数
 static inline uint32_t P0_optimized(uint32_t x) {
     return x ^ rotate_left_optimized(x, 9) ^ rotate_left_optimized(x, 17);
@@ -67,54 +39,71 @@ static inline uint32_t P1_optimized(uint32_t x) {
     return x ^ rotate_left_optimized(x, 15) ^ rotate_left_optimized(x, 23);
 }
 
-// 修复后的消息扩展
-static void message_expansion_optimized(const uint8_t *block, uint32_t *W, uint32_t *W1) {
-    int i;
-    
-    // 前16个字直接复制并转换字节序
-    for (i = 0; i < 16; i++) {
-        W[i] = bytes_to_word_optimized(block + i * 4);
-    }
-    
-    // 扩展剩余52个字，保持正确的依赖关系
-    for (i = 16; i < 68; i++) {
-        uint32_t temp = W[i-16] ^ W[i-9] ^ rotate_left_optimized(W[i-3], 15);
-        W[i] = P1_optimized(temp) ^ rotate_left_optimized(W[i-13], 7) ^ W[i-6];
-    }
-    
-    // 计算W'
-    for (i = 0; i < 64; i++) {
-        W1[i] = W[i] ^ W[i+4];
-    }
-}
+// 预先循环左移好的常量 T_j <<< (j mod 32)，避免每轮计算移位
+static const uint32_t T_rotated[64] = {
+    0x79CC4519, 0xF3988A32, 0xE7311465, 0xCE6228CB, 0x9CC45197, 0x3988A32F, 0x7311465E, 0xE6228CBC,
+    0xCC451979, 0x988A32F3, 0x311465E7, 0x6228CBCE, 0xC451979C, 0x88A32F39, 0x11465E73, 0x228CBCE6,
+    0x9D8A7A87, 0x3B14F50F, 0x7629EA1E, 0xEC53D43C, 0xD8A7A879, 0xB14F50F3, 0x629EA1E7, 0xC53D43CE,
+    0x8A7A879D, 0x14F50F3B, 0x29EA1E76, 0x53D43CEC, 0xA7A879D8, 0x4F50F3B1, 0x9EA1E762, 0x3D43CEC5,
+    0x7A879D8A, 0xF50F3B14, 0xEA1E7629, 0xD43CEC53, 0xA879D8A7, 0x50F3B14F, 0xA1E7629E, 0x43CEC53D,
+    0x879D8A7A, 0x0F3B14F5, 0x1E7629EA, 0x3CEC53D4, 0x79D8A7A8, 0xF3B14F50, 0xE7629EA1, 0xCEC53D43,
+    0x9D8A7A87, 0x3B14F50F, 0x7629EA1E, 0xEC53D43C, 0xD8A7A879, 0xB14F50F3, 0x629EA1E7, 0xC53D43CE,
+    0x8A7A879D, 0x14F50F3B, 0x29EA1E76, 0x53D43CEC, 0xA7A879D8, 0x4F50F3B1, 0x9EA1E762, 0x3D43CEC5
+};
+
+// 消息扩展 W[i]
+#define SM3_EXPAND(i)                                                            \
+    (W[i] = P1_optimized(W[(i)-16] ^ W[(i)-9] ^ rotate_left_optimized(W[(i)-3], 15)) \
+            ^ rotate_left_optimized(W[(i)-13], 7) ^ W[(i)-6])
+
+// 一轮迭代；FF/GG按轮号分为两组，由调用处选定，循环内不再分支。
+// 第j轮顺带扩展第j+20个字，与压缩交错执行，扩展与轮函数的指令可以并行
+#define SM3_ROUND(A, B, C, D, E, F, G, H, FF, GG, j) do {                      \
+    if ((j) + 20 < 68) SM3_EXPAND((j) + 20);                                 \
+    uint32_t A12 = rotate_left_optimized(A, 12);                             \
+    uint32_t SS1 = rotate_left_optimized(A12 + E + T_rotated[j], 7);         \
+    uint32_t SS2 = SS1 ^ A12;                                                \
+    uint32_t TT1 = FF(A, B, C) + D + SS2 + (W[j] ^ W[(j) + 4]);              \
+    uint32_t TT2 = GG(E, F, G) + H + SS1 + W[j];                             \
+    B = rotate_left_optimized(B, 9);                                         \
+    F = rotate_left_optimized(F, 19);                                        \
+    D = TT1;                                                                 \
+    H = P0_optimized(TT2);                                                   \
+} while (0)
 
-// 简化但仍然优化的压缩函数
+#define FF0(x, y, z) ((x) ^ (y) ^ (z))
+#define FF1(x, y, z) (((x) & ((y) | (z))) | ((y) & (z)))
+#define GG0(x, y, z) ((x) ^ (y) ^ (z))
+#define GG1(x, y, z) ((z) ^ ((x) & ((y) ^ (z))))
+
+// 压缩函数：变量轮换通过改变宏参数顺序完成，每4轮回到原位，省去逐轮的寄存器移动；
+// 进入轮函数前只扩展到W[19]，其余在轮中按需扩展
 static void sm3_compress_optimized(uint32_t *state, const uint8_t *block) {
-    uint32_t W[68], W1[64];
+    uint32_t W[68];
     uint32_t A = state[0], B = state[1], C = state[2], D = state[3];
     uint32_t E = state[4], F = state[5], G = state[6], H = state[7];
-    
-    message_expansion_optimized(block, W, W1);
-    
-    // 64轮迭代，使用简单循环但内联函数
-    for (int j = 0; j < 64; j++) {
-        uint32_t SS1, SS2, TT1, TT2;
-        uint32_t A12 = rotate_left_optimized(A, 12);
-        SS1 = rotate_left_optimized(A12 + E + rotate_left_optimized(T_optimized[j], j), 7);
-        SS2 = SS1 ^ A12;
-        TT1 = FF_opt(A, B, C, j) + D + SS2 + W1[j];
-        TT2 = GG_opt(E, F, G, j) + H + SS1 + W[j];
-        
-        D = C;
-        C = rotate_left_optimized(B, 9);
-        B = A;
-        A = TT1;
-        H = G;
-        G = rotate_left_optimized(F, 19);
-        F = E;
-        E = P0_optimized(TT2);
+    int j;
+
+    for (j = 0; j < 16; j++) {
+        W[j] = bytes_to_word_optimized(block + j * 4);
     }
-    
+    for (j = 16; j < 20; j++) {
+        SM3_EXPAND(j);
+    }
+
+    for (j = 0; j < 16; j += 4) {
+        SM3_ROUND(A, B, C, D, E, F, G, H, FF0, GG0, j);
+        SM3_ROUND(D, A, B, C, H, E, F, G, FF0, GG0, j + 1);
+        SM3_ROUND(C, D, A, B, G, H, E, F, FF0, GG0, j + 2);
+        SM3_ROUND(B, C, D, A, F, G, H, E, FF0, GG0, j + 3);
+    }
+    for (; j < 64; j += 4) {
+        SM3_ROUND(A, B, C, D, E, F, G, H, FF1, GG1, j);
+        SM3_ROUND(D, A, B, C, H, E, F, G, FF1, GG1, j + 1);
+        SM3_ROUND(C, D, A, B, G, H, E, F, FF1, GG1, j + 2);
+        SM3_ROUND(B, C, D, A, F, G, H, E, FF1, GG1, j + 3);
+    }
+
     // 更新状态
     state[0] ^= A; state[1] ^= B; state[2] ^= C; state[3] ^= D;
     state[4] ^= E; state[5] ^= F; state[6] ^= G; state[7] ^= H;
@@ -162,8 +151,9 @@ void sm3_optimized_final(sm3_optimized_ctx_t *ctx, uint8_t *digest) {
     if (rest > 56) {
         memset(block + rest, 0, SM3_OPTIMIZED_BLOCK_SIZE - rest);
         sm3_compress_optimized(ctx->state, block);
+        // 长度写在新块的最后8字节
         memset(block, 0, 56);
-        rest = 0;
+        rest = 56;
     } else {
         memset(block + rest, 0, 56 - rest);
         rest = 56;
@@ -184,6 +174,180 @@ void sm3_optimized_hash(const uint8_t *data, size_t len, uint8_t *digest) {
     sm3_optimized_final(&ctx, digest);
 }
 
+// ========== 多消息批量哈希 ==========
+
+// 一条消息按块读取：完整块直接指向原数据，末尾不足一块的部分连同填充复制到tail（1~2块）
+typedef struct {
+    const uint8_t *msg;
+    size_t full;        // 原数据中的完整块数
+    size_t nblocks;     // 含填充的总块数
+    uint8_t tail[2 * SM3_OPTIMIZED_BLOCK_SIZE];
+} sm3_batch_lane_t;
+
+static void batch_lane_setup(sm3_batch_lane_t *lane, const uint8_t *msg, size_t len) {
+    size_t rest = len % SM3_OPTIMIZED_BLOCK_SIZE;
+    size_t tail_blocks = rest + 1 + 8 > SM3_OPTIMIZED_BLOCK_SIZE ? 2 : 1;
+    size_t tail_len = tail_blocks * SM3_OPTIMIZED_BLOCK_SIZE;
+    uint64_t bit_count = (uint64_t)len * 8;
+    lane->msg = msg;
+    lane->full = len / SM3_OPTIMIZED_BLOCK_SIZE;
+    lane->nblocks = lane->full + tail_blocks;
+    memcpy(lane->tail, msg + len - rest, rest);
+    lane->tail[rest] = 0x80;
+    memset(lane->tail + rest + 1, 0, tail_len - rest - 1 - 8);
+    for (int i = 0; i < 8; i++) {
+        lane->tail[tail_len - 8 + i] = (uint8_t)(bit_count >> (56 - 8 * i));
+    }
+}
+
+static inline const uint8_t *batch_lane_block(const sm3_batch_lane_t *lane, size_t b) {
+    if (b < lane->full) {
+        return lane->msg + b * SM3_OPTIMIZED_BLOCK_SIZE;
+    }
+    return lane->tail + (b - lane->full) * SM3_OPTIMIZED_BLOCK_SIZE;
+}
+
+#ifdef __AVX2__
+// 8条消息的状态按字转置存放在8个256位寄存器中，一次压缩同时处理8个块
+#define SM3_BATCH_LANES 8
+
+static inline __m256i rotl_x8(__m256i x, int n) {
+    return _mm256_or_si256(_mm256_slli_epi32(x, n), _mm256_srli_epi32(x, 32 - n));
+}
+
+static inline __m256i p0_x8(__m256i x) {
+    return _mm256_xor_si256(x, _mm256_xor_si256(rotl_x8(x, 9), rotl_x8(x, 17)));
+}
+
+static inline __m256i p1_x8(__m256i x) {
+    return _mm256_xor_si256(x, _mm256_xor_si256(rotl_x8(x, 15), rotl_x8(x, 23)));
+}
+
+static void sm3_compress_x8(__m256i state[8], const uint8_t *blocks[SM3_BATCH_LANES]) {
+    __m256i W[68];
+    __m256i A = state[0], B = state[1], C = state[2], D = state[3];
+    __m256i E = state[4], F = state[5], G = state[6], H = state[7];
+    int j;
+
+    for (j = 0; j < 16; j++) {
+        W[j] = _mm256_setr_epi32(
+            (int)bytes_to_word_optimized(blocks[0] + j * 4), (int)bytes_to_word_optimized(blocks[1] + j * 4),
+            (int)bytes_to_word_optimized(blocks[2] + j * 4), (int)bytes_to_word_optimized(blocks[3] + j * 4),
+            (int)bytes_to_word_optimized(blocks[4] + j * 4), (int)bytes_to_word_optimized(blocks[5] + j * 4),
+            (int)bytes_to_word_optimized(blocks[6] + j * 4), (int)bytes_to_word_optimized(blocks[7] + j * 4));
+    }
+    for (j = 16; j < 68; j++) {
+        __m256i temp = _mm256_xor_si256(_mm256_xor_si256(W[j-16], W[j-9]), rotl_x8(W[j-3], 15));
+        W[j] = _mm256_xor_si256(_mm256_xor_si256(p1_x8(temp), rotl_x8(W[j-13], 7)), W[j-6]);
+    }
+
+    for (j = 0; j < 64; j++) {
+        __m256i A12 = rotl_x8(A, 12);
+        __m256i SS1 = rotl_x8(_mm256_add_epi32(_mm256_add_epi32(A12, E), _mm256_set1_epi32((int)T_rotated[j])), 7);
+        __m256i SS2 = _mm256_xor_si256(SS1, A12);
+        __m256i ff, gg;
+        if (j < 16) {
+            ff = _mm256_xor_si256(_mm256_xor_si256(A, B), C);
+            gg = _mm256_xor_si256(_mm256_xor_si256(E, F), G);
+        } else {
+            ff = _mm256_or_si256(_mm256_and_si256(A, _mm256_or_si256(B, C)), _mm256_and_si256(B, C));
+            gg = _mm256_xor_si256(G, _mm256_and_si256(E, _mm256_xor_si256(F, G)));
+        }
+        __m256i TT1 = _mm256_add_epi32(_mm256_add_epi32(ff, D),
+                                       _mm256_add_epi32(SS2, _mm256_xor_si256(W[j], W[j + 4])));
+        __m256i TT2 = _mm256_add_epi32(_mm256_add_epi32(gg, H), _mm256_add_epi32(SS1, W[j]));
+        D = C;
+        C = rotl_x8(B, 9);
+        B = A;
+        A = TT1;
+        H = G;
+        G = rotl_x8(F, 19);
+        F = E;
+        E = p0_x8(TT2);
+    }
+
+    state[0] = _mm256_xor_si256(state[0], A); state[1] = _mm256_xor_si256(state[1], B);
+    state[2] = _mm256_xor_si256(state[2], C); state[3] = _mm256_xor_si256(state[3], D);
+    state[4] = _mm256_xor_si256(state[4], E); state[5] = _mm256_xor_si256(state[5], F);
+    state[6] = _mm256_xor_si256(state[6], G); state[7] = _mm256_xor_si256(state[7], H);
+}
+
+// 一组至多8条消息：逐块推进，已处理完的消息所在通道输入一个占位块，结果按掩码丢弃
+static void sm3_hash_group_x8(sm3_batch_lane_t *lanes, size_t n, uint8_t *digests) {
+    static const uint8_t dummy[SM3_OPTIMIZED_BLOCK_SIZE];
+    __m256i state[8], saved[8];
+    const uint8_t *blocks[SM3_BATCH_LANES];
+    uint32_t words[SM3_BATCH_LANES];
+    size_t max_blocks = 0;
+    size_t l, b;
+    int i;
+
+    for (l = 0; l < n; l++) {
+        if (lanes[l].nblocks > max_blocks) max_blocks = lanes[l].nblocks;
+    }
+    for (i = 0; i < 8; i++) {
+        state[i] = _mm256_set1_epi32((int)SM3_OPTIMIZED_IV[i]);
+    }
+    for (b = 0; b < max_blocks; b++) {
+        for (l = 0; l < SM3_BATCH_LANES; l++) {
+            int active = l < n && b < lanes[l].nblocks;
+            blocks[l] = active ? batch_lane_block(&lanes[l], b) : dummy;
+            words[l] = active ? 0 : 0xFFFFFFFFu;
+        }
+        // 相对一次压缩，保存与混合状态的开销可以忽略，长度相同时也照常执行
+        __m256i keep = _mm256_loadu_si256((const __m256i *)words);
+        memcpy(saved, state, sizeof(state));
+        sm3_compress_x8(state, blocks);
+        for (i = 0; i < 8; i++) {
+            state[i] = _mm256_blendv_epi8(state[i], saved[i], keep);
+        }
+    }
+    for (i = 0; i < 8; i++) {
+        _mm256_storeu_si256((__m256i *)words, state[i]);
+        for (l = 0; l < n; l++) {
+            word_to_bytes_optimized(words[l], digests + l * SM3_OPTIMIZED_DIGEST_SIZE + i * 4);
+        }
+    }
+}
+#else
+#define SM3_BATCH_LANES 1
+#endif
+
+int sm3_optimized_hash_batch(const uint8_t *data, size_t data_len, const size_t *offsets, size_t count,
+                             uint8_t *digests) {
+    sm3_batch_lane_t lanes[SM3_BATCH_LANES];
+    size_t i, l;
+
+    // 先检查偏移，避免越界读取
+    for (i = 0; i < count; i++) {
+        if (offsets[i] > offsets[i + 1]) return -1;
+    }
+    if (count > 0 && offsets[count] > data_len) return -1;
+
+    for (i = 0; i < count; i += SM3_BATCH_LANES) {
+        size_t n = count - i < SM3_BATCH_LANES ? count - i : SM3_BATCH_LANES;
+        for (l = 0; l < n; l++) {
+            batch_lane_setup(&lanes[l], data + offsets[i + l], offsets[i + l + 1] - offsets[i + l]);
+        }
+#ifdef __AVX2__
+        sm3_hash_group_x8(lanes, n, digests + i * SM3_OPTIMIZED_DIGEST_SIZE);
+#else
+        {
+            uint32_t state[SM3_OPTIMIZED_STATE_SIZE];
+            size_t b;
+            memcpy(state, SM3_OPTIMIZED_IV, sizeof(state));
+            for (b = 0; b < lanes[0].nblocks; b++) {
+                sm3_compress_optimized(state, batch_lane_block(&lanes[0], b));
+            }
+            for (int k = 0; k < SM3_OPTIMIZED_STATE_SIZE; k++) {
+                word_to_bytes_optimized(state[k], digests + i * SM3_OPTIMIZED_DIGEST_SIZE + k * 4);
+            }
+        }
+#endif
+    }
+    return 0;
+}
+
 void sm3_optimized_print_digest(const uint8_t *digest) {
     for (int i = 0; i < SM3_OPTIMIZED_DIGEST_SIZE; i++) {
         printf("%02x", digest[i]);
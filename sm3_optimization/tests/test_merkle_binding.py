@@ -0,0 +1,103 @@
+# Merkle树Python绑定测试：与merkle_tree/test_merkle_tree.c相同的10万叶子向量
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+import merkle
+import sm3
+
+LEAF_COUNT = 100000
+# test_merkle_tree.c 输出的根哈希（叶子为 SM3("leaf000001") ~ SM3("leaf100000")）
+EXPECTED_ROOT = 'dedbc07d99b76e0e9fdc64ed8bad3aae1e57171a8a953200cd0e8d5fdf07640b'
+
+LEAVES = sm3.sm3_hash_many(b'leaf%06d' % (i + 1) for i in range(LEAF_COUNT))
+
+
+def test_root():
+    tree = merkle.MerkleTree()
+    for leaf in LEAVES[:1000]:
+        tree.append(leaf)
+    tree.extend(b''.join(LEAVES[1000:]))
+    assert len(tree) == LEAF_COUNT and tree.height == 17
+    assert tree.root().hex() == EXPECTED_ROOT
+    print("✓ 增量追加与C整树构建的根哈希一致: 通过")
+
+
+def test_small_trees():
+    # 各种叶子数下，根都应等于按层两两组合（落单节点与自身组合）的结果
+    tree = merkle.MerkleTree()
+    for n in range(1, 70):
+        tree.append(LEAVES[n - 1])
+        level = LEAVES[:n]
+        while len(level) > 1:
+            if len(level) % 2:
+                level = level + [level[-1]]
+            level = [sm3.sm3_hash(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+        assert tree.root() == level[0]
+        for i in (0, n // 2, n - 1):
+            assert merkle.verify_inclusion(level[0], LEAVES[i], i, tree.prove(i))
+    print("✓ 1~69个叶子的根与证明: 通过")
+
+
+def test_inclusion():
+    tree = merkle.MerkleTree(b''.join(LEAVES))
+    root = tree.root()
+    proof = tree.prove(88887)
+    assert len(proof) == 17
+    assert merkle.verify_inclusion(root, LEAVES[88887], 88887, proof)
+    assert not merkle.verify_inclusion(root, LEAVES[88886], 88887, proof)
+    assert not merkle.verify_inclusion(root, LEAVES[88887], 88886, proof)
+    try:
+        tree.prove(LEAF_COUNT)
+    except IndexError:
+        pass
+    else:
+        raise AssertionError('out-of-range index accepted')
+    print("✓ 存在性证明（第88888个叶子）: 通过")
+
+
+def test_batch():
+    tree = merkle.MerkleTree(LEAVES)
+    root = tree.root()
+    indices = list(range(0, LEAF_COUNT, 997)) + [LEAF_COUNT - 1]
+    proofs = tree.prove_batch(indices)
+    assert len(proofs) == len(indices) * tree.height * 32
+    leaves = [LEAVES[i] for i in indices]
+    assert merkle.verify_batch(root, leaves, indices, proofs) == [True] * len(indices)
+    # 每个批量证明与单独生成的证明相同
+    h = tree.height * 32
+    for k in (0, 5, len(indices) - 1):
+        assert proofs[k * h:(k + 1) * h] == b''.join(tree.prove(indices[k]))
+    proofs[3 * h] ^= 1
+    results = merkle.verify_batch(root, leaves, indices, proofs)
+    assert results.count(False) == 1 and not results[3]
+    print("✓ 批量证明生成与验证: 通过")
+
+
+def test_parallel_build():
+    packed = b''.join(LEAVES)
+    for threads, grain in ((1, 4096), (4, 1000), (3, 7)):
+        tree = merkle.build(packed, threads=threads, grain=grain)
+        assert len(tree) == LEAF_COUNT and tree.root().hex() == EXPECTED_ROOT
+    # 建好的树可以继续追加
+    tree = merkle.build(packed[:-32], threads=2)
+    tree.append(LEAVES[-1])
+    assert tree.root().hex() == EXPECTED_ROOT
+    assert tree.prove(88887) == merkle.MerkleTree(LEAVES).prove(88887)
+    data, offsets = sm3.pack(b'leaf%06d' % (i + 1) for i in range(LEAF_COUNT))
+    assert merkle.build_records(data, offsets, threads=4, grain=500).root().hex() == EXPECTED_ROOT
+    print("✓ 多线程建树: 通过")
+
+
+def main():
+    print("===== Merkle树Python绑定测试 =====")
+    test_root()
+    test_small_trees()
+    test_inclusion()
+    test_batch()
+    test_parallel_build()
+    print("所有测试通过！")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,9 @@ static const struct {
      "debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732"},
     {"abcdefghijklmnopqrstuvwxyz", 
      "b80fe97a4da24afc277564f66a359ef440462ad28dcc6d63adb24d5c20a61595"},
+    // 56字节：填充后长度字段落在第二个块
+    {"abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq",
+     "639b6cc5e64d9e37a390b192df4fa1ea0720ab747ff692b9f38c4e66ad7b8c05"},
     {NULL, NULL}
 };
 
@@ -204,6 +207,43 @@ void random_data_test() {
     printf("\n");
 }
 
+// 批量接口与逐条计算一致（长度0~199，覆盖填充跨块与不足8条的分组）
+void batch_api_test() {
+    printf("批量接口测试:\n");
+
+    const size_t count = 200;
+    size_t offsets[201];
+    uint8_t *data = malloc(count * count);
+    uint8_t *digests = malloc(count * SM3_OPTIMIZED_DIGEST_SIZE);
+    if (!data || !digests) {
+        printf("内存分配失败\n");
+        free(data);
+        free(digests);
+        return;
+    }
+
+    offsets[0] = 0;
+    for (size_t i = 0; i < count; i++) {
+        offsets[i + 1] = offsets[i] + i;
+    }
+    for (size_t i = 0; i < offsets[count]; i++) {
+        data[i] = (uint8_t)(i * 31 + 7);
+    }
+
+    int ok = sm3_optimized_hash_batch(data, offsets[count], offsets, count, digests) == 0;
+    for (size_t i = 0; ok && i < count; i++) {
+        uint8_t expected[SM3_OPTIMIZED_DIGEST_SIZE];
+        sm3_hash(data + offsets[i], offsets[i + 1] - offsets[i], expected);
+        ok = memcmp(expected, digests + i * SM3_OPTIMIZED_DIGEST_SIZE, SM3_OPTIMIZED_DIGEST_SIZE) == 0;
+    }
+    // 越界的偏移应被拒绝
+    ok = ok && sm3_optimized_hash_batch(data, offsets[count] - 1, offsets, count, digests) == -1;
+    printf("  %zu 条消息: %s\n\n", count, ok ? "✓ 通过" : "✗ 失败");
+
+    free(data);
+    free(digests);
+}
+
 int main() {
     printf("=== SM3 哈希算法测试程序 ===\n\n");
     
@@ -212,6 +252,9 @@ int main() {
     
     // 随机数据测试
     random_data_test();
+
+    // 批量接口测试
+    batch_api_test();
     
     // 性能测试
     printf("=== 性能测试 ===\n");
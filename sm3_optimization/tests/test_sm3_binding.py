@@ -0,0 +1,123 @@
+# SM3 Python绑定测试：标准向量、流式更新、copy与各种缓冲区类型
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+import sm3
+
+TEST_VECTORS = [
+    (b'', '1ab21d8355cfa17f8e61194831e81a8f22bec8c728fefb747ed035eb5082aa2b'),
+    (b'abc', '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'),
+    (b'abcd' * 16, 'debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732'),
+    (b'abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq',
+     '639b6cc5e64d9e37a390b192df4fa1ea0720ab747ff692b9f38c4e66ad7b8c05'),
+]
+
+
+def test_vectors():
+    for message, expected in TEST_VECTORS:
+        assert sm3.sm3_hash(message).hex() == expected
+        assert sm3.SM3(message).hexdigest() == expected
+    print("✓ 标准测试向量: 通过")
+
+
+def test_streaming():
+    data = os.urandom(10000)
+    expected = sm3.sm3_hash(data)
+    for step in (1, 7, 63, 64, 65, 4096):
+        h = sm3.SM3()
+        for i in range(0, len(data), step):
+            h.update(data[i:i + step])
+        assert h.digest() == expected
+    print("✓ 流式更新与一次性计算一致: 通过")
+
+
+def test_copy_and_digest():
+    h = sm3.SM3(b'ab')
+    h2 = h.copy()
+    first = h.digest()
+    assert h.digest() == first  # digest不改变状态
+    h.update(b'c')
+    assert h.hexdigest() == TEST_VECTORS[1][1]
+    assert h2.digest() == first
+    assert h.digest_size == 32 and h.block_size == 64 and h.name == 'sm3'
+    print("✓ copy与digest: 通过")
+
+
+def test_buffer_types():
+    data = os.urandom(5000)
+    expected = sm3.sm3_hash(data)
+    assert sm3.sm3_hash(bytearray(data)) == expected
+    assert sm3.sm3_hash(memoryview(data)) == expected
+    h = sm3.SM3()
+    h.update(memoryview(bytearray(data))[:100])
+    h.update(bytearray(data[100:]))
+    assert h.digest() == expected
+    print("✓ bytes/bytearray/memoryview输入: 通过")
+
+
+def test_threads():
+    # 大块update在C中释放GIL，多线程结果应与单线程一致
+    data = os.urandom(1 << 20)
+    expected = sm3.sm3_hash(data)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sm3.SM3(data).digest())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [expected] * 4
+    print("✓ 多线程哈希: 通过")
+
+
+def test_batch():
+    # 覆盖填充跨块的各种长度，以及不足8条的分组
+    messages = [os.urandom(n) for n in list(range(0, 130)) + [1000, 5000]]
+    expected = [sm3.sm3_hash(m) for m in messages]
+    assert sm3.sm3_hash_many(messages) == expected
+    data, offsets = sm3.pack(messages)
+    assert bytes(sm3.sm3_hash_batch(data, list(offsets))) == b''.join(expected)
+    out = bytearray(32 * 3)
+    sm3.sm3_hash_batch(data, offsets[:4], out)
+    assert out == b''.join(expected[:3])
+    assert sm3.sm3_hash_many([]) == []
+    for bad in ([0, len(data) + 1], [10, 5]):
+        try:
+            sm3.sm3_hash_batch(data, bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('invalid offsets accepted')
+    print("✓ 批量哈希: 通过")
+
+
+def test_missing_library():
+    # 动态库不存在时抛出ImportError，不在导入时调用make
+    lib_path = sm3._lib_path
+    sm3._lib_path = lambda: os.path.join(os.path.dirname(lib_path()), 'missing', 'libsm3.so')
+    try:
+        sm3.load_library()
+    except ImportError as e:
+        assert 'make libsm3.so' in str(e)
+    else:
+        raise AssertionError('missing library not reported')
+    finally:
+        sm3._lib_path = lib_path
+    print("✓ 缺少动态库时报错: 通过")
+
+
+def main():
+    print("===== SM3 Python绑定测试 =====")
+    test_vectors()
+    test_streaming()
+    test_copy_and_digest()
+    test_buffer_types()
+    test_threads()
+    test_batch()
+    test_missing_library()
+    print("所有测试通过！")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,67 +1,522 @@
-import time
+"""
+SM4性能测试套件
+
+默认对各实现和模式（ECB、CTR、GCM加密/解密）按消息大小（16B ~ 64MiB）扫描吞吐：
+每个用例先预热，再用perf_counter_ns重复计时，报告中位数/p95耗时、MB/s和估算的cycles/byte。
+结果可写成JSON，并与保存的基线比较，中位数变慢超过阈值即视为回归（退出码1）。
+
+    python benchmark.py                                   # 完整扫描
+    python benchmark.py --max-size 1M --output run.json   # 快速扫描并保存结果
+    python benchmark.py --baseline baseline.json --threshold 0.1
+    python benchmark.py --extras                          # 各项优化的专项对比
+"""
+
+import argparse
+import json
+import math
 import os
+import platform
+import sys
+import time
 from sm4_v0 import SM4
 from sm4_ttable import SM4TTable
 from sm4_opt import SM4Optimized
-from sm4_gcm import SM4GCM
+from sm4_gcm import SM4GCM, GHash, ghash
+from sm4_xts import SM4XTS
+
+# 16B起每次乘以16，另含T-table对比使用的1KiB，最后补上64MiB
+SIZES = [16, 256, 1 << 10, 4 << 10, 64 << 10, 1 << 20, 16 << 20, 64 << 20]
+MODES = ('ecb', 'ctr', 'gcm-enc', 'gcm-dec')
+
+
+def _engine(backend):
+    if backend == 'base':
+        return SM4()
+    if backend == 'ttable':
+        return SM4TTable()
+    if backend == 'numpy':
+        from sm4_numpy import SM4NumPy
+        return SM4NumPy()
+    return SM4Optimized()
+
+
+def _ecb(backend):
+    def setup(size):
+        engine = _engine(backend)
+        key = os.urandom(16)
+        data = os.urandom(size)
+        if not hasattr(engine, 'encrypt_blocks'):
+            # 基础版本没有批量接口，逐块调用
+            return lambda: [engine.encrypt_block(data[i:i+16], key) for i in range(0, size, 16)]
+        out = bytearray(size)
+        return lambda: engine.encrypt_blocks(data, key, out)
+    return setup
+
+
+def _ctr(backend):
+    def setup(size):
+        engine = _engine(backend)
+        key = os.urandom(16)
+        counter = os.urandom(16)
+        data = os.urandom(size)
+        out = bytearray(size)
+        return lambda: engine.ctr_xor(counter, data, key, out)
+    return setup
+
+
+def _gcm(mode, decrypt):
+    def setup(size):
+        gcm = SM4GCM(os.urandom(16), mode=mode)
+        iv = os.urandom(12)
+        data = os.urandom(size)
+        if not decrypt:
+            return lambda: gcm.encrypt(data, iv)
+        ciphertext, tag = gcm.encrypt(data, iv)
+        return lambda: gcm.decrypt(ciphertext, iv, tag)
+    return setup
+
+
+# (实现, 模式) -> 用例构造函数；GCM的实现名即SM4GCM的mode
+CASES = {}
+for _backend in ('base', 'ttable', 'numpy', 'native'):
+    CASES[(_backend, 'ecb')] = _ecb(_backend)
+for _backend in ('ttable', 'numpy', 'native'):
+    CASES[(_backend, 'ctr')] = _ctr(_backend)
+for _mode in ('base', 'ttable', 'opt', 'numpy', 'native', 'parallel'):
+    CASES[(_mode, 'gcm-enc')] = _gcm(_mode, False)
+    CASES[(_mode, 'gcm-dec')] = _gcm(_mode, True)
+
+
+def cpu_hz():
+    """估算CPU主频（Hz），用于把耗时换算为cycles/byte；无法获取时返回None"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('cpu MHz'):
+                    return float(line.split(':')[1]) * 1e6
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(sorted_values, p):
+    # 最近秩法
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
 
-def benchmark_sm4():
-    """SM4三种实现性能测试"""
+
+def measure(run, repeats=7, warmup=1, min_sample_ns=2_000_000, budget_ns=2_000_000_000):
+    """预热后重复计时，返回(每次调用耗时的样本列表ns, 每个样本内的调用次数)
+
+    单次调用很快时一个样本内循环多次，保证每个样本至少min_sample_ns；
+    总耗时受budget_ns限制，单次调用很慢时减少样本数（至少1个）。
+    """
+    elapsed = 0
+    for _ in range(warmup):
+        start = time.perf_counter_ns()
+        run()
+        elapsed = time.perf_counter_ns() - start
+    elapsed = max(elapsed, 1)
+    inner = max(1, min_sample_ns // elapsed)
+    repeats = max(1, min(repeats, budget_ns // (elapsed * inner)))
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        for _ in range(inner):
+            run()
+        samples.append((time.perf_counter_ns() - start) / inner)
+    return samples, inner
+
+
+def run_suite(cases, sizes, repeats=7, budget_s=2.0, hz=None, log=print):
+    """按用例和大小扫描，返回结果列表
+
+    某个用例预计单次耗时超过预算时跳过其余更大的消息。
+    """
+    results = []
+    budget_ns = int(budget_s * 1e9)
+    for (backend, mode), make in cases.items():
+        try:
+            make(16)
+        except (ImportError, OSError) as e:
+            log(f"{backend:>8} {mode:<8} unavailable: {e}")
+            continue
+        last = None
+        for size in sizes:
+            if last is not None and last[1] * size / last[0] > budget_ns:
+                log(f"{backend:>8} {mode:<8} {size:>10} skipped (over budget)")
+                break
+            samples, inner = measure(make(size), repeats, budget_ns=budget_ns)
+            samples.sort()
+            median = samples[len(samples) // 2]
+            p95 = _percentile(samples, 95)
+            result = {
+                'backend': backend,
+                'mode': mode,
+                'size': size,
+                'median_ns': median,
+                'p95_ns': p95,
+                'mb_s': size / median * 1e3,
+                'cycles_per_byte': median * 1e-9 * hz / size if hz else None,
+                'runs': len(samples),
+                'inner': inner,
+            }
+            results.append(result)
+            cpb = f"{result['cycles_per_byte']:10.1f} c/B" if hz else ''
+            log(f"{backend:>8} {mode:<8} {size:>10} median {median / 1e3:12.1f}us "
+                f"p95 {p95 / 1e3:12.1f}us {result['mb_s']:10.2f} MB/s {cpb}")
+            last = (size, median)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """与基线比较中位数耗时，返回回归列表[(结果, 基线中位数ns, 变慢比例)]"""
+    reference = {(r['backend'], r['mode'], r['size']): r['median_ns'] for r in baseline['results']}
+    regressions = []
+    for r in results:
+        old = reference.get((r['backend'], r['mode'], r['size']))
+        if old and r['median_ns'] > old * (1 + threshold):
+            regressions.append((r, old, r['median_ns'] / old - 1))
+    return regressions
+
+
+def _parse_size(text):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B').rstrip('I')
+    if text and text[-1] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SM4 benchmark suite')
+    parser.add_argument('--backends', help='comma-separated backends (default: all)')
+    parser.add_argument('--modes', help=f"comma-separated modes from {','.join(MODES)}")
+    parser.add_argument('--min-size', default='16', help='smallest message size, e.g. 16, 4K')
+    parser.add_argument('--max-size', default='64M', help='largest message size, e.g. 1M, 64M')
+    parser.add_argument('--repeats', type=int, default=7, help='timed samples per case')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds allowed per case and size')
+    parser.add_argument('--cpu-ghz', type=float, help='CPU frequency for cycles/byte (default: /proc/cpuinfo)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed median slowdown (0.10 = 10%%)')
+    parser.add_argument('--extras', action='store_true', help='run the per-optimization comparisons instead')
+    args = parser.parse_args(argv)
+
+    if args.extras:
+        run_extras()
+        return 0
+
+    backends = set(args.backends.split(',')) if args.backends else None
+    modes = set(args.modes.split(',')) if args.modes else set(MODES)
+    cases = {k: v for k, v in CASES.items() if k[1] in modes and (backends is None or k[0] in backends)}
+    lo, hi = _parse_size(args.min_size), _parse_size(args.max_size)
+    sizes = [s for s in SIZES if lo <= s <= hi]
+    hz = args.cpu_ghz * 1e9 if args.cpu_ghz else cpu_hz()
+
+    results = run_suite(cases, sizes, args.repeats, args.budget, hz)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_hz': hz,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r, old, slowdown in regressions:
+            print(f"REGRESSION {r['backend']} {r['mode']} {r['size']}: "
+                  f"{old / 1e3:.1f}us -> {r['median_ns'] / 1e3:.1f}us (+{slowdown:.0%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+# ===== 各项优化的专项对比（--extras） =====
+
+def benchmark_key_cache():
+    """轮密钥缓存前后每块加密耗时对比"""
     key = os.urandom(16)
     plaintext = os.urandom(16)
     count = 10000
+    backends = [
+        ('基础版本', lambda size: SM4(cache_size=size), 'encrypt_block'),
+        ('T-table版本', lambda size: SM4TTable(cache_size=size), 'encrypt_block'),
+        ('C优化版本', lambda size: SM4Optimized(cache_size=size), 'encrypt_block_optimized'),
+    ]
+    for name, factory, method in backends:
+        per_block = []
+        # cache_size=0 即每块重新扩展密钥（缓存前的行为）
+        for size in (0, 64):
+            encrypt = getattr(factory(size), method)
+            start_time = time.perf_counter()
+            for _ in range(count):
+                encrypt(plaintext, key)
+            per_block.append((time.perf_counter() - start_time) / count * 1e6)
+        print(f"{name} 每块耗时: 无缓存 {per_block[0]:.2f}us, 有缓存 {per_block[1]:.2f}us, "
+              f"加速比 {per_block[0]/per_block[1]:.2f}倍")
 
-    # 基础版本
-    sm4_basic = SM4()
-    start_time = time.time()
-    for _ in range(count):
-        ciphertext = sm4_basic.encrypt_block(plaintext, key)
-    basic_time = time.time() - start_time
 
-    # T-table版本
+def benchmark_multikey():
+    """每个分组使用不同密钥（多租户场景）：逐个扩展密钥与批量扩展对比"""
+    from sm4_numpy import SM4NumPy
+    count = 10000
+    keys = os.urandom(16 * count)
+    data = os.urandom(16 * count)
+    sm4_ttable = SM4TTable(cache_size=0)
+    sm4_opt = SM4Optimized(cache_size=0)
+    sm4_numpy = SM4NumPy()
+    
+    start_time = time.perf_counter()
+    for i in range(0, len(data), 16):
+        sm4_ttable.encrypt_block(data[i:i+16], keys[i:i+16])
+    print(f"T-table逐块扩展密钥: {(time.perf_counter() - start_time) / count * 1e6:.2f}us/块")
+    start_time = time.perf_counter()
+    for i in range(0, len(data), 16):
+        sm4_opt.encrypt_block_optimized(data[i:i+16], keys[i:i+16])
+    print(f"C优化版本逐块扩展密钥: {(time.perf_counter() - start_time) / count * 1e6:.2f}us/块")
+    for name, engine in (('NumPy', sm4_numpy), ('C优化版本', sm4_opt)):
+        start_time = time.perf_counter()
+        round_keys = engine.expand_keys(keys)
+        expand_time = time.perf_counter() - start_time
+        engine.encrypt_blocks_multikey(data, round_keys)
+        total_time = time.perf_counter() - start_time
+        print(f"{name}批量接口: 密钥扩展 {expand_time / count * 1e6:.2f}us/个, "
+              f"合计 {total_time / count * 1e6:.2f}us/块")
+
+
+def benchmark_ttable_sizes():
+    """融合T-table引擎与基础版本在16B、1KiB、1MiB数据上的ECB吞吐对比"""
+    key = os.urandom(16)
+    sm4_basic = SM4()
     sm4_ttable = SM4TTable()
-    start_time = time.time()
-    for _ in range(count):
-        ciphertext = sm4_ttable.encrypt_block(plaintext, key)
-    ttable_time = time.time() - start_time
 
-    # C优化版本
-    sm4_opt = SM4Optimized()
-    start_time = time.time()
+    def basic_ecb(data):
+        return b''.join(sm4_basic.encrypt_block(data[i:i+16], key) for i in range(0, len(data), 16))
+
+    for size, label in [(16, '16B'), (1024, '1KiB'), (1 << 20, '1MiB')]:
+        data = os.urandom(size)
+        # 小数据多次重复，保证计时精度
+        count = max(1, (64 * 1024) // size)
+        results = []
+        for encrypt in (basic_ecb, lambda d: sm4_ttable.encrypt_blocks(d, key)):
+            start_time = time.perf_counter()
+            for _ in range(count):
+                out = encrypt(data)
+            results.append((time.perf_counter() - start_time, out))
+        basic_mbps = size * count / results[0][0] / 1e6
+        ttable_mbps = size * count / results[1][0] / 1e6
+        print(f"{label:>5}: 基础版本 {basic_mbps:.3f}MB/s, T-table版本 {ttable_mbps:.3f}MB/s, "
+              f"加速比 {results[0][0]/results[1][0]:.2f}倍, 结果一致: {results[0][1] == results[1][1]}")
+
+
+def benchmark_ghash():
+    """逐位GHASH与查表GHASH在1KiB数据上的耗时对比"""
+    h = os.urandom(16)
+    aad = b"header"
+    data = os.urandom(1024)
+    count = 200
+    start_time = time.perf_counter()
+    for _ in range(count):
+        ghash(h, aad, data)
+    bitwise_time = time.perf_counter() - start_time
+    table = GHash(h)
+    start_time = time.perf_counter()
     for _ in range(count):
-        ciphertext = sm4_opt.encrypt_block_optimized(plaintext, key)
-    opt_time = time.time() - start_time
-
-    print(f"基础版本 {count}次加密耗时: {basic_time:.3f}秒")
-    print(f"T-table版本 {count}次加密耗时: {ttable_time:.3f}秒")
-    print(f"C优化版本 {count}次加密耗时: {opt_time:.3f}秒")
-    print(f"T-table加速比: {basic_time/ttable_time:.2f}倍")
-    print(f"C优化加速比: {basic_time/opt_time:.2f}倍")
-
-    # 结果一致性
-    basic_result = sm4_basic.encrypt_block(plaintext, key)
-    ttable_result = sm4_ttable.encrypt_block(plaintext, key)
-    opt_result = sm4_opt.encrypt_block_optimized(plaintext, key)
-    print(f"结果一致性: 基础-Ttable: {basic_result == ttable_result}, 基础-C: {basic_result == opt_result}")
-
-def benchmark_gcm():
-    """SM4-GCM三种实现性能测试"""
+        table.digest(aad, data)
+    table_time = time.perf_counter() - start_time
+    print(f"GHASH 1KiB {count}次: 逐位乘法 {bitwise_time:.3f}秒, 查表 {table_time:.3f}秒, "
+          f"加速比 {bitwise_time/table_time:.2f}倍")
+
+
+def benchmark_gcm_rejection():
+    """伪造消息的拒绝吞吐：先认证后解密时拒绝只需计算GHASH"""
     key = os.urandom(16)
     iv = os.urandom(12)
     aad = b"header"
-    plaintext = os.urandom(1024)
-    count = 1000
-    for mode in ['base', 'ttable', 'opt']:
+    for mode in ('ttable', 'opt', 'native'):
         gcm = SM4GCM(key, mode=mode)
-        start_time = time.time()
-        for _ in range(count):
+        for size, label in [(1024, '1KiB'), (64 * 1024, '64KiB')]:
+            plaintext = os.urandom(size)
             ciphertext, tag = gcm.encrypt(plaintext, iv, aad)
-            _ = gcm.decrypt(ciphertext, iv, tag, aad)
-        elapsed = time.time() - start_time
-        print(f"GCM模式({mode}) {count}次加解密耗时: {elapsed:.3f}秒")
+            forged_tag = bytes(16)
+            count = max(10, (4 << 20) // size // (1 if mode == 'opt' else 16))
+            start_time = time.perf_counter()
+            for _ in range(count):
+                gcm.decrypt(ciphertext, iv, tag, aad)
+            accept_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            for _ in range(count):
+                try:
+                    gcm.decrypt(ciphertext, iv, forged_tag, aad)
+                except ValueError:
+                    pass
+            reject_time = time.perf_counter() - start_time
+            print(f"GCM({mode}) {label}: 正常解密 {count/accept_time:.0f}条/秒, "
+                  f"拒绝伪造 {count/reject_time:.0f}条/秒 ({size*count/reject_time/1e6:.2f}MB/s)")
+
+
+def benchmark_gcm_parallel():
+    """多线程GCM在不同消息大小和线程数下的吞吐"""
+    key = os.urandom(16)
+    iv = os.urandom(12)
+    sequential = SM4GCM(key, mode='opt')
+    for size_mib in (1, 4, 16):
+        plaintext = os.urandom(size_mib << 20)
+        start_time = time.perf_counter()
+        sequential.encrypt(plaintext, iv)
+        line = [f"{size_mib}MiB: 顺序 {size_mib / (time.perf_counter() - start_time):.1f}MiB/s"]
+        for workers in (1, 2, 4, os.cpu_count()):
+            gcm = SM4GCM(key, mode='parallel', workers=workers)
+            start_time = time.perf_counter()
+            gcm.encrypt(plaintext, iv)
+            line.append(f"{workers}线程 {size_mib / (time.perf_counter() - start_time):.1f}MiB/s")
+        print(", ".join(line))
+
+
+def benchmark_xts():
+    """SM4-XTS对mmap映射文件原地加密的吞吐（GiB/s），按线程数对比"""
+    size = 64 << 20
+    path = f"xts_bench_{os.getpid()}.img"
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    try:
+        xts = SM4XTS(os.urandom(32), sector_size=4096)
+        for workers in sorted({1, 2, 4, os.cpu_count()}):
+            start_time = time.perf_counter()
+            xts.encrypt_file(path, workers=workers)
+            elapsed = time.perf_counter() - start_time
+            print(f"{workers}线程: {size / elapsed / (1 << 30):.3f}GiB/s")
+    finally:
+        os.remove(path)
+
+
+def benchmark_aio():
+    """asyncio回环连接上的记录吞吐与事件循环延迟（加密在线程池中进行 vs 在事件循环中直接加密）"""
+    import asyncio
+    import sm4_aio
+
+    async def monitor_lag(stop, lags):
+        # 每1ms唤醒一次，记录实际唤醒比预期晚了多少
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def loopback(size, count, max_in_flight):
+        key = os.urandom(16)
+        done = asyncio.Event()
+
+        async def handle(r, w):
+            reader = sm4_aio.SM4GCMStreamReader(r, key, max_in_flight=max_in_flight)
+            async for _ in reader:
+                pass
+            w.close()
+            done.set()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        stop, lags = asyncio.Event(), []
+        monitor = asyncio.ensure_future(monitor_lag(stop, lags))
+        _, writer = await sm4_aio.open_connection('127.0.0.1', port, key, max_in_flight=max_in_flight)
+        record = os.urandom(size)
+        start_time = time.perf_counter()
+        for _ in range(count):
+            await writer.write_record(record)
+        await writer.close()
+        await done.wait()
+        elapsed = time.perf_counter() - start_time
+        stop.set()
+        await monitor
+        server.close()
+        await server.wait_closed()
+        return count / elapsed, lags
+
+    async def inline(size, count):
+        gcm = SM4GCM(os.urandom(16), mode='auto')
+        iv = os.urandom(12)
+        record = os.urandom(size)
+        stop, lags = asyncio.Event(), []
+        monitor = asyncio.ensure_future(monitor_lag(stop, lags))
+        start_time = time.perf_counter()
+        for _ in range(count):
+            gcm.encrypt(record, iv)
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - start_time
+        stop.set()
+        await monitor
+        return count / elapsed, lags
+
+    def report(label, rate, lags):
+        lags = sorted(lags) or [0.0]
+        print(f"{label}: {rate:.0f}条/秒, 事件循环延迟 中位数 {lags[len(lags) // 2] * 1e3:.2f}ms, "
+              f"最大 {lags[-1] * 1e3:.2f}ms")
+
+    for size, label in [(1024, '1KiB'), (64 * 1024, '64KiB'), (1 << 20, '1MiB')]:
+        count = max(64, (16 << 20) // size // 4)
+        report(f"{label} 事件循环内直接加密(仅加密)", *asyncio.run(inline(size, count)))
+        for max_in_flight in (1, 4, 16):
+            report(f"{label} 线程池 在途{max_in_flight}条", *asyncio.run(loopback(size, count, max_in_flight)))
+
+
+def benchmark_keystream_pool():
+    """短消息加密延迟：预取密钥流（异或+GHASH）与直接加密对比"""
+    from sm4_prefetch import KeystreamPool
+    key = os.urandom(16)
+    message = os.urandom(64)
+    for mode in ('ttable', 'opt', 'native'):
+        gcm = SM4GCM(key, mode=mode)
+        with KeystreamPool(gcm, max_message_size=256, depth=64) as pool:
+            time.sleep(0.2)
+            pooled, inline = [], []
+            for _ in range(200):
+                start = time.perf_counter_ns()
+                pool.encrypt(message)
+                pooled.append(time.perf_counter_ns() - start)
+                # 消息之间留出空闲，后台线程在此期间补充密钥流
+                time.sleep(0.0005)
+            for _ in range(200):
+                iv = os.urandom(12)
+                start = time.perf_counter_ns()
+                gcm.encrypt(message, iv)
+                inline.append(time.perf_counter_ns() - start)
+                time.sleep(0.0005)
+            pooled.sort()
+            inline.sort()
+            print(f"GCM({mode}) 64B: 预取 中位数 {pooled[100] / 1e3:.1f}us, 直接加密 中位数 {inline[100] / 1e3:.1f}us, "
+                  f"命中 {pool.hits}/{pool.hits + pool.misses}")
+
+
+def run_extras():
+    print("=== T-table引擎吞吐 ===")
+    benchmark_ttable_sizes()
+    print("\n=== 轮密钥缓存效果 ===")
+    benchmark_key_cache()
+    print("\n=== 多密钥批量加密 ===")
+    benchmark_multikey()
+    print("\n=== GHASH性能 ===")
+    benchmark_ghash()
+    print("\n=== SM4-GCM伪造消息拒绝吞吐 ===")
+    benchmark_gcm_rejection()
+    print("\n=== SM4-GCM密钥流预取 ===")
+    benchmark_keystream_pool()
+    print("\n=== SM4-GCM多线程吞吐 ===")
+    benchmark_gcm_parallel()
+    print("\n=== SM4-XTS文件加密吞吐 ===")
+    benchmark_xts()
+    print("\n=== asyncio加密流回环吞吐 ===")
+    benchmark_aio()
+
 
 if __name__ == "__main__":
-    print("=== SM4单块加密性能 ===")
-    benchmark_sm4()
-    print("\n=== SM4-GCM模式性能 ===")
-    benchmark_gcm()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+SM4统一入口
+
+按需探测可用的底层实现（C动态库、NumPy批量引擎、纯Python T-table），
+并按请求的分组数选择最快的一个。导入本模块不会加载ctypes或NumPy，
+第一次用到相应实现时才导入；探测结果和选择结果都会缓存。
+
+    import sm4
+    ct = sm4.encrypt_ecb(data, key)
+    sm4.backend_name(len(data) // 16)   # 'native' / 'numpy' / 'ttable'
+"""
+
+import threading
+
+# 各实现的构造方式，按需导入
+_FACTORIES = {
+    'native': ('sm4_opt', 'SM4Optimized'),
+    'numpy': ('sm4_numpy', 'SM4NumPy'),
+    'ttable': ('sm4_ttable', 'SM4TTable'),
+}
+
+# 速度由快到慢的候选顺序。NumPy引擎每次调用有固定的32轮向量运算开销，
+# 分组数较少时不如逐块的T-table（约在几十个分组处交叉，见benchmark.py）
+NUMPY_MIN_BLOCKS = 64
+_PREFERENCE = {
+    'small': ('native', 'ttable'),
+    'bulk': ('native', 'numpy', 'ttable'),
+}
+
+_lock = threading.Lock()
+_instances = {}     # 实现名 -> 实例；探测失败为None
+_choices = {}       # 批量大小类别 -> 选中的实现名
+
+
+def _load(name):
+    """返回实现实例，不可用（缺少动态库或NumPy）时返回None"""
+    with _lock:
+        if name not in _instances:
+            module_name, class_name = _FACTORIES[name]
+            try:
+                module = __import__(module_name)
+                _instances[name] = getattr(module, class_name)()
+            except (ImportError, OSError, AttributeError):
+                _instances[name] = None
+        return _instances[name]
+
+
+def _nbytes(data):
+    return memoryview(data).nbytes
+
+
+def _size_class(nblocks):
+    return 'bulk' if nblocks >= NUMPY_MIN_BLOCKS else 'small'
+
+
+def backend_name(nblocks=1):
+    """处理nblocks个分组时选用的实现名（首次调用时探测并缓存）"""
+    size_class = _size_class(nblocks)
+    name = _choices.get(size_class)
+    if name is None:
+        for candidate in _PREFERENCE[size_class]:
+            if _load(candidate) is not None:
+                name = candidate
+                break
+        _choices[size_class] = name
+    return name
+
+
+def backend(nblocks=1):
+    """处理nblocks个分组时选用的实现实例"""
+    return _load(backend_name(nblocks))
+
+
+def available_backends():
+    """探测全部实现，返回可用实现名列表"""
+    return [name for name in _FACTORIES if _load(name) is not None]
+
+
+def chosen_backends():
+    """已做出的选择：{'small': 实现名, 'bulk': 实现名}"""
+    return dict(_choices)
+
+
+def gcm_mode():
+    """SM4GCM(mode='auto')使用的底层模式"""
+    name = backend_name(NUMPY_MIN_BLOCKS)
+    return {'native': 'native', 'numpy': 'numpy'}.get(name, 'ttable')
+
+
+def encrypt_block(block, key):
+    return backend(1).encrypt_block(block, key)
+
+
+def decrypt_block(block, key):
+    return backend(1).decrypt_block(block, key)
+
+
+def encrypt_ecb(data, key, out=None):
+    """ECB加密，data长度需为16的倍数"""
+    return backend(_nbytes(data) // 16).encrypt_blocks(data, key, out)
+
+
+def decrypt_ecb(data, key, out=None):
+    """ECB解密，data长度需为16的倍数"""
+    return backend(_nbytes(data) // 16).decrypt_blocks(data, key, out)
+
+
+def ctr_xor(counter, data, key, out=None):
+    """CTR加解密（计数器按inc32递增），counter为bytearray时原地更新"""
+    return backend((_nbytes(data) + 15) // 16).ctr_xor(counter, data, key, out)
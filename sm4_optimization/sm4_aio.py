@@ -0,0 +1,230 @@
+"""
+asyncio流的SM4-GCM加密封装
+
+写端把每条记录加密成一个认证段，读端按顺序解密还原记录：
+
+    流头  'SM4S' | 版本(1B) | 基础nonce(12B)
+    记录  标志(1B) | 密文长度(4B) | 密文 | tag(16B)
+
+第i条记录的nonce与sm4_file相同（基础nonce的低64位异或i），AAD为 i(8B) || 是否结束(1B)；
+close()时写端发送一条带结束标志的空记录，读端据此区分正常结束与被截断的流。
+
+加解密放到有界线程池中执行（C库调用期间释放GIL），不阻塞事件循环；
+同时在途的记录数由max_in_flight限制：写端超出时write_record等待，
+读端超出时暂停从底层流读取，由TCP自身的流量控制把压力传回对端。
+
+    reader, writer = await sm4_aio.open_connection(host, port, key)
+    await writer.write_record(b'...')
+    record = await reader.read_record()     # 对端正常关闭时返回None
+    await writer.close()
+"""
+
+import asyncio
+import collections
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from sm4_file import _segment_nonce
+from sm4_gcm import SM4GCM
+
+MAGIC = b'SM4S'
+# 版本1的tag未用E_K(J0)掩盖，可被伪造；版本2起使用标准GCM tag
+VERSION = 2
+HEADER = struct.Struct('>4sB12s')
+FRAME = struct.Struct('>BI')
+TAG_SIZE = 16
+MAX_RECORD_SIZE = 16 << 20
+
+
+def _record_aad(seq: int, final: bool) -> bytes:
+    return struct.pack('>QB', seq, 1 if final else 0)
+
+
+class _Offload:
+    """持有SM4GCM与线程池；未传入executor时自建一个并在close时关闭"""
+
+    def __init__(self, key: bytes, mode: str, executor, workers):
+        self.gcm = SM4GCM(key, mode=mode)
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(workers or os.cpu_count() or 1)
+
+    def run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def shutdown(self):
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+
+class SM4GCMStreamWriter:
+    def __init__(self, writer: asyncio.StreamWriter, key: bytes, mode='auto', executor=None, workers=None,
+                 max_in_flight=4):
+        assert max_in_flight > 0
+        self.writer = writer
+        self._offload = _Offload(key, mode, executor, workers)
+        self._base = os.urandom(12)
+        self._seq = 0
+        self._max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending = collections.deque()
+        self._flusher = None
+        self._error = None
+        self.writer.write(HEADER.pack(MAGIC, VERSION, self._base))
+
+    def _seal(self, seq: int, data, final: bool) -> bytes:
+        ciphertext, tag = self._offload.gcm.encrypt(data, _segment_nonce(self._base, seq), _record_aad(seq, final))
+        return FRAME.pack(1 if final else 0, len(ciphertext)) + ciphertext + tag
+
+    async def _flush_pending(self):
+        # 按序号顺序写出已加密的记录；底层缓冲区满时由drain()等待
+        try:
+            while self._pending:
+                frame = await self._pending[0]
+                self.writer.write(frame)
+                await self.writer.drain()
+                self._pending.popleft()
+                self._slots.release()
+        except BaseException as e:
+            # 错误经_error交给write_record/flush/close的调用方；取消尚未写出的记录，
+            # 并释放全部槽位，唤醒在acquire()上等待的调用方
+            self._error = e
+            while self._pending:
+                self._pending.popleft().cancel()
+            for _ in range(self._max_in_flight):
+                self._slots.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+    async def _submit(self, data, final: bool):
+        if self._error is not None:
+            raise self._error
+        await self._slots.acquire()
+        # 等待期间写出可能已经失败
+        if self._error is not None:
+            raise self._error
+        seq = self._seq
+        self._seq += 1
+        self._pending.append(self._offload.run(self._seal, seq, bytes(data), final))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_pending())
+
+    async def write_record(self, data):
+        """提交一条记录：加密在线程池中进行，在途记录已满时等待（背压）"""
+        if len(data) > MAX_RECORD_SIZE:
+            raise ValueError('record too large')
+        await self._submit(data, False)
+
+    async def flush(self):
+        """等待已提交的记录全部写入底层流"""
+        while self._flusher is not None and not self._flusher.done():
+            await self._flusher
+        if self._error is not None:
+            raise self._error
+
+    async def close(self):
+        """发送结束记录并关闭底层流"""
+        try:
+            await self._submit(b'', True)
+            await self.flush()
+        finally:
+            try:
+                # _submit先抛出时写出任务可能仍在进行，等它结束（其错误已记录在_error中）
+                if self._flusher is not None and not self._flusher.done():
+                    await asyncio.wait([self._flusher])
+                self.writer.close()
+                try:
+                    await self.writer.wait_closed()
+                except OSError:
+                    # 连接已经出错时关闭也可能失败，保留原来的错误
+                    if self._error is None:
+                        raise
+            finally:
+                self._offload.shutdown()
+
+
+class SM4GCMStreamReader:
+    def __init__(self, reader: asyncio.StreamReader, key: bytes, mode='auto', executor=None, workers=None,
+                 max_in_flight=4, max_record_size=MAX_RECORD_SIZE):
+        assert max_in_flight > 0
+        self.reader = reader
+        self.max_record_size = max_record_size
+        self._offload = _Offload(key, mode, executor, workers)
+        self._records = asyncio.Queue(max_in_flight)
+        self._fetcher = None
+        self._done = False
+        self._error = None
+
+    def _open(self, base: bytes, seq: int, body: bytes, final: bool) -> bytes:
+        return self._offload.gcm.decrypt(body[:-TAG_SIZE], _segment_nonce(base, seq), body[-TAG_SIZE:],
+                                         _record_aad(seq, final))
+
+    async def _fetch(self):
+        # 读出的记录立即交给线程池解密；队列满时停止读取底层流
+        try:
+            header = await self.reader.readexactly(HEADER.size)
+            magic, version, base = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('not an SM4S stream')
+            seq = 0
+            while True:
+                flags, length = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+                if length > self.max_record_size:
+                    raise ValueError('record too large')
+                body = await self.reader.readexactly(length + TAG_SIZE)
+                final = flags == 1
+                await self._records.put((self._offload.run(self._open, base, seq, body, final), final))
+                if final:
+                    return
+                seq += 1
+        except asyncio.IncompleteReadError:
+            error = ValueError('truncated stream')
+        except Exception as e:
+            error = e
+        failed = asyncio.get_running_loop().create_future()
+        failed.set_exception(error)
+        await self._records.put((failed, False))
+
+    async def read_record(self):
+        """返回下一条已认证的记录；对端正常结束时返回None，认证失败或流被截断时抛出ValueError"""
+        if self._error is not None:
+            raise self._error
+        if self._done:
+            return None
+        if self._fetcher is None:
+            self._fetcher = asyncio.ensure_future(self._fetch())
+        future, final = await self._records.get()
+        try:
+            record = await future
+        except Exception as e:
+            self._error = e
+            self._offload.shutdown()
+            raise
+        if final:
+            self._done = True
+            self._offload.shutdown()
+            return None
+        return record
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        record = await self.read_record()
+        if record is None:
+            raise StopAsyncIteration
+        return record
+
+
+def wrap_streams(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, key: bytes, mode='auto', workers=None,
+                 max_in_flight=4, max_record_size=MAX_RECORD_SIZE):
+    """把一对asyncio流（例如start_server回调的参数）封装为加密的读写端"""
+    return (SM4GCMStreamReader(reader, key, mode, workers=workers, max_in_flight=max_in_flight,
+                               max_record_size=max_record_size),
+            SM4GCMStreamWriter(writer, key, mode, workers=workers, max_in_flight=max_in_flight))
+
+
+async def open_connection(host, port, key: bytes, **kwargs):
+    """建立TCP连接并返回(SM4GCMStreamReader, SM4GCMStreamWriter)，其余参数同wrap_streams"""
+    reader, writer = await asyncio.open_connection(host, port)
+    return wrap_streams(reader, writer, key, **kwargs)
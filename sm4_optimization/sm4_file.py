@@ -0,0 +1,257 @@
+"""
+SM4-GCM分段文件加密命令行工具
+
+文件格式：
+    头部  'SM4F' | 版本(1B) | 段长(4B) | 基础nonce(12B)
+    段i   密文(段长字节，最后一段可以更短) | tag(16B)
+
+每段是一次标准SM4-GCM加密（tag = E_K(J0) ⊕ GHASH，见sm4_gcm.SM4GCM），第i段的nonce为基础nonce的
+低64位异或i，AAD为头部 || i(8B) || 是否最后一段(1B)。在同一密钥下基础nonce不重复（默认随机生成）
+的前提下，段被交换、重放或截断都无法通过认证。每段长度固定，任意字节范围只需解密覆盖它的几段。
+
+版本1的文件使用了未掩盖的tag（可从一个段推出GHASH密钥H并伪造任意段），不再支持读取。
+
+读文件、加解密、写文件组成流水线：主线程读，线程池加解密（C库调用期间释放GIL），
+写线程按顺序写出；在途的段数由有界队列限制，内存占用与文件大小无关。
+
+    python sm4_file.py encrypt -k 0123456789abcdeffedcba9876543210 plain.bin enc.bin
+    python sm4_file.py decrypt -k 0123456789abcdeffedcba9876543210 enc.bin plain.bin
+    python sm4_file.py decrypt -k ... enc.bin part.bin --decrypt-range 1000:5000
+"""
+
+import argparse
+import os
+import queue
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sm4_gcm import SM4GCM
+
+MAGIC = b'SM4F'
+VERSION = 2
+HEADER = struct.Struct('>4sBI12s')
+TAG_SIZE = 16
+DEFAULT_SEGMENT_SIZE = 1 << 20
+
+
+def _segment_nonce(base: bytes, index: int) -> bytes:
+    return base[:4] + (int.from_bytes(base[4:], 'big') ^ index).to_bytes(8, 'big')
+
+
+def _segment_aad(header: bytes, index: int, final: bool) -> bytes:
+    return header + struct.pack('>QB', index, 1 if final else 0)
+
+
+def _read_segments(f, size):
+    """依次读出(段号, 数据, 是否最后一段)；多读一段以判断最后一段，空输入也产生一个空段"""
+    index = 0
+    current = f.read(size)
+    while True:
+        following = f.read(size) if len(current) == size else b''
+        final = not following
+        yield index, current, final
+        if final:
+            return
+        index += 1
+        current = following
+
+
+def _pipeline(items, process, write, workers, depth):
+    """主线程迭代items（读文件）并提交给线程池，写线程按提交顺序写出结果
+
+    在途的段最多depth个；任一阶段出错时停止读取并在最后抛出该异常。
+    """
+    pending = queue.Queue(depth)
+    errors = []
+
+    def writer():
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            if errors:
+                continue
+            try:
+                write(future.result())
+            except BaseException as e:
+                errors.append(e)
+
+    with ThreadPoolExecutor(workers) as executor:
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for item in items:
+                if errors:
+                    break
+                pending.put(executor.submit(process, *item))
+        finally:
+            pending.put(None)
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _workers(workers):
+    return workers or os.cpu_count() or 1
+
+
+def encrypt_file(src, dst, key: bytes, segment_size=DEFAULT_SEGMENT_SIZE, workers=None, nonce=None):
+    """把文件对象src加密写入dst，返回写出的字节数"""
+    if not 0 < segment_size < 1 << 32:
+        raise ValueError('invalid segment size')
+    gcm = SM4GCM(key, mode='auto')
+    base = nonce if nonce is not None else os.urandom(12)
+    header = HEADER.pack(MAGIC, VERSION, segment_size, base)
+    dst.write(header)
+    total = [len(header)]
+
+    def process(index, plaintext, final):
+        ciphertext, tag = gcm.encrypt(plaintext, _segment_nonce(base, index), _segment_aad(header, index, final))
+        return ciphertext + tag
+
+    def write(segment):
+        dst.write(segment)
+        total[0] += len(segment)
+
+    workers = _workers(workers)
+    _pipeline(_read_segments(src, segment_size), process, write, workers, 2 * workers)
+    return total[0]
+
+
+def _read_header(src) -> tuple:
+    header = src.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ValueError('truncated header')
+    magic, version, segment_size, base = HEADER.unpack(header)
+    if magic == MAGIC and version == 1:
+        raise ValueError('SM4F version 1 files are not authenticated; re-encrypt them')
+    if magic != MAGIC or version != VERSION or segment_size == 0:
+        raise ValueError('not an SM4F file')
+    return header, segment_size, base
+
+
+def decrypt_file(src, dst, key: bytes, workers=None):
+    """解密整个文件写入dst，返回明文字节数；任一段认证失败时抛出ValueError
+
+    认证失败前已写出的段都通过了认证，但调用方应丢弃不完整的输出。
+    """
+    gcm = SM4GCM(key, mode='auto')
+    header, segment_size, base = _read_header(src)
+    total = [0]
+
+    def process(index, segment, final):
+        if len(segment) < TAG_SIZE:
+            raise ValueError('truncated segment')
+        return gcm.decrypt(segment[:-TAG_SIZE], _segment_nonce(base, index), segment[-TAG_SIZE:],
+                           _segment_aad(header, index, final))
+
+    def write(plaintext):
+        dst.write(plaintext)
+        total[0] += len(plaintext)
+
+    workers = _workers(workers)
+    _pipeline(_read_segments(src, segment_size + TAG_SIZE), process, write, workers, 2 * workers)
+    return total[0]
+
+
+def plaintext_size(src) -> int:
+    """由可seek的密文文件大小算出明文长度"""
+    src.seek(0)
+    _, segment_size, _ = _read_header(src)
+    body = os.fstat(src.fileno()).st_size - HEADER.size
+    nsegments = max(1, -(-body // (segment_size + TAG_SIZE)))
+    size = body - nsegments * TAG_SIZE
+    if size < 0:
+        raise ValueError('truncated segment')
+    return size
+
+
+def decrypt_range(src, key: bytes, start: int, end: int, workers=None) -> bytes:
+    """只解密覆盖明文[start, end)的段并返回该范围的明文（src需可seek）
+
+    只认证被读取的段；最后一段的标志位仍然校验，因此范围包含文件末尾时能发现截断。
+    """
+    if start < 0:
+        raise ValueError('invalid range')
+    gcm = SM4GCM(key, mode='auto')
+    size = plaintext_size(src)
+    src.seek(0)
+    header, segment_size, base = _read_header(src)
+    nsegments = max(1, -(-size // segment_size))
+    end = min(end, size)
+    if start >= end:
+        return b''
+    first, last = start // segment_size, (end - 1) // segment_size
+    stride = segment_size + TAG_SIZE
+
+    def items():
+        for index in range(first, last + 1):
+            src.seek(HEADER.size + index * stride)
+            yield index, src.read(stride), index == nsegments - 1
+
+    def process(index, segment, final):
+        return gcm.decrypt(segment[:-TAG_SIZE], _segment_nonce(base, index), segment[-TAG_SIZE:],
+                           _segment_aad(header, index, final))
+
+    parts = []
+    workers = _workers(workers)
+    _pipeline(items(), process, parts.append, workers, 2 * workers)
+    offset = first * segment_size
+    return b''.join(parts)[start - offset:end - offset]
+
+
+def _parse_range(text):
+    start, _, end = text.partition(':')
+    return int(start or 0), int(end) if end else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SM4-GCM分段文件加密')
+    parser.add_argument('command', choices=('encrypt', 'decrypt'))
+    parser.add_argument('input')
+    parser.add_argument('output', help="输出文件，'-'表示标准输出")
+    parser.add_argument('-k', '--key', required=True, help='16字节密钥的十六进制表示')
+    parser.add_argument('--segment-size', type=int, default=DEFAULT_SEGMENT_SIZE, help='每段明文字节数')
+    parser.add_argument('--workers', type=int, default=None, help='加解密线程数，默认CPU核数')
+    parser.add_argument('--decrypt-range', metavar='START:END', help='只解密明文的[START, END)字节')
+    args = parser.parse_args(argv)
+
+    key = bytes.fromhex(args.key)
+    if len(key) != 16:
+        parser.error('key must be 16 bytes')
+    if args.decrypt_range and args.command != 'decrypt':
+        parser.error('--decrypt-range requires decrypt')
+
+    to_stdout = args.output == '-'
+    dst = sys.stdout.buffer if to_stdout else open(args.output, 'wb')
+    failed = True
+    try:
+        with open(args.input, 'rb') as src:
+            if args.decrypt_range:
+                start, end = _parse_range(args.decrypt_range)
+                dst.write(decrypt_range(src, key, start, end if end is not None else sys.maxsize, args.workers))
+            elif args.command == 'encrypt':
+                encrypt_file(src, dst, key, args.segment_size, args.workers)
+            else:
+                decrypt_file(src, dst, key, args.workers)
+        failed = False
+    except ValueError as e:
+        print(f'错误: {e}', file=sys.stderr)
+        return 1
+    finally:
+        # 任何失败（认证失败、读写错误、中断）都删除不完整的输出文件，其他异常继续抛出
+        if not to_stdout:
+            try:
+                dst.close()
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                if failed:
+                    os.remove(args.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,11 @@
+import hmac
 import os
 import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
 from sm4_v0 import SM4
 from sm4_ttable import SM4TTable
-from sm4_opt import SM4Optimized
 
 # Galois域乘法
 # 参考NIST SP800-38D
@@ -44,10 +46,90 @@ def ghash(h: bytes, aad: bytes, ciphertext: bytes) -> bytes:
     y = gf_mul(y ^ length_block, h_int)
     return y.to_bytes(16, 'big')
 
+def _ghash_tables(h: bytes):
+    """按字节位置为H预计算8位乘法表（Shoup方法，16张表×256项）
+
+    GF(2^128)乘法对第一个参数是线性的，X·H等于X每个字节单独乘H后的异或，
+    tables[i][b]即“第i个字节为b、其余为0的块”乘H的结果。
+    """
+    R = 0xE1000000000000000000000000000000
+    # hx[k] = H·x^k，对应块中第k位（最高位为第0位）
+    v = int.from_bytes(h, 'big')
+    hx = []
+    for _ in range(128):
+        hx.append(v)
+        v = (v >> 1) ^ R if v & 1 else v >> 1
+    tables = []
+    for i in range(16):
+        t = [0] * 256
+        for j in range(8):
+            bit = 1 << j
+            val = hx[8 * i + 7 - j]
+            for b in range(bit):
+                t[bit | b] = t[b] ^ val
+        tables.append(t)
+    return tables
+
+class GHash:
+    """查表法GHASH，乘法表按H预计算一次，每个块只需16次查表和异或"""
+
+    def __init__(self, h: bytes):
+        assert len(h) == 16
+        self.tables = _ghash_tables(h)
+
+    def update(self, y: int, data) -> int:
+        """从状态y开始吸收data（不足16字节的尾部补零），返回新状态"""
+        (t0, t1, t2, t3, t4, t5, t6, t7,
+         t8, t9, t10, t11, t12, t13, t14, t15) = self.tables
+        rem = len(data) % 16
+        if rem:
+            data = self._pad(data, rem)
+        from_bytes = int.from_bytes
+        for i in range(0, len(data), 16):
+            b = (y ^ from_bytes(data[i:i+16], 'big')).to_bytes(16, 'big')
+            y = (t0[b[0]] ^ t1[b[1]] ^ t2[b[2]] ^ t3[b[3]] ^
+                 t4[b[4]] ^ t5[b[5]] ^ t6[b[6]] ^ t7[b[7]] ^
+                 t8[b[8]] ^ t9[b[9]] ^ t10[b[10]] ^ t11[b[11]] ^
+                 t12[b[12]] ^ t13[b[13]] ^ t14[b[14]] ^ t15[b[15]])
+        return y
+
+    @staticmethod
+    def _pad(data, rem: int) -> bytes:
+        return bytes(data) + b'\x00' * (16 - rem)
+
+    def finalize(self, y: int, aad_len: int, ct_len: int) -> bytes:
+        """吸收长度块（字节长度）并输出16字节结果"""
+        length_block = ((aad_len * 8) << 64) | (ct_len * 8)
+        return self.update(y, length_block.to_bytes(16, 'big')).to_bytes(16, 'big')
+
+    def digest(self, aad: bytes, ciphertext: bytes) -> bytes:
+        """与ghash(h, aad, ciphertext)结果相同"""
+        y = self.update(0, aad)
+        y = self.update(y, ciphertext)
+        return self.finalize(y, len(aad), len(ciphertext))
+
+# parallel模式的线程池按线程数在模块内共享，首次使用时创建，不随SM4GCM实例增加线程
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _shared_executor(workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ThreadPoolExecutor(max_workers=workers)
+        return executor
+
 class SM4GCM:
-    def __init__(self, key: bytes, mode: str = 'base'):
+    def __init__(self, key: bytes, mode: str = 'base', workers: int = None, chunk_size: int = 1 << 18):
         assert len(key) == 16
+        if mode == 'auto':
+            # 由sm4统一入口探测可用实现
+            import sm4
+            mode = sm4.gcm_mode()
         self.key = key
+        self._executor = None
+        # 是否使用C库的完整GCM处理一次性加解密
+        self._native = mode in ('native', 'parallel')
         if mode == 'base':
             self.sm4 = SM4()
             self.encrypt_block = self.sm4.encrypt_block
@@ -56,44 +138,326 @@ class SM4GCM:
             self.sm4 = SM4TTable()
             self.encrypt_block = self.sm4.encrypt_block
             self.decrypt_block = self.sm4.decrypt_block
-        elif mode == 'opt':
+        elif mode in ('opt', 'native'):
+            from sm4_opt import SM4Optimized
             self.sm4 = SM4Optimized()
             self.encrypt_block = self.sm4.encrypt_block_optimized
             self.decrypt_block = self.sm4.decrypt_block_optimized
+        elif mode == 'parallel':
+            # 大消息按chunk_size切分，由线程池调用C库并行处理（ctypes调用期间释放GIL）
+            assert chunk_size > 0 and chunk_size % 16 == 0
+            from sm4_opt import SM4Optimized
+            self.sm4 = SM4Optimized()
+            self.encrypt_block = self.sm4.encrypt_block_optimized
+            self.decrypt_block = self.sm4.decrypt_block_optimized
+            self.chunk_size = chunk_size
+            self._executor = _shared_executor(workers or os.cpu_count() or 1)
+        elif mode == 'numpy':
+            # NumPy为可选依赖，仅在使用该模式时导入
+            from sm4_numpy import SM4NumPy
+            self.sm4 = SM4NumPy()
+            self.encrypt_block = self.sm4.encrypt_block
+            self.decrypt_block = self.sm4.decrypt_block
         else:
             raise ValueError('Unknown mode')
+        # 支持批量CTR的实现一次调用处理全部计数器块
+        self.ctr_xor = getattr(self.sm4, 'ctr_xor', None)
+        # H和GHASH乘法表只与密钥有关，构造时计算一次
+        self.h = self.encrypt_block(b'\x00'*16, self.key)
+        self._ghash = GHash(self.h)
+        if self._executor is not None:
+            self._native_table = self.sm4.ghash_table(self.h)
+            self._h_powers = {}
 
     def _inc32(self, ctr: bytes) -> bytes:
-        c = int.from_bytes(ctr, 'big')
-        c = (c + 1) & ((1 << 128) - 1)
-        return c.to_bytes(16, 'big')
+        # 仅低32位递增（NIST SP800-38D的inc32）
+        c = (int.from_bytes(ctr[12:], 'big') + 1) & 0xFFFFFFFF
+        return ctr[:12] + c.to_bytes(4, 'big')
+
+    def _ctr_into(self, counter: bytearray, data, out):
+        """CTR加解密data写入out，counter原地推进（每个块都消耗一个计数器）
+
+        没有批量CTR的实现逐块生成密钥流并异或，内存占用与数据长度无关。
+        """
+        if self.ctr_xor is not None:
+            self.ctr_xor(counter, data, self.key, out=out)
+            return
+        encrypt_block = self.encrypt_block
+        key = self.key
+        from_bytes = int.from_bytes
+        for i in range(0, len(data), 16):
+            block = data[i:i+16]
+            n = len(block)
+            enc = encrypt_block(bytes(counter), key)
+            out[i:i+n] = (from_bytes(block, 'big') ^ from_bytes(enc[:n], 'big')).to_bytes(n, 'big')
+            counter[12:] = ((from_bytes(counter[12:], 'big') + 1) & 0xFFFFFFFF).to_bytes(4, 'big')
+
+    @staticmethod
+    def _j0(iv: bytes) -> bytes:
+        """96位IV的预计数器块 J0 = IV || 00000001"""
+        return iv + b'\x00\x00\x00\x01'
+
+    def _seal(self, iv: bytes, s: bytes) -> bytes:
+        """tag = E_K(J0) ^ GHASH，不掩盖的GHASH会泄露H，从而可以伪造任意消息的tag"""
+        mask = self.encrypt_block(self._j0(iv), self.key)
+        return (int.from_bytes(mask, 'big') ^ int.from_bytes(s, 'big')).to_bytes(16, 'big')
 
     def gctr(self, icb: bytes, data: bytes) -> bytes:
         assert len(icb) == 16
-        n = (len(data) + 15) // 16
-        out = b''
-        cb = icb
-        for i in range(n):
-            block = data[i*16:(i+1)*16]
-            enc = self.encrypt_block(cb, self.key)
-            out += bytes([a ^ b for a, b in zip(block, enc[:len(block)])])
-            cb = self._inc32(cb)
-        return out
+        out = bytearray(len(data))
+        self._ctr_into(bytearray(icb), memoryview(data), memoryview(out))
+        return bytes(out)
+
+    def _h_power(self, k: int) -> int:
+        """H^k（按k缓存），用于把各段的GHASH结果拼接起来"""
+        hk = self._h_powers.get(k)
+        if hk is None:
+            hk = 1 << 127  # GF(2^128)中的单位元
+            base = int.from_bytes(self.h, 'big')
+            e = k
+            while e:
+                if e & 1:
+                    hk = gf_mul(hk, base)
+                base = gf_mul(base, base)
+                e >>= 1
+            self._h_powers[k] = hk
+        return hk
+
+    def _use_parallel(self, data) -> bool:
+        return self._executor is not None and len(data) >= 2 * self.chunk_size
+
+    def _chunks(self, n: int):
+        chunk = self.chunk_size
+        return [(offset, min(chunk, n - offset)) for offset in range(0, n, chunk)]
+
+    def _combine(self, chunks, digests, aad: bytes, n: int) -> bytes:
+        """合并各段从零状态计算的GHASH
+
+        段i的结果为d_i，整体状态满足 Y = Y_prev·H^{m_i} ^ d_i（m_i为段i的块数），
+        因此与顺序计算逐位相同。
+        """
+        y = self._ghash.update(0, aad)
+        for (_, length), digest in zip(chunks, digests):
+            y = gf_mul(y, self._h_power((length + 15) // 16)) ^ int.from_bytes(digest, 'big')
+        return self._ghash.finalize(y, len(aad), n)
+
+    @staticmethod
+    def _chunk_counter(iv: bytes, offset: int) -> bytes:
+        # 数据从inc32(J0)开始计数，offset处的块使用计数器 2 + offset/16
+        return iv + ((2 + offset // 16) & 0xFFFFFFFF).to_bytes(4, 'big')
+
+    def _encrypt_parallel(self, data, iv: bytes, aad: bytes):
+        """多线程加密：各段独立完成CTR和GHASH，再用H的幂合并各段GHASH"""
+        n = len(data)
+        out = bytearray(n)
+        chunks = self._chunks(n)
+
+        def work(chunk):
+            offset, length = chunk
+            return self.sm4.gcm_ctr_ghash(self.key, self._native_table, self._chunk_counter(iv, offset),
+                                          data, out, True, offset, length)
+
+        digests = list(self._executor.map(work, chunks))
+        return bytes(out), self._seal(iv, self._combine(chunks, digests, aad, n))
+
+    def _ghash_parallel(self, data, aad: bytes) -> bytes:
+        """多线程计算密文的GHASH（未掩盖）"""
+        chunks = self._chunks(len(data))
+
+        def work(chunk):
+            offset, length = chunk
+            return bytes(self.sm4.ghash_update(self._native_table, bytearray(16), data, offset, length))
+
+        digests = list(self._executor.map(work, chunks))
+        return self._combine(chunks, digests, aad, len(data))
+
+    def _ctr_parallel(self, data, iv: bytes) -> bytes:
+        """多线程CTR解密"""
+        out = bytearray(len(data))
+
+        def work(chunk):
+            offset, length = chunk
+            self.sm4.ctr_xor(self._chunk_counter(iv, offset), data, self.key, out, offset, length)
+
+        list(self._executor.map(work, self._chunks(len(data))))
+        return bytes(out)
 
     def encrypt(self, plaintext: bytes, iv: bytes, aad: bytes = b''):
         assert len(iv) == 12  # 96位IV
-        h = self.encrypt_block(b'\x00'*16, self.key)
-        j0 = iv + b'\x00\x00\x00\x01'
-        ciphertext = self.gctr(j0, plaintext)
-        tag = ghash(h, aad, ciphertext)
+        if self._use_parallel(plaintext):
+            return self._encrypt_parallel(plaintext, iv, aad)
+        if self._native:
+            ciphertext, tag = self.sm4.gcm_encrypt(self.key, iv, plaintext, aad)
+            return bytes(ciphertext), tag
+        ciphertext = self.gctr(self._inc32(self._j0(iv)), plaintext)
+        tag = self._seal(iv, self._ghash.digest(aad, ciphertext))
         return ciphertext, tag
 
     def decrypt(self, ciphertext: bytes, iv: bytes, tag: bytes, aad: bytes = b''):
+        """先校验tag（常量时间比较）再解密，伪造或损坏的消息不做任何密钥流计算"""
         assert len(iv) == 12
-        h = self.encrypt_block(b'\x00'*16, self.key)
-        j0 = iv + b'\x00\x00\x00\x01'
-        plaintext = self.gctr(j0, ciphertext)
-        check_tag = ghash(h, aad, ciphertext)
-        if check_tag != tag:
+        if self._native and not self._use_parallel(ciphertext):
+            return bytes(self.sm4.gcm_decrypt(self.key, iv, ciphertext, tag, aad))
+        if self._use_parallel(ciphertext):
+            check_tag = self._seal(iv, self._ghash_parallel(ciphertext, aad))
+        else:
+            check_tag = self._seal(iv, self._ghash.digest(aad, ciphertext))
+        if not hmac.compare_digest(check_tag, tag):
             raise ValueError('Tag mismatch!')
-        return plaintext 
\ No newline at end of file
+        if self._use_parallel(ciphertext):
+            return self._ctr_parallel(ciphertext, iv)
+        return self.gctr(self._inc32(self._j0(iv)), ciphertext)
+
+    def decrypt_stream(self, src, dst, iv: bytes, tag: bytes, aad: bytes = b'', chunk_size: int = 1 << 20) -> int:
+        """对可seek的输入做两趟流式解密：第一趟只计算并校验tag，通过后回到起点解密写入dst
+
+        tag不匹配时抛出ValueError且不向dst写入任何数据；返回写入的明文字节数。
+        """
+        start = src.tell()
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        verifier = SM4GCMDecryptor(self, iv, tag, aad)
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            verifier._absorb(view[:n])
+        verifier.finalize()
+        src.seek(start)
+        stream = _GCTRStream(self, iv, aad)
+        total = 0
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            stream.update(view[:n], out=view[:n])
+            dst.write(view[:n])
+            total += n
+        return total
+
+    def encryptor(self, iv: bytes, aad: bytes = b''):
+        """增量加密对象：多次update(chunk)后finalize()得到tag"""
+        return SM4GCMEncryptor(self, iv, aad)
+
+    def decryptor(self, iv: bytes, tag: bytes = None, aad: bytes = b''):
+        """增量解密对象：多次update(chunk)后finalize()校验tag
+
+        tag也可以在finalize(tag)时再给出（例如tag位于数据流末尾）。
+        """
+        return SM4GCMDecryptor(self, iv, tag, aad)
+
+class _GCMStream:
+    """流式GCM公共部分：保存计数器、GHASH状态和不足一块的剩余数据，内存占用恒定"""
+
+    def __init__(self, gcm: SM4GCM, iv: bytes, aad: bytes):
+        assert len(iv) == 12
+        self._gcm = gcm
+        self._iv = iv
+        self._counter = bytearray(gcm._inc32(gcm._j0(iv)))
+        self._keystream = b''           # 上一个不完整块剩余的密钥流
+        self._pending = b''             # 尚未凑满16字节、等待GHASH的密文
+        self._y = gcm._ghash.update(0, aad)
+        self._aad_len = len(aad)
+        self._ct_len = 0
+        self._finalized = False
+
+    def _absorb(self, ciphertext):
+        """GHASH吸收密文，只处理完整块，不足16字节的部分留到下次"""
+        self._ct_len += len(ciphertext)
+        ghash = self._gcm._ghash
+        if self._pending:
+            need = 16 - len(self._pending)
+            head = bytes(ciphertext[:need])
+            ciphertext = ciphertext[need:]
+            self._pending += head
+            if len(self._pending) < 16:
+                return
+            self._y = ghash.update(self._y, self._pending)
+            self._pending = b''
+        full = len(ciphertext) - len(ciphertext) % 16
+        if full:
+            self._y = ghash.update(self._y, ciphertext[:full])
+        self._pending = bytes(ciphertext[full:])
+
+    def _xor(self, data, out):
+        """data与密钥流异或写入out（两者都是字节memoryview）"""
+        n = len(data)
+        pos = 0
+        if self._keystream:
+            k = min(n, len(self._keystream))
+            out[:k] = bytes(a ^ b for a, b in zip(data[:k], self._keystream[:k]))
+            self._keystream = self._keystream[k:]
+            pos = k
+        full = (n - pos) - (n - pos) % 16
+        if full:
+            self._gcm._ctr_into(self._counter, data[pos:pos+full], out[pos:pos+full])
+            pos += full
+        if pos < n:
+            # 最后一个不完整块：生成整块密钥流，剩余部分留给下一次update
+            ks = bytearray(16)
+            self._gcm._ctr_into(self._counter, bytes(16), memoryview(ks))
+            k = n - pos
+            out[pos:n] = bytes(a ^ b for a, b in zip(data[pos:n], ks[:k]))
+            self._keystream = bytes(ks[k:])
+
+    def _process(self, chunk, out):
+        if self._finalized:
+            raise ValueError('stream already finalized')
+        data = memoryview(chunk).cast('B')
+        if out is None:
+            result = bytearray(len(data))
+            view = memoryview(result)
+        else:
+            view = memoryview(out).cast('B')
+            if len(view) < len(data):
+                raise ValueError('output buffer too small')
+            view = view[:len(data)]
+        self._transform(data, view)
+        if out is None:
+            return bytes(result)
+        return len(data)
+
+    def update(self, chunk, out=None):
+        """处理一段数据；out为None时返回结果bytes，否则写入out并返回写入的字节数"""
+        return self._process(chunk, out)
+
+    def _tag(self) -> bytes:
+        self._finalized = True
+        y = self._gcm._ghash.update(self._y, self._pending)
+        return self._gcm._seal(self._iv, self._gcm._ghash.finalize(y, self._aad_len, self._ct_len))
+
+class SM4GCMEncryptor(_GCMStream):
+    def _transform(self, data, out):
+        self._xor(data, out)
+        self._absorb(out)
+
+    def finalize(self) -> bytes:
+        """结束加密，返回16字节tag"""
+        return self._tag()
+
+class SM4GCMDecryptor(_GCMStream):
+    """流式解密：update输出的明文在finalize校验tag之前都未经认证"""
+
+    def __init__(self, gcm: SM4GCM, iv: bytes, tag: bytes, aad: bytes):
+        super().__init__(gcm, iv, aad)
+        self._expected_tag = tag
+
+    def _transform(self, data, out):
+        # 先吸收密文再解密，支持out与输入为同一缓冲区的原地解密
+        self._absorb(data)
+        self._xor(data, out)
+
+    def finalize(self, tag: bytes = None) -> None:
+        """结束解密并校验tag，不匹配时抛出ValueError"""
+        if tag is None:
+            tag = self._expected_tag
+        if tag is None:
+            raise ValueError('tag required')
+        if not hmac.compare_digest(self._tag(), tag):
+            raise ValueError('Tag mismatch!')
+
+class _GCTRStream(_GCMStream):
+    """只做CTR不计算GHASH，用于已经通过认证的数据"""
+
+    def _transform(self, data, out):
+        self._xor(data, out)
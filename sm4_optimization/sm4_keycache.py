@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class RoundKeyCache:
+    """按密钥缓存扩展后的轮密钥（有界LRU）
+
+    expand(key) 返回 (加密轮密钥, 解密轮密钥)，缓存项以密钥字节为键。
+    maxsize 为 0 时不缓存，每次都重新扩展密钥。
+    """
+
+    def __init__(self, expand, maxsize=64):
+        self._expand = expand
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        key = bytes(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = self._expand(key)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = entry
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
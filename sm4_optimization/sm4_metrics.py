@@ -0,0 +1,193 @@
+"""
+SM4/SM4-GCM分阶段计时
+
+    metrics = StageMetrics()
+    with metrics.instrument(gcm):          # SM4GCM或任一分组实现（SM4、SM4TTable、SM4NumPy、SM4Optimized）
+        gcm.encrypt(data, iv, aad)
+    metrics.to_dict()   # {'ghash': {'ns': ..., 'bytes': ..., 'calls': ...}, ...}
+
+instrument()只在with块内把对象上的相应方法替换为计时包装，退出时还原；
+未启用时对象上没有任何包装，热路径不做额外判断，开销为零。
+
+阶段：
+    key_expansion      密钥扩展（轮密钥缓存未命中时）
+    block              单块加解密
+    ecb                批量ECB
+    keystream          CTR密钥流生成
+    ctr                CTR加解密（C/NumPy/T-table的ctr_xor，或纯Python GCM的逐块循环_ctr_into）
+    ghash              GHASH吸收数据
+    padding            GHASH对不足16字节的尾部补零
+    gcm_native         C库的完整GCM加解密
+    ctr_ghash_native   C库的CTR+GHASH融合（多线程GCM的每个分段）
+
+阶段可以嵌套（例如NumPy的ctr中包含keystream，C库GCM中包含key_expansion），
+各阶段分别累计，不从外层阶段中扣除内层耗时。
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _nbytes(obj):
+    try:
+        return memoryview(obj).nbytes
+    except TypeError:
+        return 0
+
+
+def _arg(i):
+    return lambda args: _nbytes(args[i]) if len(args) > i else 0
+
+
+def _blocks(i):
+    return lambda args: 16 * args[i] if len(args) > i else 0
+
+
+def _fixed(n):
+    return lambda args: n
+
+
+def _window(data, length):
+    # (data, ..., offset, length)形式的调用只处理data的一部分
+    def size(args):
+        if len(args) > length and args[length] is not None:
+            return args[length]
+        return _nbytes(args[data]) if len(args) > data else 0
+    return size
+
+
+# 分组实现上的方法：属性名 -> (阶段, 字节数计算)
+_BACKEND_STAGES = {
+    'encrypt_block': ('block', _fixed(16)),
+    'decrypt_block': ('block', _fixed(16)),
+    'encrypt_block_optimized': ('block', _fixed(16)),
+    'decrypt_block_optimized': ('block', _fixed(16)),
+    'encrypt_blocks': ('ecb', _arg(0)),
+    'decrypt_blocks': ('ecb', _arg(0)),
+    'ctr_keystream': ('keystream', _blocks(1)),
+    'ctr_xor': ('ctr', _window(1, 5)),
+    'ghash_update': ('ghash', _window(2, 4)),
+    'gcm_encrypt': ('gcm_native', _arg(2)),
+    'gcm_decrypt': ('gcm_native', _arg(2)),
+    'gcm_ctr_ghash': ('ctr_ghash_native', _window(3, 7)),
+}
+
+# SM4GCM上的属性
+_GCM_STAGES = {
+    'encrypt_block': ('block', _fixed(16)),
+    'ctr_xor': ('ctr', _arg(1)),
+}
+
+# 底层实现没有ctr_xor时，为SM4GCM自身的逐块CTR循环计时
+_GCM_PURE_CTR_STAGES = {
+    '_ctr_into': ('ctr', _arg(1)),
+}
+
+# GHash上的方法
+_GHASH_STAGES = {
+    'update': ('ghash', _arg(1)),
+    '_pad': ('padding', lambda args: 16 - args[1]),
+}
+
+
+class StageMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._callbacks = []
+
+    def add_callback(self, callback):
+        """注册回调callback(stage, ns, nbytes)，每次记录时调用（可能在工作线程中）"""
+        self._callbacks.append(callback)
+
+    def record(self, stage: str, ns: int, nbytes: int = 0):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = [0, 0, 0]
+            entry[0] += ns
+            entry[1] += nbytes
+            entry[2] += 1
+        for callback in self._callbacks:
+            callback(stage, ns, nbytes)
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        """手动计时一段代码：with metrics.stage('io', n): ..."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start, nbytes)
+
+    def _wrap(self, func, stage, size):
+        record = self.record
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, clock() - start, size(args))
+        return timed
+
+    def _patch(self, obj, stages, restore):
+        for name, (stage, size) in stages.items():
+            func = getattr(obj, name, None)
+            if func is None:
+                continue
+            restore.append((obj, name, name in vars(obj), func))
+            setattr(obj, name, self._wrap(func, stage, size))
+
+    def _patch_target(self, target, restore, seen):
+        if id(target) in seen:
+            return
+        seen.add(id(target))
+        if hasattr(target, '_ghash'):
+            # SM4GCM：自身的CTR/GHASH步骤，再加上底层分组实现
+            self._patch(target, _GCM_STAGES, restore)
+            if target.ctr_xor is None:
+                self._patch(target, _GCM_PURE_CTR_STAGES, restore)
+            self._patch(target._ghash, _GHASH_STAGES, restore)
+            self._patch_target(target.sm4, restore, seen)
+            return
+        self._patch(target, _BACKEND_STAGES, restore)
+        cache = getattr(target, '_rk_cache', None)
+        if cache is not None and id(cache) not in seen:
+            seen.add(id(cache))
+            restore.append((cache, '_expand', True, cache._expand))
+            cache._expand = self._wrap(cache._expand, 'key_expansion', _fixed(16))
+        inner = getattr(target, '_ttable', None)
+        if inner is not None:
+            self._patch_target(inner, restore, seen)
+
+    @contextmanager
+    def instrument(self, *targets):
+        """with块内为SM4GCM或分组实现对象的各阶段计时，退出时还原"""
+        restore = []
+        seen = set()
+        try:
+            for target in targets:
+                self._patch_target(target, restore, seen)
+            yield self
+        finally:
+            for obj, name, own, func in reversed(restore):
+                if own:
+                    setattr(obj, name, func)
+                else:
+                    delattr(obj, name)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {stage: {'ns': ns, 'bytes': nbytes, 'calls': calls}
+                    for stage, (ns, nbytes, calls) in sorted(self._stages.items())}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
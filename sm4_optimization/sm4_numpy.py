@@ -0,0 +1,207 @@
+import numpy as np
+from sm4_ttable import SM4TTable, T0, T1, T2, T3, TK0, TK1, TK2, TK3, FK, CK
+
+# 融合S盒与L的查找表（与sm4_ttable共用同一组数据）
+_T0 = np.array(T0, dtype=np.uint32)
+_T1 = np.array(T1, dtype=np.uint32)
+_T2 = np.array(T2, dtype=np.uint32)
+_T3 = np.array(T3, dtype=np.uint32)
+# 密钥扩展使用的S盒与L'融合表
+_TK0 = np.array(TK0, dtype=np.uint32)
+_TK1 = np.array(TK1, dtype=np.uint32)
+_TK2 = np.array(TK2, dtype=np.uint32)
+_TK3 = np.array(TK3, dtype=np.uint32)
+_FK = np.array(FK, dtype=np.uint32)
+
+# 每次最多处理的分组数，限制临时数组占用的内存（64Ki块 = 1MiB）
+CHUNK_BLOCKS = 1 << 16
+
+
+class SM4NumPy:
+    """NumPy向量化SM4引擎
+
+    N个分组按列存放为4个uint32数组，32轮中的每一轮都同时作用于全部N个分组，
+    轮函数通过对融合T表的向量化查表完成，解释器开销只与轮数有关而与分组数无关。
+    适合大数据量的ECB/CTR；单个分组交给T-table实现处理。
+    """
+
+    def __init__(self, cache_size=64):
+        self._ttable = SM4TTable(cache_size)
+        self._rk_cache = self._ttable._rk_cache
+
+    @staticmethod
+    def _rounds(x0, x1, x2, x3, round_keys):
+        t = np.empty_like(x0)
+        idx = np.empty_like(x0)
+        for i in range(32):
+            np.bitwise_xor(x1, x2, out=t)
+            np.bitwise_xor(t, x3, out=t)
+            np.bitwise_xor(t, round_keys[i], out=t)
+            np.right_shift(t, 24, out=idx)
+            x0 ^= _T0.take(idx)
+            np.right_shift(t, 16, out=idx)
+            idx &= 0xFF
+            x0 ^= _T1.take(idx)
+            np.right_shift(t, 8, out=idx)
+            idx &= 0xFF
+            x0 ^= _T2.take(idx)
+            t &= 0xFF
+            x0 ^= _T3.take(t)
+            x0, x1, x2, x3 = x1, x2, x3, x0
+        # 反序变换
+        return x3, x2, x1, x0
+
+    def _crypt_words(self, words, round_keys):
+        """words: (N, 4) uint32数组，返回(N, 4)大端uint32数组"""
+        cols = [np.ascontiguousarray(words[:, j], dtype=np.uint32) for j in range(4)]
+        y = self._rounds(*cols, round_keys)
+        out = np.empty((len(words), 4), dtype='>u4')
+        for j in range(4):
+            out[:, j] = y[j]
+        return out
+
+    def _crypt_blocks(self, data, round_keys, out):
+        src = np.frombuffer(data, dtype=np.uint8)
+        if len(src) % 16:
+            raise ValueError('data length must be a multiple of 16')
+        if out is None:
+            result = bytearray(len(src))
+        else:
+            result = out
+        dst = np.frombuffer(result, dtype=np.uint8)
+        if len(dst) < len(src):
+            raise ValueError('output buffer too small')
+        step = CHUNK_BLOCKS * 16
+        for pos in range(0, len(src), step):
+            words = src[pos:pos+step].view('>u4').reshape(-1, 4)
+            dst[pos:pos+len(words)*16] = self._crypt_words(words, round_keys).view(np.uint8).ravel()
+        return result
+
+    def encrypt_block(self, plaintext, key):
+        return self._ttable.encrypt_block(plaintext, key)
+
+    def decrypt_block(self, ciphertext, key):
+        return self._ttable.decrypt_block(ciphertext, key)
+
+    def encrypt_blocks(self, data, key, out=None):
+        """ECB批量加密，data长度需为16的倍数，out可传入可写缓冲区"""
+        return self._crypt_blocks(data, self._rk_cache.get(key)[0], out)
+
+    def decrypt_blocks(self, data, key, out=None):
+        """ECB批量解密"""
+        return self._crypt_blocks(data, self._rk_cache.get(key)[1], out)
+
+    @staticmethod
+    def expand_keys(keys):
+        """一次扩展多个密钥：keys为16*n字节的缓冲区或密钥列表，返回(n, 32) uint32轮密钥数组
+
+        32轮密钥扩展的每一轮同时作用于全部n个密钥；结果与SM4Optimized.expand_keys内存布局相同。
+        """
+        if isinstance(keys, (list, tuple)):
+            keys = b''.join(keys)
+        words = np.frombuffer(keys, dtype='>u4')
+        if len(words) % 4:
+            raise ValueError('keys length must be a multiple of 16')
+        words = words.reshape(-1, 4)
+        k = [(words[:, j] ^ _FK[j]).astype(np.uint32) for j in range(4)]
+        rks = np.empty((len(words), 32), dtype=np.uint32)
+        t = np.empty(len(words), dtype=np.uint32)
+        idx = np.empty_like(t)
+        for i in range(32):
+            np.bitwise_xor(k[1], k[2], out=t)
+            np.bitwise_xor(t, k[3], out=t)
+            np.bitwise_xor(t, CK[i], out=t)
+            np.right_shift(t, 24, out=idx)
+            k[0] ^= _TK0.take(idx)
+            np.right_shift(t, 16, out=idx)
+            idx &= 0xFF
+            k[0] ^= _TK1.take(idx)
+            np.right_shift(t, 8, out=idx)
+            idx &= 0xFF
+            k[0] ^= _TK2.take(idx)
+            t &= 0xFF
+            k[0] ^= _TK3.take(t)
+            rks[:, i] = k[0]
+            k = k[1:] + k[:1]
+        return rks
+
+    def _crypt_multikey(self, data, round_keys, out, decrypt):
+        src = np.frombuffer(data, dtype=np.uint8)
+        if len(src) % 16:
+            raise ValueError('data length must be a multiple of 16')
+        nblocks = len(src) // 16
+        rks = np.frombuffer(round_keys, dtype=np.uint32).reshape(-1, 32)
+        if len(rks) < nblocks:
+            raise ValueError('need one key schedule per block')
+        if decrypt:
+            rks = rks[:, ::-1]
+        if out is None:
+            out = bytearray(len(src))
+        dst = np.frombuffer(out, dtype=np.uint8)
+        if len(dst) < len(src):
+            raise ValueError('output buffer too small')
+        for pos in range(0, nblocks, CHUNK_BLOCKS):
+            n = min(CHUNK_BLOCKS, nblocks - pos)
+            words = src[pos*16:(pos+n)*16].view('>u4').reshape(-1, 4)
+            # 按轮转置，第i轮得到长度为n的轮密钥列，与分组逐一对应
+            round_columns = np.ascontiguousarray(rks[pos:pos+n].T)
+            dst[pos*16:(pos+n)*16] = self._crypt_words(words, round_columns).view(np.uint8).ravel()
+        return out
+
+    def encrypt_blocks_multikey(self, data, round_keys, out=None):
+        """第i个分组用第i组轮密钥加密，round_keys为expand_keys的结果"""
+        return self._crypt_multikey(data, round_keys, out, False)
+
+    def decrypt_blocks_multikey(self, data, round_keys, out=None):
+        """第i个分组用第i组轮密钥解密"""
+        return self._crypt_multikey(data, round_keys, out, True)
+
+    def _counter_words(self, counter, start, nblocks):
+        # 前96位不变，低32位按inc32递增并回绕
+        prefix = np.frombuffer(bytes(counter[:12]), dtype='>u4')
+        words = np.empty((nblocks, 4), dtype=np.uint32)
+        words[:, :3] = prefix
+        words[:, 3] = (np.arange(nblocks, dtype=np.uint64) + start) & 0xFFFFFFFF
+        return words
+
+    def ctr_keystream(self, counter, nblocks, key, out=None):
+        """从counter开始生成nblocks个密钥流块（计数器按GCM的inc32递增）
+
+        counter为bytearray时会被原地更新为下一个未使用的计数器值。
+        """
+        assert len(counter) == 16
+        round_keys = self._rk_cache.get(key)[0]
+        start = int.from_bytes(counter[12:], 'big')
+        if out is None:
+            out = bytearray(16 * nblocks)
+        dst = np.frombuffer(out, dtype=np.uint8)
+        if len(dst) < 16 * nblocks:
+            raise ValueError('output buffer too small')
+        for pos in range(0, nblocks, CHUNK_BLOCKS):
+            n = min(CHUNK_BLOCKS, nblocks - pos)
+            words = self._counter_words(counter, start + pos, n)
+            dst[pos*16:(pos+n)*16] = self._crypt_words(words, round_keys).view(np.uint8).ravel()
+        if isinstance(counter, bytearray):
+            counter[12:] = ((start + nblocks) & 0xFFFFFFFF).to_bytes(4, 'big')
+        return out
+
+    def ctr_xor(self, counter, data, key, out=None):
+        """CTR模式加解密任意长度数据：out = data ^ 密钥流
+
+        counter为bytearray时会被原地更新为下一个未使用的计数器值。
+        """
+        if not isinstance(counter, bytearray):
+            counter = bytearray(counter)
+        src = np.frombuffer(data, dtype=np.uint8)
+        n = len(src)
+        if out is None:
+            out = bytearray(n)
+        dst = np.frombuffer(out, dtype=np.uint8)
+        if len(dst) < n:
+            raise ValueError('output buffer too small')
+        step = CHUNK_BLOCKS * 16
+        for pos in range(0, n, step):
+            chunk = src[pos:pos+step]
+            keystream = np.frombuffer(self.ctr_keystream(counter, (len(chunk) + 15) // 16, key), dtype=np.uint8)
+            np.bitwise_xor(chunk, keystream[:len(chunk)], out=dst[pos:pos+len(chunk)])
+        return out
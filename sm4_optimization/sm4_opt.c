@@ -1,5 +1,6 @@
 #include <stdint.h>
 #include <string.h>
+#include <stddef.h>
 
 // S盒
 static const uint8_t S_BOX[256] = {
@@ -100,4 +101,344 @@ void sm4_decrypt_block(const uint8_t in[16], uint8_t out[16], const uint32_t rk[
         out[4*i+2] = (y >> 8) & 0xFF;
         out[4*i+3] = y & 0xFF;
     }
-} 
\ No newline at end of file
+} 
+// ===== 多块批量接口：一次调用处理nblocks个分组，减少ctypes往返开销 =====
+
+void sm4_encrypt_blocks(const uint8_t *in, uint8_t *out, size_t nblocks, const uint32_t rk[32]) {
+    for (size_t i = 0; i < nblocks; ++i) {
+        sm4_encrypt_block(in + 16*i, out + 16*i, rk);
+    }
+}
+
+void sm4_decrypt_blocks(const uint8_t *in, uint8_t *out, size_t nblocks, const uint32_t rk[32]) {
+    for (size_t i = 0; i < nblocks; ++i) {
+        sm4_decrypt_block(in + 16*i, out + 16*i, rk);
+    }
+}
+
+// ===== 多密钥批量接口：nkeys个16字节密钥依次存放，轮密钥连续存放为nkeys*32个字 =====
+void sm4_key_expansion_batch(const uint8_t *keys, uint32_t *rks, size_t nkeys) {
+    for (size_t i = 0; i < nkeys; ++i) {
+        sm4_key_expansion(keys + 16*i, rks + 32*i);
+    }
+}
+
+// 第i个分组使用第i组轮密钥加密
+void sm4_encrypt_blocks_multikey(const uint8_t *in, uint8_t *out, size_t nblocks, const uint32_t *rks) {
+    for (size_t i = 0; i < nblocks; ++i) {
+        sm4_encrypt_block(in + 16*i, out + 16*i, rks + 32*i);
+    }
+}
+
+void sm4_decrypt_blocks_multikey(const uint8_t *in, uint8_t *out, size_t nblocks, const uint32_t *rks) {
+    for (size_t i = 0; i < nblocks; ++i) {
+        sm4_decrypt_block(in + 16*i, out + 16*i, rks + 32*i);
+    }
+}
+
+// 计数器低32位加1（GCM的inc32）
+static void ctr_inc32(uint8_t ctr[16]) {
+    for (int i = 15; i >= 12; --i) {
+        if (++ctr[i] != 0) {
+            break;
+        }
+    }
+}
+
+// 生成nblocks个CTR密钥流块，ctr返回时指向下一个未使用的计数器
+void sm4_ctr_keystream(uint8_t ctr[16], uint8_t *out, size_t nblocks, const uint32_t rk[32]) {
+    for (size_t i = 0; i < nblocks; ++i) {
+        sm4_encrypt_block(ctr, out + 16*i, rk);
+        ctr_inc32(ctr);
+    }
+}
+
+// CTR加解密：out = in ^ 密钥流，len可以不是16的倍数（in与out可以相同）
+void sm4_ctr_xor(uint8_t ctr[16], const uint8_t *in, uint8_t *out, size_t len, const uint32_t rk[32]) {
+    uint8_t ks[16];
+    while (len > 0) {
+        size_t n = len < 16 ? len : 16;
+        sm4_encrypt_block(ctr, ks, rk);
+        ctr_inc32(ctr);
+        for (size_t j = 0; j < n; ++j) {
+            out[j] = in[j] ^ ks[j];
+        }
+        in += n;
+        out += n;
+        len -= n;
+    }
+}
+
+// ===== GHASH（Shoup 4位查表法）=====
+// table[0..15]为H·i的低64位，table[16..31]为高64位（i为4位值，按GCM位序）
+
+static const uint64_t GHASH_LAST4[16] = {
+    0x0000, 0x1c20, 0x3840, 0x2460, 0x7080, 0x6ca0, 0x48c0, 0x54e0,
+    0xe100, 0xfd20, 0xd940, 0xc560, 0x9180, 0x8da0, 0xa9c0, 0xb5e0
+};
+
+static uint64_t load64_be(const uint8_t *p) {
+    return ((uint64_t)p[0] << 56) | ((uint64_t)p[1] << 48) | ((uint64_t)p[2] << 40) | ((uint64_t)p[3] << 32) |
+           ((uint64_t)p[4] << 24) | ((uint64_t)p[5] << 16) | ((uint64_t)p[6] << 8) | (uint64_t)p[7];
+}
+
+static void store64_be(uint8_t *p, uint64_t v) {
+    for (int i = 7; i >= 0; --i) {
+        p[i] = v & 0xFF;
+        v >>= 8;
+    }
+}
+
+void sm4_ghash_init(const uint8_t h[16], uint64_t table[32]) {
+    uint64_t *hl = table, *hh = table + 16;
+    uint64_t vh = load64_be(h), vl = load64_be(h + 8);
+    hl[8] = vl;
+    hh[8] = vh;
+    hl[0] = 0;
+    hh[0] = 0;
+    for (int i = 4; i > 0; i >>= 1) {
+        uint64_t t = (vl & 1) * 0xe1000000U;
+        vl = (vh << 63) | (vl >> 1);
+        vh = (vh >> 1) ^ (t << 32);
+        hl[i] = vl;
+        hh[i] = vh;
+    }
+    for (int i = 2; i <= 8; i *= 2) {
+        vh = hh[i];
+        vl = hl[i];
+        for (int j = 1; j < i; ++j) {
+            hh[i+j] = vh ^ hh[j];
+            hl[i+j] = vl ^ hl[j];
+        }
+    }
+}
+
+// x = x·H
+static void ghash_mult(const uint64_t table[32], uint8_t x[16]) {
+    const uint64_t *hl = table, *hh = table + 16;
+    uint8_t lo = x[15] & 0xf, hi, rem;
+    uint64_t zh = hh[lo], zl = hl[lo];
+    for (int i = 15; i >= 0; --i) {
+        lo = x[i] & 0xf;
+        hi = (x[i] >> 4) & 0xf;
+        if (i != 15) {
+            rem = (uint8_t)(zl & 0xf);
+            zl = (zh << 60) | (zl >> 4);
+            zh = (zh >> 4) ^ (GHASH_LAST4[rem] << 48) ^ hh[lo];
+            zl ^= hl[lo];
+        }
+        rem = (uint8_t)(zl & 0xf);
+        zl = (zh << 60) | (zl >> 4);
+        zh = (zh >> 4) ^ (GHASH_LAST4[rem] << 48) ^ hh[hi];
+        zl ^= hl[hi];
+    }
+    store64_be(x, zh);
+    store64_be(x + 8, zl);
+}
+
+// 吸收len字节数据，不足16字节的尾部补零
+void sm4_ghash_update(const uint64_t table[32], uint8_t y[16], const uint8_t *data, size_t len) {
+    while (len > 0) {
+        size_t n = len < 16 ? len : 16;
+        for (size_t j = 0; j < n; ++j) {
+            y[j] ^= data[j];
+        }
+        ghash_mult(table, y);
+        data += n;
+        len -= n;
+    }
+}
+
+// CTR加解密的同时把密文吸收进GHASH状态y（逐块交替进行，数据只读一遍）
+// encrypt非0时GHASH作用于输出（密文），否则作用于输入；支持in与out相同
+static void gcm_ctr_ghash_blocks(const uint32_t rk[32], const uint64_t table[32], uint8_t ctr[16],
+                                 const uint8_t *in, uint8_t *out, size_t len, int encrypt, uint8_t y[16]) {
+    uint8_t ks[16];
+    while (len > 0) {
+        size_t n = len < 16 ? len : 16;
+        sm4_encrypt_block(ctr, ks, rk);
+        ctr_inc32(ctr);
+        for (size_t j = 0; j < n; ++j) {
+            uint8_t c = encrypt ? (uint8_t)(in[j] ^ ks[j]) : in[j];
+            out[j] = in[j] ^ ks[j];
+            y[j] ^= c;
+        }
+        ghash_mult(table, y);
+        in += n;
+        out += n;
+        len -= n;
+    }
+}
+
+// 对一段数据做CTR加解密，同时计算该段密文从零状态开始的GHASH（结果写入y）
+void sm4_gcm_ctr_ghash(const uint32_t rk[32], const uint64_t table[32], uint8_t ctr[16],
+                       const uint8_t *in, uint8_t *out, size_t len, int encrypt, uint8_t y[16]) {
+    memset(y, 0, 16);
+    gcm_ctr_ghash_blocks(rk, table, ctr, in, out, len, encrypt, y);
+}
+
+// ===== 完整SM4-GCM（NIST SP800-38D，与sm4_gcm.py的SM4GCM输出一致）=====
+// J0 = IV || 0x00000001，数据从inc32(J0)开始计数，tag = E_K(J0) ^ GHASH(AAD, C)
+
+static void gcm_start(const uint32_t rk[32], const uint64_t table[32], const uint8_t iv[12],
+                      const uint8_t *aad, size_t aadlen, uint8_t ctr[16], uint8_t ek0[16], uint8_t y[16]) {
+    memcpy(ctr, iv, 12);
+    ctr[12] = 0;
+    ctr[13] = 0;
+    ctr[14] = 0;
+    ctr[15] = 1;
+    sm4_encrypt_block(ctr, ek0, rk);
+    ctr_inc32(ctr);
+    memset(y, 0, 16);
+    sm4_ghash_update(table, y, aad, aadlen);
+}
+
+// 吸收长度块并用E_K(J0)掩盖GHASH，y返回时即为tag
+static void gcm_finish(const uint64_t table[32], uint8_t y[16], const uint8_t ek0[16], size_t aadlen, size_t len) {
+    uint8_t block[16];
+    store64_be(block, (uint64_t)aadlen * 8);
+    store64_be(block + 8, (uint64_t)len * 8);
+    sm4_ghash_update(table, y, block, 16);
+    for (int i = 0; i < 16; ++i) {
+        y[i] ^= ek0[i];
+    }
+}
+
+void sm4_gcm_encrypt(const uint32_t rk[32], const uint64_t table[32], const uint8_t iv[12],
+                     const uint8_t *aad, size_t aadlen, const uint8_t *in, uint8_t *out, size_t len,
+                     uint8_t tag[16]) {
+    uint8_t ctr[16], ek0[16], y[16];
+    gcm_start(rk, table, iv, aad, aadlen, ctr, ek0, y);
+    gcm_ctr_ghash_blocks(rk, table, ctr, in, out, len, 1, y);
+    gcm_finish(table, y, ek0, aadlen, len);
+    memcpy(tag, y, 16);
+}
+
+// 先认证后解密：tag不匹配时返回-1且不写out，匹配时解密并返回0
+int sm4_gcm_decrypt(const uint32_t rk[32], const uint64_t table[32], const uint8_t iv[12],
+                    const uint8_t *aad, size_t aadlen, const uint8_t *in, uint8_t *out, size_t len,
+                    const uint8_t tag[16]) {
+    uint8_t ctr[16], ek0[16], y[16];
+    uint8_t diff = 0;
+    gcm_start(rk, table, iv, aad, aadlen, ctr, ek0, y);
+    sm4_ghash_update(table, y, in, len);
+    gcm_finish(table, y, ek0, aadlen, len);
+    // 常量时间比较
+    for (int i = 0; i < 16; ++i) {
+        diff |= y[i] ^ tag[i];
+    }
+    if (diff != 0) {
+        return -1;
+    }
+    sm4_ctr_xor(ctr, in, out, len, rk);
+    return 0;
+}
+
+// 用预先生成的密钥流加密：keystream为从J0开始的CTR输出，前16字节是E_K(J0)，其后是数据密钥流
+// out = in ^ keystream[16:]，tag = keystream[0:16] ^ GHASH(aad, out)
+// 随后把整段密钥流（kslen字节，需不少于len + 16）清零，保证每段密钥流只被使用一次
+void sm4_gcm_seal_keystream(const uint64_t table[32], uint8_t *keystream, size_t kslen,
+                            const uint8_t *aad, size_t aadlen, const uint8_t *in, uint8_t *out, size_t len,
+                            uint8_t tag[16]) {
+    uint8_t ek0[16], y[16];
+    memcpy(ek0, keystream, 16);
+    for (size_t i = 0; i < len; ++i) {
+        out[i] = in[i] ^ keystream[16 + i];
+    }
+    memset(keystream, 0, kslen);
+    memset(y, 0, 16);
+    sm4_ghash_update(table, y, aad, aadlen);
+    sm4_ghash_update(table, y, out, len);
+    gcm_finish(table, y, ek0, aadlen, len);
+    memcpy(tag, y, 16);
+    memset(ek0, 0, 16);
+}
+
+// ===== SM4-XTS（IEEE 1619，按扇区处理，支持密文窃取）=====
+// rk1为数据密钥的加密轮密钥，rk2为tweak密钥的加密轮密钥
+
+// tweak乘以α（小端序GF(2^128)）
+static void xts_mul_alpha(uint8_t t[16]) {
+    uint8_t carry = 0;
+    for (int i = 0; i < 16; ++i) {
+        uint8_t next = t[i] >> 7;
+        t[i] = (uint8_t)((t[i] << 1) | carry);
+        carry = next;
+    }
+    if (carry) {
+        t[0] ^= 0x87;
+    }
+}
+
+static void xts_block(const uint32_t rk[32], const uint8_t t[16], const uint8_t *in, uint8_t *out, int encrypt) {
+    uint8_t buf[16];
+    for (int j = 0; j < 16; ++j) {
+        buf[j] = in[j] ^ t[j];
+    }
+    if (encrypt) {
+        sm4_encrypt_block(buf, buf, rk);
+    } else {
+        sm4_decrypt_block(buf, buf, rk);
+    }
+    for (int j = 0; j < 16; ++j) {
+        out[j] = buf[j] ^ t[j];
+    }
+}
+
+// 处理一个扇区（len >= 16），不是16的倍数时最后两个块使用密文窃取
+static void xts_sector(const uint32_t rk1[32], const uint32_t rk2[32], uint64_t sector,
+                       const uint8_t *in, uint8_t *out, size_t len, int encrypt) {
+    uint8_t t[16] = {0};
+    size_t full = len / 16, rem = len % 16;
+    for (int i = 0; i < 8; ++i) {
+        t[i] = (uint8_t)(sector >> (8 * i));
+    }
+    sm4_encrypt_block(t, t, rk2);
+    if (rem) {
+        full -= 1;
+    }
+    for (size_t i = 0; i < full; ++i) {
+        xts_block(rk1, t, in + 16*i, out + 16*i, encrypt);
+        xts_mul_alpha(t);
+    }
+    if (rem) {
+        const uint8_t *pin = in + 16*full;
+        uint8_t *pout = out + 16*full;
+        uint8_t head[16], tail[16];
+        if (encrypt) {
+            xts_block(rk1, t, pin, head, 1);
+            xts_mul_alpha(t);
+            memcpy(tail, pin + 16, rem);
+            memcpy(tail + rem, head + rem, 16 - rem);
+            memcpy(pout + 16, head, rem);
+            xts_block(rk1, t, tail, pout, 1);
+        } else {
+            uint8_t t_next[16];
+            memcpy(t_next, t, 16);
+            xts_mul_alpha(t_next);
+            xts_block(rk1, t_next, pin, head, 0);
+            memcpy(tail, pin + 16, rem);
+            memcpy(tail + rem, head + rem, 16 - rem);
+            memcpy(pout + 16, head, rem);
+            xts_block(rk1, t, tail, pout, 0);
+        }
+    }
+}
+
+// 从扇区号sector开始，按sector_size处理len字节（最后一个扇区可以更短，但不能少于16字节）
+// 参数不合法时返回-1，成功返回0；支持in与out相同
+int sm4_xts_crypt_sectors(const uint32_t rk1[32], const uint32_t rk2[32], uint64_t sector, size_t sector_size,
+                          const uint8_t *in, uint8_t *out, size_t len, int encrypt) {
+    if (sector_size < 16 || (len % sector_size != 0 && len % sector_size < 16)) {
+        return -1;
+    }
+    while (len > 0) {
+        size_t n = len < sector_size ? len : sector_size;
+        xts_sector(rk1, rk2, sector, in, out, n, encrypt);
+        in += n;
+        out += n;
+        len -= n;
+        sector += 1;
+    }
+    return 0;
+}
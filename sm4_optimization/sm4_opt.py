@@ -1,9 +1,64 @@
 import ctypes
 import os
 import sys
+from array import array
+from sm4_keycache import RoundKeyCache
+
+
+class _PyBuffer(ctypes.Structure):
+    """CPython的Py_buffer结构，用于取得只读缓冲区的地址"""
+    _fields_ = [('buf', ctypes.c_void_p), ('obj', ctypes.c_void_p), ('len', ctypes.c_ssize_t),
+                ('itemsize', ctypes.c_ssize_t), ('readonly', ctypes.c_int), ('ndim', ctypes.c_int),
+                ('format', ctypes.c_char_p), ('shape', ctypes.c_void_p), ('strides', ctypes.c_void_p),
+                ('suboffsets', ctypes.c_void_p), ('internal', ctypes.c_void_p)]
+
+
+def _readonly_address(mv):
+    """返回只读memoryview首字节的地址（不复制数据）"""
+    view = _PyBuffer()
+    ctypes.pythonapi.PyObject_GetBuffer(ctypes.py_object(mv), ctypes.byref(view), 0)
+    try:
+        return view.buf
+    finally:
+        ctypes.pythonapi.PyBuffer_Release(ctypes.byref(view))
+
+
+def _in_ptr(buf):
+    """返回可传给C的只读缓冲区指针和字节长度，任何缓冲区都不复制数据"""
+    if isinstance(buf, bytes):
+        return buf, len(buf)
+    mv = memoryview(buf)
+    if not mv.c_contiguous:
+        raise ValueError('buffer must be C-contiguous')
+    mv = mv.cast('B')
+    if not mv.readonly:
+        return (ctypes.c_char * mv.nbytes).from_buffer(mv), mv.nbytes
+    if not mv.nbytes:
+        return b'', 0
+    # 只读缓冲区（bytes的memoryview等）不能from_buffer，按地址直接映射，并保留mv保证底层对象存活
+    ptr = (ctypes.c_char * mv.nbytes).from_address(_readonly_address(mv))
+    ptr._source = mv
+    return ptr, mv.nbytes
+
+
+def _out_ptr(buf):
+    """返回可写缓冲区（bytearray、memoryview、numpy数组等）的指针和字节长度"""
+    mv = memoryview(buf)
+    if mv.readonly or not mv.c_contiguous:
+        raise ValueError('output buffer must be writable and C-contiguous')
+    mv = mv.cast('B')
+    return (ctypes.c_char * mv.nbytes).from_buffer(mv), mv.nbytes
+
+
+def _address(ptr):
+    """_in_ptr/_out_ptr返回对象的内存地址，用于按偏移访问缓冲区的一部分"""
+    if isinstance(ptr, bytes):
+        return ctypes.cast(ctypes.c_char_p(ptr), ctypes.c_void_p).value
+    return ctypes.addressof(ptr)
+
 
 class SM4Optimized:
-    def __init__(self, lib_path=None):
+    def __init__(self, lib_path=None, cache_size=64):
         if lib_path is None:
             # 默认动态库名
             if sys.platform.startswith('darwin'):
@@ -17,19 +72,272 @@ class SM4Optimized:
         self.lib.sm4_key_expansion.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint32)]
         self.lib.sm4_encrypt_block.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint32)]
         self.lib.sm4_decrypt_block.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint32)]
+        blocks_argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_uint32)]
+        self.lib.sm4_encrypt_blocks.argtypes = blocks_argtypes
+        self.lib.sm4_decrypt_blocks.argtypes = blocks_argtypes
+        self.lib.sm4_ctr_keystream.argtypes = blocks_argtypes
+        self.lib.sm4_key_expansion_batch.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+        multikey_argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+        self.lib.sm4_encrypt_blocks_multikey.argtypes = multikey_argtypes
+        self.lib.sm4_decrypt_blocks_multikey.argtypes = multikey_argtypes
+        self.lib.sm4_ctr_xor.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t,
+                                         ctypes.POINTER(ctypes.c_uint32)]
+        self.lib.sm4_ghash_init.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint64)]
+        self.lib.sm4_ghash_update.argtypes = [ctypes.POINTER(ctypes.c_uint64), ctypes.c_void_p, ctypes.c_void_p,
+                                              ctypes.c_size_t]
+        self.lib.sm4_gcm_ctr_ghash.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint64),
+                                               ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t,
+                                               ctypes.c_int, ctypes.c_void_p]
+        gcm_argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint64), ctypes.c_char_p,
+                        ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t,
+                        ctypes.c_char_p]
+        self.lib.sm4_gcm_encrypt.argtypes = gcm_argtypes
+        self.lib.sm4_gcm_decrypt.argtypes = gcm_argtypes
+        self.lib.sm4_gcm_decrypt.restype = ctypes.c_int
+        self.lib.sm4_gcm_seal_keystream.argtypes = [ctypes.POINTER(ctypes.c_uint64), ctypes.c_void_p, ctypes.c_size_t,
+                                                    ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p,
+                                                    ctypes.c_void_p, ctypes.c_size_t, ctypes.c_char_p]
+        self.lib.sm4_xts_crypt_sectors.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32),
+                                                   ctypes.c_uint64, ctypes.c_size_t, ctypes.c_void_p,
+                                                   ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+        self.lib.sm4_xts_crypt_sectors.restype = ctypes.c_int
+        # 轮密钥缓存：加密轮密钥和逆序的解密轮密钥都以ctypes数组保存
+        self._rk_cache = RoundKeyCache(self._expand_round_keys, cache_size)
+        # GCM的GHASH乘法表同样按密钥缓存
+        self._gcm_cache = RoundKeyCache(self._gcm_table, cache_size)
 
-    def encrypt_block_optimized(self, plaintext: bytes, key: bytes) -> bytes:
-        assert len(plaintext) == 16 and len(key) == 16
+    def _expand_round_keys(self, key: bytes):
         rk = (ctypes.c_uint32 * 32)()
         self.lib.sm4_key_expansion(ctypes.c_char_p(key), rk)
+        rk_rev = (ctypes.c_uint32 * 32)(*rk[::-1])
+        return rk, rk_rev
+
+    def encrypt_block_optimized(self, plaintext: bytes, key: bytes) -> bytes:
+        assert len(plaintext) == 16 and len(key) == 16
+        rk = self._rk_cache.get(key)[0]
         outbuf = ctypes.create_string_buffer(16)
         self.lib.sm4_encrypt_block(ctypes.c_char_p(plaintext), outbuf, rk)
         return outbuf.raw
 
     def decrypt_block_optimized(self, ciphertext: bytes, key: bytes) -> bytes:
         assert len(ciphertext) == 16 and len(key) == 16
-        rk = (ctypes.c_uint32 * 32)()
-        self.lib.sm4_key_expansion(ctypes.c_char_p(key), rk)
+        # SM4解密即使用逆序轮密钥的加密
+        rk_rev = self._rk_cache.get(key)[1]
         outbuf = ctypes.create_string_buffer(16)
-        self.lib.sm4_decrypt_block(ctypes.c_char_p(ciphertext), outbuf, rk)
-        return outbuf.raw
\ No newline at end of file
+        self.lib.sm4_encrypt_block(ctypes.c_char_p(ciphertext), outbuf, rk_rev)
+        return outbuf.raw
+
+    # 与其他实现一致的单块接口名
+    encrypt_block = encrypt_block_optimized
+    decrypt_block = decrypt_block_optimized
+
+    def _crypt_blocks(self, func, data, rk, out):
+        src, n = _in_ptr(data)
+        if n % 16:
+            raise ValueError('data length must be a multiple of 16')
+        if out is None:
+            out = bytearray(n)
+        dst, m = _out_ptr(out)
+        if m < n:
+            raise ValueError('output buffer too small')
+        if n:
+            func(src, dst, n // 16, rk)
+        return out
+
+    def encrypt_blocks(self, data, key: bytes, out=None):
+        """ECB批量加密：一次C调用处理全部分组，out可传入任意可写缓冲区（可与data相同实现原地加密）"""
+        return self._crypt_blocks(self.lib.sm4_encrypt_blocks, data, self._rk_cache.get(key)[0], out)
+
+    def decrypt_blocks(self, data, key: bytes, out=None):
+        """ECB批量解密"""
+        return self._crypt_blocks(self.lib.sm4_decrypt_blocks, data, self._rk_cache.get(key)[0], out)
+
+    def expand_keys(self, keys, out=None):
+        """一次扩展多个密钥：keys为16*n字节的缓冲区或密钥列表
+
+        返回n*32个uint32的连续数组（array('I')，第i个密钥的轮密钥位于[32*i, 32*i+32)），
+        内存布局与SM4NumPy.expand_keys返回的(n, 32)数组相同，两者可以互换使用。
+        """
+        if isinstance(keys, (list, tuple)):
+            keys = b''.join(keys)
+        src, n = _in_ptr(keys)
+        if n % 16:
+            raise ValueError('keys length must be a multiple of 16')
+        if out is None:
+            out = array('I', bytes(8 * n))
+        dst, m = _out_ptr(out)
+        if m < 8 * n:
+            raise ValueError('output buffer too small')
+        if n:
+            self.lib.sm4_key_expansion_batch(src, dst, n // 16)
+        return out
+
+    def _crypt_multikey(self, func, data, round_keys, out):
+        src, n = _in_ptr(data)
+        if n % 16:
+            raise ValueError('data length must be a multiple of 16')
+        rks, r = _in_ptr(round_keys)
+        if r < 8 * n:
+            raise ValueError('need one key schedule per block')
+        if out is None:
+            out = bytearray(n)
+        dst, m = _out_ptr(out)
+        if m < n:
+            raise ValueError('output buffer too small')
+        if n:
+            func(src, dst, n // 16, rks)
+        return out
+
+    def encrypt_blocks_multikey(self, data, round_keys, out=None):
+        """第i个分组用第i组轮密钥加密，round_keys为expand_keys的结果"""
+        return self._crypt_multikey(self.lib.sm4_encrypt_blocks_multikey, data, round_keys, out)
+
+    def decrypt_blocks_multikey(self, data, round_keys, out=None):
+        """第i个分组用第i组轮密钥解密"""
+        return self._crypt_multikey(self.lib.sm4_decrypt_blocks_multikey, data, round_keys, out)
+
+    def ctr_keystream(self, counter, nblocks: int, key: bytes, out=None):
+        """从counter开始生成nblocks个密钥流块（计数器按GCM的inc32递增）
+
+        counter为bytearray时会被原地更新为下一个未使用的计数器值。
+        """
+        if not isinstance(counter, bytearray):
+            counter = bytearray(counter)
+        assert len(counter) == 16
+        ctr = _out_ptr(counter)[0]
+        if out is None:
+            out = bytearray(16 * nblocks)
+        dst, m = _out_ptr(out)
+        if m < 16 * nblocks:
+            raise ValueError('output buffer too small')
+        if nblocks:
+            self.lib.sm4_ctr_keystream(ctr, dst, nblocks, self._rk_cache.get(key)[0])
+        return out
+
+    def ctr_xor(self, counter, data, key: bytes, out=None, offset=0, length=None):
+        """CTR模式加解密任意长度数据：out = data ^ 密钥流
+
+        counter为bytearray时会被原地更新为下一个未使用的计数器值。
+        给出offset/length时只处理data[offset:offset+length]并写入out的相同位置（不复制数据）。
+        """
+        if not isinstance(counter, bytearray):
+            counter = bytearray(counter)
+        assert len(counter) == 16
+        ctr = _out_ptr(counter)[0]
+        src, n = _in_ptr(data)
+        if length is None:
+            length = n - offset
+        if out is None:
+            out = bytearray(n)
+        dst, m = _out_ptr(out)
+        if offset + length > min(n, m):
+            raise ValueError('output buffer too small')
+        if length:
+            self.lib.sm4_ctr_xor(ctr, _address(src) + offset, _address(dst) + offset, length,
+                                 self._rk_cache.get(key)[0])
+        return out
+
+    def ghash_table(self, h: bytes):
+        """为H生成C端GHASH使用的4位乘法表（可在多次调用间复用）"""
+        assert len(h) == 16
+        table = (ctypes.c_uint64 * 32)()
+        self.lib.sm4_ghash_init(h, table)
+        return table
+
+    def ghash_update(self, table, y: bytearray, data, offset=0, length=None):
+        """从状态y（16字节bytearray，原地更新）吸收data[offset:offset+length]，不足16字节的尾部补零"""
+        src, n = _in_ptr(data)
+        if length is None:
+            length = n - offset
+        if offset + length > n:
+            raise ValueError('buffer too small')
+        if length:
+            self.lib.sm4_ghash_update(table, _out_ptr(y)[0], _address(src) + offset, length)
+        return y
+
+    def gcm_ctr_ghash(self, key: bytes, table, counter, data, out, encrypt: bool, offset=0, length=None):
+        """对data[offset:offset+length]做CTR加解密写入out的相同位置，并返回该段密文的GHASH（从零开始）
+
+        按偏移直接访问data和out，不复制数据；一次C调用期间释放GIL，可在多个线程中并行处理不同段。
+        """
+        if not isinstance(counter, bytearray):
+            counter = bytearray(counter)
+        assert len(counter) == 16
+        src, n = _in_ptr(data)
+        dst, m = _out_ptr(out)
+        if length is None:
+            length = n - offset
+        if offset + length > min(n, m):
+            raise ValueError('buffer too small')
+        y = bytearray(16)
+        self.lib.sm4_gcm_ctr_ghash(self._rk_cache.get(key)[0], table, _out_ptr(counter)[0],
+                                   _address(src) + offset, _address(dst) + offset, length,
+                                   1 if encrypt else 0, _out_ptr(y)[0])
+        return bytes(y)
+
+    def _gcm_table(self, key: bytes):
+        return self.ghash_table(self.encrypt_block_optimized(b'\x00' * 16, key))
+
+    def _gcm_args(self, key: bytes, iv: bytes, data, aad, out):
+        assert len(key) == 16 and len(iv) == 12
+        src, n = _in_ptr(data)
+        aad_ptr, aad_len = _in_ptr(aad)
+        if out is None:
+            out = bytearray(n)
+        dst, m = _out_ptr(out)
+        if m < n:
+            raise ValueError('output buffer too small')
+        return out, (self._rk_cache.get(key)[0], self._gcm_cache.get(key), iv, aad_ptr, aad_len, src, dst, n)
+
+    def gcm_encrypt(self, key: bytes, iv: bytes, data, aad=b'', out=None):
+        """完整SM4-GCM加密（一次C调用，期间释放GIL），返回(out, tag)，结果与SM4GCM一致"""
+        out, args = self._gcm_args(key, iv, data, aad, out)
+        tag = ctypes.create_string_buffer(16)
+        self.lib.sm4_gcm_encrypt(*args, tag)
+        return out, tag.raw
+
+    def gcm_decrypt(self, key: bytes, iv: bytes, data, tag: bytes, aad=b'', out=None):
+        """完整SM4-GCM解密：C端先常量时间校验tag再解密，tag不匹配时抛出ValueError且不写out"""
+        assert len(tag) == 16
+        out, args = self._gcm_args(key, iv, data, aad, out)
+        if self.lib.sm4_gcm_decrypt(*args, bytes(tag)) != 0:
+            raise ValueError('Tag mismatch!')
+        return out
+
+    def gcm_seal_keystream(self, table, keystream, data, aad=b'', out=None):
+        """用预先生成的密钥流完成GCM加密（异或+GHASH一次C调用），返回(out, tag)
+
+        keystream须为可写缓冲区，内容为从J0开始的CTR输出（前16字节为E_K(J0)，用于掩盖tag），
+        长度不小于len(data) + 16，调用后整段被清零。
+        """
+        src, n = _in_ptr(data)
+        ks, k = _out_ptr(keystream)
+        if k < n + 16:
+            raise ValueError('keystream too short')
+        aad_ptr, aad_len = _in_ptr(aad)
+        if out is None:
+            out = bytearray(n)
+        dst, m = _out_ptr(out)
+        if m < n:
+            raise ValueError('output buffer too small')
+        tag = ctypes.create_string_buffer(16)
+        self.lib.sm4_gcm_seal_keystream(table, ks, k, aad_ptr, aad_len, src, dst, n, tag)
+        return out, tag.raw
+
+    def xts_crypt(self, key1: bytes, key2: bytes, sector: int, sector_size: int, data, out, encrypt: bool,
+                  offset=0, length=None):
+        """SM4-XTS处理data[offset:offset+length]并写入out的相同位置，第一个扇区号为sector
+
+        一次C调用处理全部扇区（期间释放GIL），最后一个扇区不足sector_size时使用密文窃取。
+        """
+        src, n = _in_ptr(data)
+        dst, m = _out_ptr(out)
+        if length is None:
+            length = n - offset
+        if offset + length > min(n, m):
+            raise ValueError('buffer too small')
+        if length and self.lib.sm4_xts_crypt_sectors(self._rk_cache.get(key1)[0], self._rk_cache.get(key2)[0],
+                                                     sector, sector_size, _address(src) + offset,
+                                                     _address(dst) + offset, length, 1 if encrypt else 0) != 0:
+            raise ValueError('each sector must be at least 16 bytes')
+        return out
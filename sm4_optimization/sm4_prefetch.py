@@ -0,0 +1,165 @@
+"""
+SM4-GCM密钥流预取池
+
+CTR密钥流只与密钥和nonce有关，与明文无关。预取池在后台线程中提前为一批nonce生成密钥流，
+存放在固定大小的环形缓冲区里；加密短消息时只需取出一段现成的密钥流做异或，再计算GHASH。
+
+    gcm = SM4GCM(key, mode='auto')
+    with KeystreamPool(gcm, max_message_size=256, depth=64) as pool:
+        nonce, ciphertext, tag = pool.encrypt(message, aad)
+
+- 每个槽位保存从J0开始的CTR输出：16字节的E_K(J0)（用于掩盖tag）加上数据密钥流
+- 内存固定为 depth × (16 + max_message_size向上取整到16字节)，不随消息数增长
+- 每段密钥流只使用一次，用后立即清零再交还给后台线程；close()时清零整个缓冲区
+- nonce由nonce分配器给出（默认NonceCounter：随机前缀+64位计数器），调用方须保证同一密钥下不重复
+- 超过max_message_size的消息、或预取的密钥流暂时用完时，直接调用gcm.encrypt（同样使用分配器的nonce）
+"""
+
+import os
+import queue
+import threading
+
+
+class NonceCounter:
+    """线程安全的nonce分配器：4字节前缀 || 8字节大端计数器"""
+
+    def __init__(self, prefix: bytes = None, start: int = 0):
+        self.prefix = prefix if prefix is not None else os.urandom(4)
+        assert len(self.prefix) == 4
+        self._next = start
+        self._lock = threading.Lock()
+
+    def __call__(self) -> bytes:
+        with self._lock:
+            n = self._next
+            if n >> 64:
+                raise OverflowError('nonce space exhausted')
+            self._next += 1
+        return self.prefix + n.to_bytes(8, 'big')
+
+
+class KeystreamPool:
+    def __init__(self, gcm, nonce_allocator=None, max_message_size=256, depth=64):
+        assert max_message_size > 0 and depth > 0
+        self.gcm = gcm
+        self.allocate_nonce = nonce_allocator or NonceCounter()
+        self.max_message_size = max_message_size
+        self.slot_size = 16 + (max_message_size + 15) // 16 * 16
+        self._ring = bytearray(self.slot_size * depth)
+        self._view = memoryview(self._ring)
+        self._zeros = bytes(self.slot_size)
+        self._nonce_lock = threading.Lock()
+        # 有C库时异或、GHASH和清零在一次C调用中完成，否则用Python整数异或和SM4GCM自带的查表GHASH
+        self._table = gcm.sm4.ghash_table(gcm.h) if hasattr(gcm.sm4, 'gcm_seal_keystream') else None
+        # 空闲槽位与已填充槽位；两者合计恰好depth个，内存上限由此确定。
+        # 空闲槽位攒够refill_batch个才唤醒后台线程，减少它与加密调用争抢GIL的次数
+        self.refill_batch = max(1, depth // 4)
+        self._free = list(range(depth))
+        self._free_cond = threading.Condition()
+        self._ready = queue.Queue()
+        # hits/misses由加密调用方（可能多个线程）更新；后台线程每填好一个槽位通知_ready_cond
+        self._lock = threading.Lock()
+        self._ready_cond = threading.Condition(self._lock)
+        self.hits = 0
+        self.misses = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _nonce(self) -> bytes:
+        with self._nonce_lock:
+            return self.allocate_nonce()
+
+    def _slot(self, i: int):
+        return self._view[i * self.slot_size:(i + 1) * self.slot_size]
+
+    def _fill(self):
+        while True:
+            with self._free_cond:
+                while not self._closed and len(self._free) < self.refill_batch:
+                    self._free_cond.wait()
+                if self._closed:
+                    return
+                slots, self._free = self._free, []
+            for i in slots:
+                # 每个槽位前检查是否已关闭，close()最多等待一个槽位填完；未填的槽位保持为零
+                if self._closed:
+                    return
+                nonce = self._nonce()
+                # 从J0开始：第一块E_K(J0)掩盖tag，数据与SM4GCM.encrypt相同从inc32(J0)开始
+                self.gcm._ctr_into(bytearray(self.gcm._j0(nonce)), self._zeros, self._slot(i))
+                self._ready.put((i, nonce))
+                with self._ready_cond:
+                    self._ready_cond.notify_all()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """等待至少一个槽位填好密钥流；返回是否有可用槽位（超时或已关闭时为False）"""
+        with self._ready_cond:
+            self._ready_cond.wait_for(lambda: self._closed or not self._ready.empty(), timeout)
+            return not self._closed and not self._ready.empty()
+
+    def _release(self, i: int):
+        with self._free_cond:
+            self._free.append(i)
+            if len(self._free) >= self.refill_batch:
+                self._free_cond.notify()
+
+    def _wipe(self, i: int):
+        self._slot(i)[:] = self._zeros
+
+    def encrypt(self, plaintext: bytes, aad: bytes = b''):
+        """加密一条消息，返回(nonce, ciphertext, tag)；结果可用gcm.decrypt(ciphertext, nonce, tag, aad)解密"""
+        if self._closed:
+            raise ValueError('pool is closed')
+        n = len(plaintext)
+        entry = None
+        if n <= self.max_message_size:
+            try:
+                entry = self._ready.get_nowait()
+            except queue.Empty:
+                pass
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            nonce = self._nonce()
+            ciphertext, tag = self.gcm.encrypt(plaintext, nonce, aad)
+            return nonce, ciphertext, tag
+        with self._lock:
+            self.hits += 1
+        i, nonce = entry
+        slot = self._slot(i)
+        try:
+            if self._table is not None:
+                ciphertext, tag = self.gcm.sm4.gcm_seal_keystream(self._table, slot, plaintext, aad)
+                ciphertext = bytes(ciphertext)
+            else:
+                mask = int.from_bytes(slot[:16], 'big')
+                ciphertext = (int.from_bytes(plaintext, 'big') ^
+                              int.from_bytes(slot[16:16 + n], 'big')).to_bytes(n, 'big')
+                self._wipe(i)
+                tag = (mask ^ int.from_bytes(self.gcm._ghash.digest(aad, ciphertext), 'big')).to_bytes(16, 'big')
+        except BaseException:
+            self._wipe(i)
+            raise
+        finally:
+            # 最后才交还槽位：唤醒的后台线程不会在本次加密过程中抢占GIL
+            self._release(i)
+        return nonce, ciphertext, tag
+
+    def close(self):
+        """停止后台线程并清零全部缓冲区；未使用的预取nonce被丢弃"""
+        if self._closed:
+            return
+        with self._free_cond:
+            self._closed = True
+            self._free_cond.notify()
+        with self._ready_cond:
+            self._ready_cond.notify_all()
+        self._thread.join()
+        self._ring[:] = bytes(len(self._ring))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
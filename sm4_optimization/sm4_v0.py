@@ -1,5 +1,8 @@
+from sm4_keycache import RoundKeyCache
+
+
 class SM4:
-    def __init__(self):
+    def __init__(self, cache_size=64):
         # S盒
         self.S_BOX = [
             0xD6, 0x90, 0xE9, 0xFE, 0xCC, 0xE1, 0x3D, 0xB7, 0x16, 0xB6, 0x14, 0xC2, 0x28, 0xFB, 0x2C, 0x05,
@@ -34,6 +37,9 @@ class SM4:
             0xA0A7AEB5, 0xBCC3CAD1, 0xD8DFE6ED, 0xF4FB0209,
             0x10171E25, 0x2C333A41, 0x484F565D, 0x646B7279
         ]
+        
+        # 轮密钥缓存（按密钥LRU，同时保存加密和逆序的解密轮密钥）
+        self._rk_cache = RoundKeyCache(self._expand_round_keys, cache_size)
     
     def _s_box_transform(self, word):
         """S盒变换"""
@@ -80,17 +86,19 @@ class SM4:
         
         return k[4:36]
     
-    def encrypt_block(self, plaintext, key):
-        """加密单个128位块"""
-        # 密钥扩展
+    def _expand_round_keys(self, key):
+        """生成加密轮密钥和逆序的解密轮密钥"""
         round_keys = self._key_expansion(key)
-        
-        # 将明文分成4个32位字
+        return round_keys, round_keys[::-1]
+    
+    def _crypt_block(self, block, round_keys):
+        """使用给定轮密钥处理单个128位块（加解密只有轮密钥顺序不同）"""
+        # 将输入分成4个32位字
         x = []
         for i in range(4):
-            x.append(int.from_bytes(plaintext[i*4:(i+1)*4], 'big'))
+            x.append(int.from_bytes(block[i*4:(i+1)*4], 'big'))
         
-        # 32轮加密
+        # 32轮迭代
         for i in range(32):
             temp = x[1] ^ x[2] ^ x[3] ^ round_keys[i]
             x[0], x[1], x[2], x[3] = x[1], x[2], x[3], x[0] ^ self._t_transform(temp)
@@ -105,27 +113,10 @@ class SM4:
         
         return result
     
+    def encrypt_block(self, plaintext, key):
+        """加密单个128位块"""
+        return self._crypt_block(plaintext, self._rk_cache.get(key)[0])
+    
     def decrypt_block(self, ciphertext, key):
-        """解密单个128位块"""
-        # 密钥扩展
-        round_keys = self._key_expansion(key)
-        
-        # 将密文分成4个32位字
-        x = []
-        for i in range(4):
-            x.append(int.from_bytes(ciphertext[i*4:(i+1)*4], 'big'))
-        
-        # 32轮解密（使用逆序的轮密钥）
-        for i in range(32):
-            temp = x[1] ^ x[2] ^ x[3] ^ round_keys[31-i]
-            x[0], x[1], x[2], x[3] = x[1], x[2], x[3], x[0] ^ self._t_transform(temp)
-        
-        # 反序变换
-        x[0], x[1], x[2], x[3] = x[3], x[2], x[1], x[0]
-        
-        # 转换为字节串
-        result = b''
-        for word in x:
-            result += word.to_bytes(4, 'big')
-        
-        return result
\ No newline at end of file
+        """解密单个128位块（使用逆序的轮密钥）"""
+        return self._crypt_block(ciphertext, self._rk_cache.get(key)[1])
@@ -0,0 +1,150 @@
+"""
+SM4-XTS磁盘/文件加密
+
+按IEEE 1619的XTS结构：32字节密钥拆成数据密钥K1和tweak密钥K2，
+扇区i的初始tweak为E_K2(i的16字节小端表示)，扇区内每个分组的tweak依次乘以α，
+扇区长度不是16的倍数时最后两个分组使用密文窃取，密文与明文等长。
+
+C动态库可用时一次调用处理一批扇区（释放GIL），不同扇区互不依赖，
+可以分给线程池并行；文件接口用mmap映射目标文件并原地加解密，不经过额外缓冲区。
+
+    xts = SM4XTS(key32, sector_size=4096)
+    xts.encrypt_file('disk.img', workers=4)
+"""
+
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import sm4
+
+# 每个线程任务处理的扇区数
+SECTORS_PER_TASK = 256
+
+
+def _mul_alpha(t: int) -> int:
+    # tweak以小端整数表示，乘以α即左移一位并按x^128 + x^7 + x^2 + x + 1约简
+    t <<= 1
+    if t >> 128:
+        t ^= (1 << 128) | 0x87
+    return t
+
+
+class SM4XTS:
+    def __init__(self, key: bytes, sector_size=4096, workers=None):
+        assert len(key) == 32
+        if sector_size < 16:
+            raise ValueError('sector_size must be at least 16')
+        self.key1, self.key2 = bytes(key[:16]), bytes(key[16:])
+        if self.key1 == self.key2:
+            raise ValueError('XTS data key and tweak key must differ')
+        self.sector_size = sector_size
+        self.workers = workers or os.cpu_count() or 1
+        # 有C动态库时走批量路径，否则逐块使用最快的单块实现
+        native = sm4.backend(sm4.NUMPY_MIN_BLOCKS)
+        self._native = native if hasattr(native, 'xts_crypt') else None
+        self._cipher = sm4.backend(1)
+
+    # ---- 纯Python路径 ----
+    def _xts_block(self, t: int, block, encrypt: bool) -> bytes:
+        tb = t.to_bytes(16, 'little')
+        x = bytes(a ^ b for a, b in zip(block, tb))
+        if encrypt:
+            x = self._cipher.encrypt_block(x, self.key1)
+        else:
+            x = self._cipher.decrypt_block(x, self.key1)
+        return bytes(a ^ b for a, b in zip(x, tb))
+
+    def _crypt_sector(self, sector: int, src, dst, encrypt: bool):
+        """处理一个扇区：src为只读视图，dst为等长的可写视图（可以与src重叠）"""
+        n = len(src)
+        t = int.from_bytes(self._cipher.encrypt_block(sector.to_bytes(16, 'little'), self.key2), 'little')
+        full, rem = divmod(n, 16)
+        if rem:
+            full -= 1
+        for i in range(full):
+            dst[16*i:16*i+16] = self._xts_block(t, src[16*i:16*i+16], encrypt)
+            t = _mul_alpha(t)
+        if rem:
+            pos = 16 * full
+            last = bytes(src[pos+16:])
+            if encrypt:
+                head = self._xts_block(t, src[pos:pos+16], True)
+                t_last = _mul_alpha(t)
+            else:
+                head = self._xts_block(_mul_alpha(t), src[pos:pos+16], False)
+                t_last = t
+            dst[pos+16:] = head[:rem]
+            dst[pos:pos+16] = self._xts_block(t_last, last + head[rem:], encrypt)
+
+    def _crypt_range(self, data, out, offset: int, length: int, sector: int, encrypt: bool):
+        if self._native is not None:
+            self._native.xts_crypt(self.key1, self.key2, sector, self.sector_size, data, out, encrypt,
+                                   offset, length)
+            return
+        with memoryview(data) as src, memoryview(out) as dst:
+            for pos in range(offset, offset + length, self.sector_size):
+                end = min(pos + self.sector_size, offset + length)
+                self._crypt_sector(sector, src[pos:end], dst[pos:end], encrypt)
+                sector += 1
+
+    # ---- 批量接口 ----
+    def _tasks(self, offset: int, length: int, sector: int):
+        step = SECTORS_PER_TASK * self.sector_size
+        for pos in range(0, length, step):
+            yield offset + pos, min(step, length - pos), sector + pos // self.sector_size
+
+    def _crypt(self, data, out, sector: int, encrypt: bool, offset=0, length=None, workers=None):
+        n = memoryview(data).nbytes
+        if length is None:
+            length = n - offset
+        rem = length % self.sector_size
+        if rem and rem < 16:
+            raise ValueError('each sector must be at least 16 bytes')
+        tasks = list(self._tasks(offset, length, sector))
+        workers = min(workers or self.workers, len(tasks))
+        if workers <= 1:
+            for task in tasks:
+                self._crypt_range(data, out, *task, encrypt)
+        else:
+            with ThreadPoolExecutor(workers) as executor:
+                futures = [executor.submit(self._crypt_range, data, out, *task, encrypt) for task in tasks]
+                for future in futures:
+                    future.result()
+        return out
+
+    def encrypt(self, data, sector=0, out=None, workers=None):
+        """加密连续扇区，第一个扇区号为sector；out可与data相同实现原地加密"""
+        if out is None:
+            out = bytearray(memoryview(data).nbytes)
+        return self._crypt(data, out, sector, True, workers=workers)
+
+    def decrypt(self, data, sector=0, out=None, workers=None):
+        """解密连续扇区"""
+        if out is None:
+            out = bytearray(memoryview(data).nbytes)
+        return self._crypt(data, out, sector, False, workers=workers)
+
+    # ---- 文件接口 ----
+    def _crypt_file(self, path, start, count, workers, encrypt):
+        with open(path, 'r+b') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = start * self.sector_size
+            end = size if count is None else min(size, offset + count * self.sector_size)
+            if end <= offset:
+                return 0
+            with mmap.mmap(f.fileno(), 0) as mm:
+                self._crypt(mm, mm, start, encrypt, offset, end - offset, workers)
+                mm.flush()
+        return end - offset
+
+    def encrypt_file(self, path, start=0, count=None, workers=None):
+        """原地加密文件中从第start个扇区起的count个扇区（默认到文件末尾），扇区号即文件内的扇区序号
+
+        返回处理的字节数。
+        """
+        return self._crypt_file(path, start, count, workers, True)
+
+    def decrypt_file(self, path, start=0, count=None, workers=None):
+        """原地解密文件中的扇区，参数同encrypt_file"""
+        return self._crypt_file(path, start, count, workers, False)
@@ -4,17 +4,36 @@ SM4算法完整性测试和演示
 包含标准测试向量验证、性能测试和功能演示
 """
 
+import ctypes
 import time
 import os
 from sm4_v0 import SM4
-from sm4_opt import SM4Optimized
-from gmssl import sm4 as gmssl_sm4
+from sm4_ttable import SM4TTable
+from sm4_opt import SM4Optimized, _in_ptr, _address
+from sm4_gcm import SM4GCM, GHash, ghash
+from sm4_xts import SM4XTS
+import io
+import asyncio
+import sm4_file
+import sm4_aio
+import json
+from sm4_metrics import StageMetrics
+from sm4_prefetch import KeystreamPool, NonceCounter
+try:
+    from gmssl import sm4 as gmssl_sm4
+except ImportError:
+    # gmssl仅用于与标准库对比，未安装时跳过对比
+    gmssl_sm4 = None
 
 def compare_with_standard_library():
     """与标准SM4库对比验证"""
     
     print("=== 与标准SM4库对比验证 ===")
     
+    if gmssl_sm4 is None:
+        print("✓ 标准库对比: 跳过 (未安装gmssl)")
+        return True
+    
     # 测试数据
     key = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
     plaintext = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
@@ -147,6 +166,677 @@ def test_standard_vectors():
     
     return basic_correct and opt_correct and versions_match and decrypt_correct
 
+def test_ttable_vectors():
+    """T-table引擎标准测试向量及多块接口验证"""
+    print("\n=== T-table引擎验证 ===")
+    
+    key = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
+    plaintext = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
+    expected_ciphertext = bytes.fromhex("681EDF34D206965E86B3E94F536E4246")
+    
+    sm4_ttable = SM4TTable()
+    assert sm4_ttable.encrypt_block(plaintext, key) == expected_ciphertext
+    assert sm4_ttable.decrypt_block(expected_ciphertext, key) == plaintext
+    assert sm4_ttable._key_expansion(key) == SM4()._key_expansion(key)
+    
+    # 多块接口
+    assert sm4_ttable.encrypt_blocks(plaintext * 3, key) == expected_ciphertext * 3
+    assert sm4_ttable.decrypt_blocks(expected_ciphertext * 3, key) == plaintext * 3
+    
+    print("✓ T-table引擎: 通过")
+
+def test_numpy_engine():
+    """NumPy批量引擎：标准测试向量及与逐块实现的一致性"""
+    print("\n=== NumPy批量引擎验证 ===")
+    from sm4_numpy import SM4NumPy
+    
+    key = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
+    plaintext = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
+    expected_ciphertext = bytes.fromhex("681EDF34D206965E86B3E94F536E4246")
+    
+    engine = SM4NumPy()
+    assert bytes(engine.encrypt_blocks(plaintext * 1000, key)) == expected_ciphertext * 1000
+    assert bytes(engine.decrypt_blocks(expected_ciphertext * 1000, key)) == plaintext * 1000
+    
+    key = os.urandom(16)
+    data = os.urandom(16 * 257)
+    sm4_basic = SM4()
+    expected = b''.join(sm4_basic.encrypt_block(data[i:i+16], key) for i in range(0, len(data), 16))
+    assert bytes(engine.encrypt_blocks(data, key)) == expected
+    
+    # CTR（含计数器低32位回绕）与C库结果一致
+    counter = os.urandom(12) + b'\xff\xff\xff\xf0'
+    message = data[:-7]
+    assert bytes(engine.ctr_xor(counter, message, key)) == bytes(SM4Optimized().ctr_xor(counter, message, key))
+    
+    print("✓ NumPy批量引擎: 通过")
+
+def test_multikey():
+    """多密钥批量接口：批量密钥扩展与"第i块用第i个密钥"加解密，NumPy与C结果一致"""
+    print("\n=== 多密钥批量接口验证 ===")
+    from sm4_numpy import SM4NumPy
+    
+    n = 300
+    keys = [os.urandom(16) for _ in range(n)]
+    data = os.urandom(16 * n)
+    sm4_ttable = SM4TTable()
+    expected = b''.join(sm4_ttable.encrypt_block(data[16*i:16*i+16], keys[i]) for i in range(n))
+    
+    numpy_engine = SM4NumPy()
+    native = SM4Optimized()
+    numpy_rks = numpy_engine.expand_keys(keys)
+    native_rks = native.expand_keys(b''.join(keys))
+    assert bytes(numpy_rks) == bytes(native_rks)
+    assert list(numpy_rks[7]) == list(sm4_ttable._expand_round_keys(keys[7])[0])
+    # 两种轮密钥数组布局相同，可以交叉使用
+    for engine in (numpy_engine, native):
+        for rks in (numpy_rks, native_rks):
+            ciphertext = engine.encrypt_blocks_multikey(data, rks)
+            assert bytes(ciphertext) == expected
+            assert bytes(engine.decrypt_blocks_multikey(ciphertext, rks)) == data
+    
+    print("✓ 多密钥批量接口: 通过")
+
+def test_facade():
+    """统一入口：导入时不加载ctypes/NumPy，按分组数选择实现且结果一致"""
+    print("\n=== 统一入口验证 ===")
+    import subprocess
+    import sys
+    import sm4
+    
+    code = "import sys, sm4; assert 'ctypes' not in sys.modules and 'numpy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    
+    key = os.urandom(16)
+    data = os.urandom(16 * 200)
+    expected = bytes(SM4Optimized().encrypt_blocks(data, key))
+    assert bytes(sm4.encrypt_ecb(data, key)) == expected
+    assert bytes(sm4.decrypt_ecb(expected, key)) == data
+    assert sm4.encrypt_block(data[:16], key) == expected[:16]
+    assert bytes(sm4.ctr_xor(bytes(16), data[:-3], key)) == bytes(SM4Optimized().ctr_xor(bytes(16), data[:-3], key))
+    assert sm4.backend_name(1) in sm4.available_backends()
+    assert set(sm4.chosen_backends()) == {'small', 'bulk'}
+    assert SM4GCM(key, mode='auto').encrypt(data, key[:12]) == SM4GCM(key, mode='ttable').encrypt(data, key[:12])
+    
+    # 所有实现的批量接口一致
+    from sm4_numpy import SM4NumPy
+    for cipher in (SM4TTable(), SM4NumPy()):
+        assert bytes(cipher.encrypt_blocks(data, key)) == expected
+        assert bytes(cipher.ctr_xor(bytes(16), data[:-3], key)) == bytes(sm4.ctr_xor(bytes(16), data[:-3], key))
+    
+    print(f"✓ 统一入口: 通过 (小批量: {sm4.backend_name(1)}, 大批量: {sm4.backend_name(1024)})")
+
+def test_key_cache():
+    """验证轮密钥缓存：多密钥交替使用结果不变，缓存容量有界"""
+    print("\n=== 轮密钥缓存验证 ===")
+    
+    keys = [os.urandom(16) for _ in range(6)]
+    plaintext = os.urandom(16)
+    reference = SM4(cache_size=0)
+    expected = [reference.encrypt_block(plaintext, k) for k in keys]
+    
+    for cipher, enc, dec in [
+        (SM4(cache_size=4), 'encrypt_block', 'decrypt_block'),
+        (SM4TTable(cache_size=4), 'encrypt_block', 'decrypt_block'),
+        (SM4Optimized(cache_size=4), 'encrypt_block_optimized', 'decrypt_block_optimized'),
+    ]:
+        for _ in range(2):
+            for k, ct in zip(keys, expected):
+                assert getattr(cipher, enc)(plaintext, k) == ct
+                assert getattr(cipher, dec)(ct, k) == plaintext
+        assert len(cipher._rk_cache) == 4
+        assert cipher._rk_cache.hits > 0
+    
+    print("✓ 轮密钥缓存: 通过")
+
+def test_bulk_interfaces():
+    """验证C库批量接口与逐块接口结果一致，并支持原地处理调用方缓冲区"""
+    print("\n=== 批量接口验证 ===")
+    
+    key = os.urandom(16)
+    data = os.urandom(16 * 33)
+    sm4_basic = SM4()
+    sm4_opt = SM4Optimized()
+    expected = b''.join(sm4_basic.encrypt_block(data[i:i+16], key) for i in range(0, len(data), 16))
+    
+    assert bytes(sm4_opt.encrypt_blocks(data, key)) == expected
+    assert bytes(sm4_opt.decrypt_blocks(memoryview(expected), key)) == data
+    
+    # 原地加解密
+    buf = bytearray(data)
+    sm4_opt.encrypt_blocks(buf, key, out=buf)
+    assert buf == expected
+    sm4_opt.decrypt_blocks(buf, key, out=memoryview(buf))
+    assert buf == data
+    
+    # CTR: 密钥流与逐块加密计数器一致，计数器按inc32回绕
+    counter = bytearray(bytes.fromhex("000102030405060708090a0bfffffffe"))
+    keystream = sm4_opt.ctr_keystream(counter, 3, key)
+    expected_ks = b''.join(sm4_basic.encrypt_block(bytes.fromhex("000102030405060708090a0b") + c.to_bytes(4, 'big'), key)
+                           for c in (0xfffffffe, 0xffffffff, 0))
+    assert bytes(keystream) == expected_ks
+    assert counter.hex() == "000102030405060708090a0b00000001"
+    
+    message = data[:45]
+    ct = sm4_opt.ctr_xor(bytes.fromhex("000102030405060708090a0bfffffffe"), message, key)
+    assert bytes(ct) == bytes(m ^ k for m, k in zip(message, expected_ks))
+
+    # 只读缓冲区（bytes的memoryview切片）直接按地址传给C，不复制
+    base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+    ptr, n = _in_ptr(memoryview(data)[16:])
+    assert n == len(data) - 16 and _address(ptr) == base + 16
+    assert bytes(sm4_opt.encrypt_blocks(memoryview(data)[16:], key)) == expected[16:]
+
+    print("✓ 批量接口: 通过")
+
+def test_ghash_table():
+    """查表法GHASH与逐位乘法的参考实现结果一致"""
+    print("\n=== GHASH查表实现验证 ===")
+    
+    for _ in range(5):
+        h = os.urandom(16)
+        table = GHash(h)
+        for aad_len, ct_len in [(0, 0), (6, 0), (0, 16), (13, 100), (32, 33)]:
+            aad = os.urandom(aad_len)
+            ciphertext = os.urandom(ct_len)
+            assert table.digest(aad, ciphertext) == ghash(h, aad, ciphertext)
+    
+    print("✓ GHASH查表实现: 通过")
+
+def test_gcm_standard_vector():
+    """RFC 8998附录A.1的SM4-GCM标准测试向量：各Python实现与C库都须与标准结果一致"""
+    print("\n=== SM4-GCM标准测试向量验证 ===")
+
+    key = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
+    iv = bytes.fromhex("00001234567800000000ABCD")
+    aad = bytes.fromhex("FEEDFACEDEADBEEFFEEDFACEDEADBEEFABADDAD2")
+    plaintext = bytes.fromhex("AAAAAAAAAAAAAAAABBBBBBBBBBBBBBBBCCCCCCCCCCCCCCCCDDDDDDDDDDDDDDDD"
+                              "EEEEEEEEEEEEEEEEFFFFFFFFFFFFFFFFEEEEEEEEEEEEEEEEAAAAAAAAAAAAAAAA")
+    expected_ct = bytes.fromhex("17F399F08C67D5EE19D0DC9969C4BB7D5FD46FD3756489069157B282BB200735"
+                                "D82710CA5C22F0CCFA7CBF93D496AC15A56834CBCF98C397B4024A2691233B8D")
+    expected_tag = bytes.fromhex("83DE3541E4C2B58177E065A9BF7B62EC")
+
+    for mode in ('base', 'ttable', 'opt', 'numpy', 'native'):
+        gcm = SM4GCM(key, mode=mode)
+        assert gcm.encrypt(plaintext, iv, aad) == (expected_ct, expected_tag), mode
+        assert gcm.decrypt(expected_ct, iv, expected_tag, aad) == plaintext
+        enc = gcm.encryptor(iv, aad)
+        assert enc.update(plaintext[:7]) + enc.update(plaintext[7:]) == expected_ct
+        assert enc.finalize() == expected_tag
+
+    # 多线程路径：分段大小取16字节，使本向量也被切分处理
+    parallel = SM4GCM(key, mode='parallel', workers=2, chunk_size=16)
+    assert parallel.encrypt(plaintext, iv, aad) == (expected_ct, expected_tag)
+    assert parallel.decrypt(expected_ct, iv, expected_tag, aad) == plaintext
+
+    # C库接口直接验证
+    sm4_opt = SM4Optimized()
+    out, tag = sm4_opt.gcm_encrypt(key, iv, plaintext, aad)
+    assert (bytes(out), tag) == (expected_ct, expected_tag)
+    assert bytes(sm4_opt.gcm_decrypt(key, iv, expected_ct, expected_tag, aad)) == plaintext
+
+    print("✓ SM4-GCM标准测试向量: 通过")
+
+def test_gcm_modes():
+    """验证SM4-GCM各底层实现输出一致，篡改密文时拒绝解密"""
+    print("\n=== SM4-GCM一致性验证 ===")
+    
+    key = os.urandom(16)
+    iv = os.urandom(12)
+    aad = b"header"
+    for size in (0, 15, 16, 100):
+        plaintext = os.urandom(size)
+        modes = ('base', 'ttable', 'opt', 'numpy', 'native')
+        results = [SM4GCM(key, mode=mode).encrypt(plaintext, iv, aad) for mode in modes]
+        assert all(result == results[0] for result in results)
+        ciphertext, tag = results[0]
+        for mode in ('opt', 'native'):
+            assert SM4GCM(key, mode=mode).decrypt(ciphertext, iv, tag, aad) == plaintext
+            if size:
+                forged = bytes([ciphertext[0] ^ 1]) + ciphertext[1:]
+                try:
+                    SM4GCM(key, mode=mode).decrypt(forged, iv, tag, aad)
+                    assert False, "篡改密文未被检测"
+                except ValueError:
+                    pass
+    
+    print("✓ SM4-GCM一致性: 通过")
+
+def test_gcm_native():
+    """C库完整GCM与Python实现交叉验证，并直接读写调用方缓冲区"""
+    print("\n=== C语言SM4-GCM交叉验证 ===")
+    
+    sm4_opt = SM4Optimized()
+    for _ in range(20):
+        key = os.urandom(16)
+        iv = os.urandom(12)
+        aad = os.urandom(os.urandom(1)[0] % 40)
+        plaintext = os.urandom(int.from_bytes(os.urandom(2), 'big') % 3000)
+        expected = SM4GCM(key, mode='ttable').encrypt(plaintext, iv, aad)
+        
+        buf = bytearray(plaintext)
+        _, tag = sm4_opt.gcm_encrypt(key, iv, buf, aad, out=buf)
+        assert (bytes(buf), tag) == expected
+        sm4_opt.gcm_decrypt(key, iv, buf, tag, aad, out=buf)
+        assert bytes(buf) == plaintext
+    
+    # tag错误时不写输出
+    out = bytearray(len(expected[0]))
+    try:
+        sm4_opt.gcm_decrypt(key, iv, expected[0], bytes(16), aad, out=out)
+        assert False, "错误tag未被检测"
+    except ValueError:
+        pass
+    assert out == bytearray(len(out))
+    
+    print("✓ C语言SM4-GCM: 通过")
+
+def test_gcm_parallel():
+    """多线程GCM与顺序实现的密文和tag逐位一致"""
+    print("\n=== SM4-GCM多线程验证 ===")
+    
+    key = os.urandom(16)
+    iv = os.urandom(12)
+    aad = b"header"
+    parallel = SM4GCM(key, mode='parallel', workers=4, chunk_size=4096)
+    sequential = SM4GCM(key, mode='opt')
+    for size in (0, 100, 8192, 8192 * 3 + 5):
+        plaintext = os.urandom(size)
+        ciphertext, tag = parallel.encrypt(plaintext, iv, aad)
+        assert (ciphertext, tag) == sequential.encrypt(plaintext, iv, aad)
+        assert parallel.decrypt(ciphertext, iv, tag, aad) == plaintext
+
+    # 线程池在实例间共享，反复创建实例不会增加线程
+    import threading
+    threads = threading.active_count()
+    for _ in range(8):
+        SM4GCM(key, mode='parallel', workers=4, chunk_size=4096).encrypt(os.urandom(8192 * 3), iv)
+    assert threading.active_count() == threads
+
+    print("✓ SM4-GCM多线程: 通过")
+
+def test_gcm_verify_first():
+    """先认证后解密：伪造消息被拒绝时不产生任何明文输出"""
+    print("\n=== SM4-GCM先认证后解密验证 ===")
+    import io
+    
+    key = os.urandom(16)
+    iv = os.urandom(12)
+    aad = b"header"
+    gcm = SM4GCM(key, mode='opt')
+    plaintext = os.urandom(5000)
+    ciphertext, tag = gcm.encrypt(plaintext, iv, aad)
+    
+    # 拒绝伪造消息时不应调用CTR
+    calls = []
+    gcm.ctr_xor = lambda *args, **kwargs: calls.append(1)
+    try:
+        gcm.decrypt(ciphertext, iv, bytes(16), aad)
+        assert False, "错误tag未被检测"
+    except ValueError:
+        pass
+    assert not calls
+    
+    # 两趟流式解密
+    gcm = SM4GCM(key, mode='opt')
+    src = io.BytesIO(ciphertext)
+    dst = io.BytesIO()
+    assert gcm.decrypt_stream(src, dst, iv, tag, aad, chunk_size=1000) == len(plaintext)
+    assert dst.getvalue() == plaintext
+    
+    forged = io.BytesIO(ciphertext[:-1] + bytes([ciphertext[-1] ^ 1]))
+    dst = io.BytesIO()
+    try:
+        gcm.decrypt_stream(forged, dst, iv, tag, aad, chunk_size=1000)
+        assert False, "篡改密文未被检测"
+    except ValueError:
+        pass
+    assert dst.getvalue() == b''
+    
+    print("✓ SM4-GCM先认证后解密: 通过")
+
+def test_gcm_streaming():
+    """流式加解密与一次性接口结果一致（任意分段、写入调用方缓冲区）"""
+    print("\n=== SM4-GCM流式接口验证 ===")
+    
+    key = os.urandom(16)
+    iv = os.urandom(12)
+    aad = os.urandom(20)
+    chunk_sizes = [1, 7, 16, 33, 5]
+    for mode in ('ttable', 'opt'):
+        gcm = SM4GCM(key, mode=mode)
+        for size in (0, 15, 16, 17, 300):
+            plaintext = os.urandom(size)
+            ciphertext, tag = gcm.encrypt(plaintext, iv, aad)
+            
+            encryptor = gcm.encryptor(iv, aad)
+            out = bytearray(size)
+            pos = 0
+            i = 0
+            while pos < size:
+                n = chunk_sizes[i % len(chunk_sizes)]
+                pos += encryptor.update(plaintext[pos:pos+n], out=memoryview(out)[pos:])
+                i += 1
+            assert bytes(out) == ciphertext and encryptor.finalize() == tag
+            
+            # 原地解密，tag在最后给出
+            decryptor = gcm.decryptor(iv, aad=aad)
+            view = memoryview(out)
+            for pos in range(0, size, 10):
+                decryptor.update(view[pos:pos+10], out=view[pos:pos+10])
+            decryptor.finalize(tag)
+            assert bytes(out) == plaintext
+            
+            decryptor = gcm.decryptor(iv, bytes(16), aad)
+            decryptor.update(ciphertext)
+            try:
+                decryptor.finalize()
+                assert False, "错误tag未被检测"
+            except ValueError:
+                pass
+
+    # 纯Python路径逐块处理：写入调用方缓冲区时峰值内存与数据长度无关
+    import tracemalloc
+    gcm = SM4GCM(os.urandom(16), mode='base')
+    peaks = []
+    for size in (1024, 4096):
+        data = os.urandom(size)
+        out = bytearray(size)
+        encryptor = gcm.encryptor(os.urandom(12))
+        tracemalloc.start()
+        encryptor.update(data, out=out)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < 4096 and peaks[1] - peaks[0] < 1024, peaks
+    
+    print("✓ SM4-GCM流式接口: 通过")
+
+def test_stage_metrics():
+    """分阶段计时：结果不变、各阶段字节数正确、退出后还原为未包装的方法"""
+    print("\n=== 分阶段计时验证 ===")
+    
+    key = os.urandom(16)
+    iv = os.urandom(12)
+    plaintext = os.urandom(1001)
+    for mode in ('base', 'opt'):
+        gcm = SM4GCM(key, mode=mode)
+        expected = gcm.encrypt(plaintext, iv, b'aad')
+        original = (gcm.encrypt_block, gcm.ctr_xor)
+        metrics = StageMetrics()
+        events = []
+        metrics.add_callback(lambda stage, ns, nbytes: events.append(stage))
+        with metrics.instrument(gcm):
+            assert gcm.encrypt(plaintext, iv, b'aad') == expected
+        assert (gcm.encrypt_block, gcm.ctr_xor) == original
+        assert '_ctr_into' not in vars(gcm) and 'update' not in vars(gcm._ghash)
+        stages = json.loads(metrics.to_json())
+        assert stages['ghash']['bytes'] == 3 + 1001 + 16
+        assert stages['padding']['calls'] == 2
+        if mode == 'base':
+            assert stages['ctr']['bytes'] == 1001 and stages['ctr']['calls'] == 1
+            # 63个数据块加上掩盖tag的E_K(J0)
+            assert stages['block']['calls'] == 64
+        else:
+            assert stages['ctr']['bytes'] == 1001 and stages['ctr']['calls'] == 1
+        assert len(events) == sum(entry['calls'] for entry in stages.values())
+    
+    # 分组实现：轮密钥缓存未命中时记录密钥扩展
+    sm4_opt = SM4Optimized()
+    metrics = StageMetrics()
+    with metrics.instrument(sm4_opt):
+        sm4_opt.encrypt_blocks(plaintext[:992], key)
+        sm4_opt.encrypt_blocks(plaintext[:992], key)
+    stages = metrics.to_dict()
+    assert stages['key_expansion']['calls'] == 1
+    assert stages['ecb']['bytes'] == 2 * 992 and stages['ecb']['calls'] == 2
+    assert 'encrypt_blocks' not in vars(sm4_opt)
+    
+    print("✓ 分阶段计时: 通过")
+
+def test_keystream_pool():
+    """密钥流预取池：结果与SM4GCM一致、nonce不重复、用后清零"""
+    print("\n=== 密钥流预取池验证 ===")
+    
+    key = os.urandom(16)
+    for mode in ('ttable', 'native'):
+        gcm = SM4GCM(key, mode=mode)
+        pool = KeystreamPool(gcm, NonceCounter(b'\x00\x00\x00\x07'), max_message_size=100, depth=8)
+        assert len(pool._ring) == 8 * 128
+        # 等后台线程填好第一批槽位，避免加密在它被调度之前就全部走了未命中路径
+        assert pool.wait_ready(5)
+        nonces = set()
+        for size in (0, 1, 16, 99, 100, 101, 500) * 3:
+            plaintext = os.urandom(size)
+            nonce, ciphertext, tag = pool.encrypt(plaintext, b'aad')
+            assert nonce[:4] == b'\x00\x00\x00\x07' and nonce not in nonces
+            nonces.add(nonce)
+            assert gcm.decrypt(ciphertext, nonce, tag, b'aad') == plaintext
+        assert pool.hits > 0
+        assert pool.hits + pool.misses == 21
+        pool.close()
+        assert not any(pool._ring)
+        assert not pool.wait_ready(0)
+
+        # 后台线程正在填充一大批槽位时，close()只等当前槽位填完
+        pool = KeystreamPool(gcm, max_message_size=16384, depth=64)
+        assert pool.wait_ready(5)
+        start = time.perf_counter()
+        pool.close()
+        assert time.perf_counter() - start < 1.0
+        assert not any(pool._ring)
+    
+    print("✓ 密钥流预取池: 通过")
+
+def test_xts():
+    """SM4-XTS：C与纯Python路径一致、密文窃取、文件原地加解密"""
+    print("\n=== SM4-XTS验证 ===")
+    
+    key = os.urandom(32)
+    xts = SM4XTS(key, sector_size=512, workers=3)
+    fallback = SM4XTS(key, sector_size=512)
+    fallback._native = None
+    
+    # 首个分组按定义计算：C = E_K1(P ^ T) ^ T，T = E_K2(扇区号)
+    sm4 = SM4TTable()
+    plaintext = os.urandom(512)
+    tweak = sm4.encrypt_block((9).to_bytes(16, 'little'), key[16:])
+    block = sm4.encrypt_block(bytes(a ^ b for a, b in zip(plaintext, tweak)), key[:16])
+    assert xts.encrypt(plaintext, sector=9)[:16] == bytes(a ^ b for a, b in zip(block, tweak))
+    
+    for size in (16, 31, 512, 512 * 3 + 100, 512 * 300):
+        plaintext = os.urandom(size)
+        ciphertext = xts.encrypt(plaintext, sector=5)
+        assert len(ciphertext) == size
+        if size < 4096:
+            assert fallback.encrypt(plaintext, sector=5) == ciphertext
+            assert fallback.decrypt(ciphertext, sector=5) == plaintext
+        assert xts.decrypt(ciphertext, sector=5) == plaintext
+    
+    try:
+        xts.encrypt(os.urandom(512 + 8))
+        assert False, "过短的尾扇区未被拒绝"
+    except ValueError:
+        pass
+    
+    # 文件原地加密，再只解密其中一段扇区
+    data = os.urandom(512 * 1000)
+    path = f"xts_test_{os.getpid()}.img"
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        assert xts.encrypt_file(path) == len(data)
+        ciphertext = xts.encrypt(data)
+        with open(path, 'rb') as f:
+            assert f.read() == ciphertext
+        xts.decrypt_file(path, start=10, count=20)
+        with open(path, 'rb') as f:
+            result = f.read()
+        assert result[5120:15360] == data[5120:15360]
+        assert result[:5120] == ciphertext[:5120] and result[15360:] == ciphertext[15360:]
+    finally:
+        os.remove(path)
+    
+    print("✓ SM4-XTS: 通过")
+
+def test_file_segments():
+    """分段文件加密：整文件往返、按范围解密、段交换与截断被拒绝"""
+    print("\n=== SM4-GCM分段文件加密验证 ===")
+    
+    key = os.urandom(16)
+    segment_size = 256
+    stride = segment_size + 16
+    for size in (0, 100, 256, 1000):
+        plaintext = os.urandom(size)
+        enc = io.BytesIO()
+        sm4_file.encrypt_file(io.BytesIO(plaintext), enc, key, segment_size, workers=2)
+        dec = io.BytesIO()
+        assert sm4_file.decrypt_file(io.BytesIO(enc.getvalue()), dec, key) == size
+        assert dec.getvalue() == plaintext
+    
+    ciphertext = enc.getvalue()
+    path = f"file_test_{os.getpid()}.enc"
+    try:
+        with open(path, 'wb') as f:
+            f.write(ciphertext)
+        with open(path, 'rb') as f:
+            assert sm4_file.plaintext_size(f) == len(plaintext)
+            for start, end in ((0, 1000), (10, 20), (250, 530), (900, 5000)):
+                assert sm4_file.decrypt_range(f, key, start, end) == plaintext[start:end]
+    finally:
+        os.remove(path)
+    
+    # 每段都是标准SM4-GCM：用段nonce和AAD可以直接解密单个段
+    header = sm4_file.HEADER.size
+    base = ciphertext[header-12:header]
+    segment = ciphertext[header:header+stride]
+    aad = sm4_file._segment_aad(ciphertext[:header], 0, False)
+    assert SM4GCM(key).decrypt(segment[:-16], sm4_file._segment_nonce(base, 0), segment[-16:], aad) == plaintext[:256]
+
+    # 版本1（未掩盖tag）的文件被拒绝
+    old = bytearray(ciphertext)
+    old[4] = 1
+    try:
+        sm4_file.decrypt_file(io.BytesIO(bytes(old)), io.BytesIO(), key)
+        assert False, "版本1文件未被拒绝"
+    except ValueError:
+        pass
+
+    swapped = (ciphertext[:header] + ciphertext[header+stride:header+2*stride] +
+               ciphertext[header:header+stride] + ciphertext[header+2*stride:])
+    truncated = ciphertext[:header + 2 * stride]
+    for bad in (swapped, truncated):
+        try:
+            sm4_file.decrypt_file(io.BytesIO(bad), io.BytesIO(), key)
+            assert False, "篡改的文件未被检测"
+        except ValueError:
+            pass
+    
+    # 命令行：认证失败返回1，读写出错时异常继续抛出，两种情况都不留下不完整的输出文件
+    src_path = f"file_test_{os.getpid()}.bad"
+    dst_path = f"file_test_{os.getpid()}.out"
+    try:
+        with open(src_path, 'wb') as f:
+            f.write(truncated)
+        assert sm4_file.main(['decrypt', '-k', key.hex(), src_path, dst_path]) == 1
+        assert not os.path.exists(dst_path)
+        try:
+            sm4_file.main(['encrypt', '-k', key.hex(), os.path.dirname(os.path.abspath(src_path)), dst_path])
+            assert False, "读取错误未被报告"
+        except OSError:
+            pass
+        assert not os.path.exists(dst_path)
+    finally:
+        for path in (src_path, dst_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    print("✓ SM4-GCM分段文件加密: 通过")
+
+def test_aio_streams():
+    """asyncio加密流：回环连接上的记录往返、正常结束与截断检测"""
+    print("\n=== asyncio加密流验证 ===")
+    
+    key = os.urandom(16)
+    records = [os.urandom(n) for n in (0, 1, 100, 70000, 5, 300000)]
+    
+    async def run():
+        results = []
+        
+        async def handle(r, w):
+            reader = sm4_aio.SM4GCMStreamReader(r, key, max_in_flight=2)
+            received = []
+            try:
+                async for record in reader:
+                    received.append(record)
+                results.append(received)
+            except ValueError as e:
+                results.append(str(e))
+            w.close()
+        
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        
+        _, writer = await sm4_aio.open_connection('127.0.0.1', port, key, max_in_flight=3)
+        for record in records:
+            await writer.write_record(record)
+        await writer.close()
+        
+        # 不发送结束记录直接断开
+        _, writer = await sm4_aio.open_connection('127.0.0.1', port, key)
+        await writer.write_record(b'abc')
+        await writer.flush()
+        writer.writer.close()
+        await writer.writer.wait_closed()
+        
+        while len(results) < 2:
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+        return results
+    
+    # 两个连接的处理顺序不确定
+    results = asyncio.run(run())
+    assert records in results
+    assert 'truncated stream' in results
+
+    # 对端重置：drain()失败后，在背压中等待的write_record和close都抛出错误而不是挂起
+    class ResetWriter:
+        def __init__(self):
+            self.frames = 0
+
+        def write(self, data):
+            self.frames += 1
+
+        async def drain(self):
+            # 写出较慢，调用方在背压中等待槽位；流头之后写出两条记录，第三条起连接被重置
+            await asyncio.sleep(0.05)
+            if self.frames > 3:
+                raise ConnectionResetError('peer reset')
+
+        def close(self):
+            pass
+
+        async def wait_closed(self):
+            raise ConnectionResetError('peer reset')
+
+    async def reset():
+        writer = sm4_aio.SM4GCMStreamWriter(ResetWriter(), key, max_in_flight=2)
+        try:
+            for _ in range(10):
+                await asyncio.wait_for(writer.write_record(b'x' * 100), 5)
+            assert False, "连接重置未被报告"
+        except ConnectionResetError:
+            pass
+        try:
+            await asyncio.wait_for(writer.close(), 5)
+            assert False, "连接重置未被报告"
+        except ConnectionResetError:
+            pass
+
+    asyncio.run(reset())
+    
+    print("✓ asyncio加密流: 通过")
+
 def performance_benchmark():
     """性能基准测试"""
     print("\n=== 性能基准测试 ===")
@@ -167,7 +857,7 @@ def performance_benchmark():
     try:
         gmssl_cipher = gmssl_sm4.CryptSM4()
         gmssl_cipher.set_key(key, gmssl_sm4.SM4_ENCRYPT)
-    except:
+    except Exception:
         gmssl_cipher = None
     
     if gmssl_cipher:
@@ -278,6 +968,25 @@ def main():
         print("✗ 标准测试失败")
         return
     
+    test_ttable_vectors()
+    test_numpy_engine()
+    test_multikey()
+    test_facade()
+    test_key_cache()
+    test_bulk_interfaces()
+    test_ghash_table()
+    test_gcm_standard_vector()
+    test_gcm_modes()
+    test_gcm_native()
+    test_gcm_parallel()
+    test_gcm_verify_first()
+    test_gcm_streaming()
+    test_stage_metrics()
+    test_keystream_pool()
+    test_xts()
+    test_file_segments()
+    test_aio_streams()
+    
     # 与标准库对比验证
     if compare_with_standard_library():
         print("✓ 标准库对比通过")